@@ -0,0 +1 @@
+"""Code shared by the `smart_factory` and `machine_failure` simulations."""
@@ -0,0 +1,255 @@
+"""
+Scaling benchmark suite of both simulations.
+
+Each case (a simulation, its size parameters and `run.py` arguments) is run in a separate process, once with a stub
+constant estimator (the predictions are constant and nothing is trained -- the simulation and ensemble cost only) and
+once with the real `NeuralNetworkEstimator` (inference and training included). The steps per second of the simulation,
+the peak RSS and the times of the phases (see `common/profiling.py`) are reported and saved, and the steps per second
+are compared with the stored baselines -- a case slower than its baseline by more than `--threshold` is a regression.
+
+Example (run from the repository root):
+
+    py -m common.benchmark --quick                 # compare with the baselines
+    py -m common.benchmark --update                # store the current results as the baselines
+    py -m common.benchmark --case smart_factory/workers=400 --estimators stub
+    py -m common.benchmark --imports               # import and startup times, fails if heavy modules are imported eagerly
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+# (name, simulation, CONFIGURATION values, run.py arguments)
+CASES = [
+    ("machine_failure/machines=100", "machine_failure", {"machineCount": 100}, []),
+    ("machine_failure/machines=1000", "machine_failure", {"machineCount": 1000}, ["--batch"]),
+    ("machine_failure/machines=1000/steps=5000", "machine_failure", {"machineCount": 1000, "steps": 5000}, ["--batch"]),
+    ("machine_failure/fleet/machines=10000", "machine_failure", {"machineCount": 10000}, ["-f"]),
+    ("machine_failure/fleet/machines=100000", "machine_failure", {"machineCount": 100000}, ["-f"]),
+    ("smart_factory/workers=100", "smart_factory", {"workersPerShift": 100, "standbysPerShift": 50}, []),
+    ("smart_factory/workers=400", "smart_factory", {"workersPerShift": 400, "standbysPerShift": 200}, ["--batch"]),
+    ("smart_factory/workers=400/steps=200", "smart_factory", {"workersPerShift": 400, "standbysPerShift": 200, "steps": 200}, ["--batch"]),
+    ("smart_factory/array/workers=2000", "smart_factory", {"workersPerShift": 2000, "standbysPerShift": 1000}, ["--batch", "--event_driven"]),
+    ("smart_factory/array/workplaces=60", "smart_factory", {"workplaces": 60, "entryDoors": 3, "dispensers": 5, "workersPerShift": 100, "standbysPerShift": 50, "steps": 120}, ["--batch", "--event_driven"]),
+]
+QUICK_CASES = ["machine_failure/machines=100", "machine_failure/fleet/machines=10000", "smart_factory/workers=100"]
+
+# (simulation, module, heavy modules it must not import) -- the modules imported by the argument parsing of `run.py`
+# and by the plot regeneration; "experiment" constructs the experiment of `run.py` (as every run does), which imports
+# TensorFlow by creating the estimators (ML-DEECo's estimators import it), so only the plotting modules must not be
+# imported and whether TensorFlow is imported is reported
+IMPORT_CASES = [
+    ("smart_factory", "run", ["tensorflow", "matplotlib", "seaborn"]),
+    ("smart_factory", "plots", ["tensorflow", "matplotlib", "seaborn"]),
+    ("smart_factory", "population", ["tensorflow", "matplotlib", "seaborn"]),
+    ("smart_factory", "experiment", ["matplotlib", "seaborn"]),
+    ("machine_failure", "run", ["tensorflow", "matplotlib", "seaborn"]),
+    ("machine_failure", "plots", ["tensorflow", "matplotlib", "seaborn"]),
+    ("machine_failure", "experiment", ["matplotlib", "seaborn"]),
+]
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start, "heavy": [m for m in {heavy!r} if m in sys.modules],
+                  "tensorflow": "tensorflow" in sys.modules}}))
+"""
+EXPERIMENT_PROBE = """
+import json, sys, tempfile, time
+start = time.perf_counter()
+import run
+with tempfile.TemporaryDirectory() as output:
+    run.{experiment}(run.createArgumentParser().parse_args(["-v", "0", "-o", output, "-i", "1"]))
+print(json.dumps({{"seconds": time.perf_counter() - start, "heavy": [m for m in {heavy!r} if m in sys.modules],
+                  "tensorflow": "tensorflow" in sys.modules}}))
+"""
+
+EXPERIMENTS = {
+    "machine_failure": "ProductionMachineExperiment",
+    "smart_factory": "LateWorkersExperiment",
+}
+STUB_PREDICTIONS = {
+    "machine_failure": 1.0,  # time to failure (scaled by the steps) -- no failures are prevented
+    "smart_factory": 0.0,  # probability of the worker being late -- nobody is cancelled
+}
+
+
+def stubEstimators(experiment, prediction):
+    """Replaces the inference and training of the estimators of the experiment by a constant prediction."""
+    for estimator in experiment.estimators:
+        estimator.predict = lambda x: np.array([prediction])
+        estimator.predictBatch = lambda X: np.full((len(X), 1), prediction)
+        estimator.endIteration = lambda estimator=estimator: estimator.data.clear()
+        estimator.saveModel = lambda *args: None
+
+
+def runCase(simulation, configuration, arguments, estimator, iterations, seed):
+    """Runs the case in this process and returns its measurements."""
+    os.chdir(ROOT / simulation)
+    sys.path.insert(0, str(ROOT / simulation))
+    from configuration import CONFIGURATION
+    import run
+    from common.profiling import PROFILER
+
+    for name, value in configuration.items():
+        setattr(CONFIGURATION, name, value)
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    with tempfile.TemporaryDirectory() as output:
+        if simulation == "machine_failure":
+            arguments = arguments + ["-m", str(CONFIGURATION.machineCount)]
+        args = run.createArgumentParser().parse_args(["-v", "0", "-o", output, "-i", str(iterations), "--seed", str(seed), "--threads", "1"] + arguments)
+        experiment = getattr(run, EXPERIMENTS[simulation])(args)
+        if estimator == "stub":
+            stubEstimators(experiment, STUB_PREDICTIONS[simulation])
+
+        PROFILER.enable()
+        PROFILER.instrumentExperiment(experiment)
+        start = time.perf_counter()
+        experiment.run()
+        elapsed = time.perf_counter() - start
+
+    summary = PROFILER.summary()
+    simulationTime = summary["phases"]["experiment.runSimulation"]["seconds"]
+    steps = iterations * experiment.config.simulations * CONFIGURATION.steps
+    return {
+        "steps_per_second": steps / simulationTime,
+        "seconds": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "phases": {name: phase["seconds"] for name, phase in summary["phases"].items()},
+    }
+
+
+def benchmark(case, estimator, iterations, seed):
+    """Runs the case in a separate process (so that the peak RSS is of the case only)."""
+    name, simulation, configuration, arguments = case
+    spec = json.dumps({"simulation": simulation, "configuration": configuration, "arguments": arguments,
+                       "estimator": estimator, "iterations": iterations, "seed": seed})
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+    env.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    process = subprocess.run([sys.executable, "-m", "common.benchmark", "--run", spec], cwd=ROOT, env=env, capture_output=True, text=True)
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    print(f"{name} ({estimator}) failed:\n{process.stderr}", file=sys.stderr)
+    return None
+
+
+def importCost(simulation, module, heavy):
+    """Time of importing the module (constructing the experiment) in a fresh process and the heavy modules imported."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+    if module == "experiment":
+        probe = EXPERIMENT_PROBE.format(experiment=EXPERIMENTS[simulation], heavy=heavy)
+    else:
+        probe = IMPORT_PROBE.format(module=module, heavy=heavy)
+    process = subprocess.run([sys.executable, "-c", probe], cwd=ROOT / simulation, env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        print(f"import {simulation}/{module} failed:\n{process.stderr}", file=sys.stderr)
+        return None
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def benchmarkImports(repeat=3):
+    """Best import times of the `IMPORT_CASES` (`steps_per_second` is the inverse, so the baselines compare the same)."""
+    results = {}
+    for simulation, module, heavy in IMPORT_CASES:
+        measurements = [importCost(simulation, module, heavy) for _ in range(repeat)]
+        if None in measurements:
+            results[f"imports/{simulation}/{module}"] = None
+            continue
+        seconds = min(m["seconds"] for m in measurements)
+        results[f"imports/{simulation}/{module}"] = {"seconds": seconds, "steps_per_second": 1 / seconds, "heavy": measurements[0]["heavy"],
+                                                      "tensorflow": measurements[0]["tensorflow"]}
+    return results
+
+
+def compare(results, baselines, threshold):
+    """Returns the keys of the results slower than their baselines by more than the threshold."""
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if result is not None and baseline is not None and result["steps_per_second"] < (1 - threshold) * baseline["steps_per_second"]:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the simulations')
+    parser.add_argument('--case', type=str, nargs='+', help='Names of the cases to run (default all).', required=False, default=None)
+    parser.add_argument('--quick', action='store_true', help='Run only the small cases.', required=False, default=False)
+    parser.add_argument('--estimators', type=str, nargs='+', choices=['stub', 'nn'], help='Estimators to benchmark with.', required=False, default=['stub', 'nn'])
+    parser.add_argument('-i', '--iterations', type=int, help='Number of iterations of each run (the second one uses the trained model).', required=False, default=2)
+    parser.add_argument('-s', '--seed', type=int, help='Random seed.', required=False, default=42)
+    parser.add_argument('-o', '--output', type=str, help='File to save the results to.', required=False, default='results/benchmark.json')
+    parser.add_argument('--baselines', type=str, help='File with the baseline results.', required=False, default=str(ROOT / 'benchmark_baselines.json'))
+    parser.add_argument('--update', action='store_true', help='Store the results as the new baselines.', required=False, default=False)
+    parser.add_argument('--threshold', type=float, help='Relative slowdown of the steps per second reported as a regression.', required=False, default=0.2)
+    parser.add_argument('--imports', action='store_true', help='Benchmark the import times of the modules which must not import TensorFlow, matplotlib or seaborn (and the construction of the experiments).', required=False, default=False)
+    parser.add_argument('--run', type=str, help=argparse.SUPPRESS, required=False, default=None)  # runs one case (internal)
+    args = parser.parse_args()
+
+    if args.run:
+        spec = json.loads(args.run)
+        result = runCase(spec["simulation"], spec["configuration"], spec["arguments"], spec["estimator"], spec["iterations"], spec["seed"])
+        print(RESULT_PREFIX + json.dumps(result))
+        return
+
+    results = {}
+    failed = False
+    if args.imports:
+        print(f"{'module':<45} {'time [s]':>9} {'TF':>5} heavy modules")
+        results = benchmarkImports()
+        for key, result in results.items():
+            if result is None:
+                failed = True
+                continue
+            print(f"{key:<45} {result['seconds']:>9.3f} {'yes' if result['tensorflow'] else 'no':>5} {', '.join(result['heavy'])}")
+            if result["heavy"]:
+                print(f"Regression: {key} imports {', '.join(result['heavy'])}")
+                failed = True
+    else:
+        names = args.case or (QUICK_CASES if args.quick else [c[0] for c in CASES])
+        cases = [c for c in CASES if c[0] in names]
+
+        print(f"{'case':<45} {'estimator':>9} {'steps/s':>10} {'time [s]':>9} {'RSS [MB]':>9}")
+        for case in cases:
+            for estimator in args.estimators:
+                key = f"{case[0]}/{estimator}"
+                results[key] = result = benchmark(case, estimator, args.iterations, args.seed)
+                if result is not None:
+                    print(f"{case[0]:<45} {estimator:>9} {result['steps_per_second']:>10.1f} {result['seconds']:>9.2f} {result['peak_rss_mb']:>9.1f}")
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    baselinesFile = Path(args.baselines)
+    baselines = json.loads(baselinesFile.read_text()) if baselinesFile.exists() else {}
+    if args.update:
+        baselines.update({key: result for key, result in results.items() if result is not None})
+        baselinesFile.write_text(json.dumps(baselines, indent=2))
+        print(f"Baselines saved to {baselinesFile}.")
+        return
+
+    regressions = compare(results, baselines, args.threshold)
+    for key in regressions:
+        print(f"Regression: {key} {results[key]['steps_per_second']:.1f} steps/s (baseline {baselines[key]['steps_per_second']:.1f} steps/s)")
+    if regressions or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
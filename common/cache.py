@@ -0,0 +1,141 @@
+"""
+Content-addressed cache of the results of the baseline iteration (`--baseline_cache` of the `run.py` scripts).
+
+The first iteration of the experiments runs with the baseline (no model is trained yet), so its results depend only on
+the seed, the configuration of the simulation and the code -- not on the hyperparameters of the estimators. After the
+simulations of the first iteration, the collected training data of the estimators, the state of the experiment (its
+logs, see `experiment.checkpointState()`), the files written into the output folder and the states of the random
+generators are stored under a hash of the simulation arguments (given by `experiment.baselineKey()`), the simple
+values of the `CONFIGURATION`, the way the estimators collect the data and the source code of the simulation. A later
+run with the same key loads them and goes straight to the training of the first iteration.
+
+The models are created (and TensorFlow seeded) before the first iteration in both cases, and the later iterations are
+seeded as with `--checkpoint`, so a run using the cache continues exactly as the run which stored it.
+"""
+import hashlib
+import json
+import pickle
+import random
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ml_deeco.utils import verbosePrint
+
+ROOT = Path(__file__).resolve().parent.parent
+EXCLUDED_OUTPUTS = {"output.txt", "trace.bin", "profile.json", "checkpoint", "checkpoint.tmp", "checkpoint.old"}
+
+
+def configurationValues(configuration):
+    """The values of the simple (number, string, bool) attributes of the configuration object."""
+    names = {name for cls in type(configuration).__mro__ for name in vars(cls)} | set(vars(configuration))
+    values = {}
+    for name in sorted(names):
+        value = getattr(configuration, name, None)
+        if not name.startswith("_") and isinstance(value, (bool, int, float, str)):
+            values[name] = value
+    return values
+
+
+def codeHash(simulation):
+    """Hash of the source code of the simulation and the shared `common` package."""
+    digest = hashlib.sha256()
+    for folder in (ROOT / simulation, ROOT / "common"):
+        for file in sorted(folder.glob("*.py")):
+            digest.update(file.name.encode())
+            digest.update(file.read_bytes())
+    return digest.hexdigest()
+
+
+def _outputFiles(folder, excluded):
+    """Modification times of the files in the output folder (without the excluded paths)."""
+    files = {}
+    for file in folder.rglob("*"):
+        relative = file.relative_to(folder)
+        if file.is_file() and relative.parts[0] not in EXCLUDED_OUTPUTS and not any(file.is_relative_to(e) for e in excluded):
+            files[relative] = file.stat().st_mtime_ns
+    return files
+
+
+def _collectionMode(estimator):
+    if getattr(estimator, "compactData", False):
+        return "compact"
+    return "store" if getattr(estimator, "dataStore", None) is not None else "memory"
+
+
+class BaselineCache:
+
+    def __init__(self, folder, simulation, experiment, configuration):
+        self.outputFolder = Path(configuration.outputFolder)
+        content = {
+            "simulation": simulation,
+            "key": experiment.baselineKey(),
+            "configuration": configurationValues(configuration),
+            "collection": [_collectionMode(estimator) for estimator in experiment.estimators],  # the format of the cached data
+            "code": codeHash(simulation),
+        }
+        self.key = hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()[:20]
+        self.entry = Path(folder) / self.key
+        self._outputsBefore = None
+
+    def exists(self):
+        return (self.entry / "state.pkl").exists()
+
+    def _dataStoreFolders(self, experiment):
+        return [estimator.dataStore.folder for estimator in experiment.estimators if getattr(estimator, "dataStore", None) is not None]
+
+    def begin(self, experiment):
+        """Called before the baseline iteration is simulated (to find the files it writes)."""
+        self._outputsBefore = _outputFiles(self.outputFolder, self._dataStoreFolders(experiment))
+
+    def store(self, experiment):
+        """Stores the results of the simulated baseline iteration."""
+        temporary = self.entry.with_name(self.entry.name + f".tmp{time.time_ns()}")
+        temporary.mkdir(parents=True)
+
+        estimatorData = []
+        for e, estimator in enumerate(experiment.estimators):
+            data = estimator.collectedData()
+            if getattr(estimator, "dataStore", None) is not None:
+                data = estimator.dataStore.exportChunks(data, temporary / f"estimator_{e}")
+            estimatorData.append(data)
+
+        outputs = _outputFiles(self.outputFolder, self._dataStoreFolders(experiment))
+        written = [file for file, mtime in outputs.items() if self._outputsBefore.get(file) != mtime]
+        for file in written:
+            (temporary / "outputs" / file).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(self.outputFolder / file, temporary / "outputs" / file)
+
+        state = {
+            "random": random.getstate(),
+            "numpy": np.random.get_state(),
+            "experiment": experiment.checkpointState(),
+            "estimators": estimatorData,
+        }
+        with open(temporary / "state.pkl", "wb") as file:
+            pickle.dump(state, file)
+
+        if self.exists():  # stored by a concurrent run meanwhile
+            shutil.rmtree(temporary)
+            return
+        shutil.rmtree(self.entry, ignore_errors=True)
+        temporary.rename(self.entry)
+        verbosePrint(f"Baseline iteration stored in the cache ({self.key})", 1)
+
+    def load(self, experiment):
+        """Restores the results of the baseline iteration instead of simulating it."""
+        with open(self.entry / "state.pkl", "rb") as file:
+            state = pickle.load(file)
+
+        random.setstate(state["random"])
+        np.random.set_state(state["numpy"])
+        experiment.restoreCheckpointState(state["experiment"])
+        for e, (estimator, data) in enumerate(zip(experiment.estimators, state["estimators"])):
+            if getattr(estimator, "dataStore", None) is not None:
+                data = estimator.dataStore.importChunks(data, self.entry / f"estimator_{e}")
+            estimator.mergeData(data)
+        if (self.entry / "outputs").exists():
+            shutil.copytree(self.entry / "outputs", self.outputFolder, dirs_exist_ok=True)
+        verbosePrint(f"Baseline iteration loaded from the cache ({self.key})", 1)
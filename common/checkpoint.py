@@ -0,0 +1,146 @@
+"""
+Iteration-level checkpoints of the experiments (`--checkpoint` and `--resume` of the `run.py` scripts).
+
+After each iteration (including the training), everything needed to continue is saved into the `checkpoint` folder in
+the output folder: the number of finished iterations, the states of the `random` and `np.random` generators, the state of
+the experiment (its logs, given by `experiment.checkpointState()`), and for each estimator its model with the optimizer
+state (a TensorFlow checkpoint) and the attributes declared in `checkpointAttributes` (the collected data, the states
+of the estimator modes, the iteration counter of ML-DEECo, see `EstimatorModesMixin`). A state which cannot be pickled
+is an error. TensorFlow is seeded at the start of each iteration by a seed derived from the run
+seed and the iteration, so a resumed run continues exactly as the original one.
+
+The checkpoint is written into a temporary folder. The previous checkpoint is then renamed aside, the temporary folder
+renamed into its place and only then the previous one deleted, so a crash at any point leaves a complete checkpoint (the
+previous one is used if the crash came between the renames).
+"""
+import pickle
+import random
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from ml_deeco.utils import verbosePrint
+
+def _unpicklable(value, path="state"):
+    """Paths of the values of the state (in nested dicts) which cannot be pickled."""
+    if isinstance(value, dict):
+        return [p for key, item in value.items() for p in _unpicklable(item, f"{path}[{key!r}]")]
+    if isinstance(value, list) and all(isinstance(item, dict) for item in value):  # the states of the estimators
+        return [p for i, item in enumerate(value) for p in _unpicklable(item, f"{path}[{i}]")]
+    try:
+        pickle.dumps(value)
+        return []
+    except Exception as error:
+        return [f"{path} ({type(value).__name__}: {error})"]
+
+
+def _modelCheckpoint(estimator):
+    import tensorflow as tf
+    model = estimator._model
+    return tf.train.Checkpoint(model=model, optimizer=model.optimizer)
+
+
+class Checkpoint:
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.previous = self.folder.with_name(self.folder.name + ".old")
+
+    def _current(self):
+        """The checkpoint folder, or the previous checkpoint if a crash interrupted its replacement."""
+        return self.folder if (self.folder / "state.pkl").exists() else self.previous
+
+    def exists(self):
+        return (self._current() / "state.pkl").exists()
+
+    def save(self, experiment, finishedIterations):
+        temporary = self.folder.with_name(self.folder.name + ".tmp")
+        shutil.rmtree(temporary, ignore_errors=True)
+        temporary.mkdir(parents=True)
+
+        for e, estimator in enumerate(experiment.estimators):
+            if getattr(estimator, "_model", None) is not None:
+                _modelCheckpoint(estimator).write(str(temporary / f"estimator_{e}" / "model"))
+
+        state = {
+            "iterations": finishedIterations,
+            "random": random.getstate(),
+            "numpy": np.random.get_state(),
+            "experiment": experiment.checkpointState(),
+            "estimators": [estimator.checkpointState() for estimator in experiment.estimators],
+        }
+        with open(temporary / "state.pkl", "wb") as file:
+            try:
+                pickle.dump(state, file)
+            except Exception as error:
+                raise ValueError(f"The checkpoint cannot be saved, unpicklable values: {', '.join(_unpicklable(state))}") from error
+
+        if self.folder.exists():
+            shutil.rmtree(self.previous, ignore_errors=True)
+            self.folder.rename(self.previous)
+        temporary.rename(self.folder)
+        shutil.rmtree(self.previous, ignore_errors=True)
+
+    def restore(self, experiment):
+        """Restores the experiment from the checkpoint, returns the number of finished iterations."""
+        folder = self._current()
+        with open(folder / "state.pkl", "rb") as file:
+            state = pickle.load(file)
+
+        random.setstate(state["random"])
+        np.random.set_state(state["numpy"])
+        experiment.restoreCheckpointState(state["experiment"])
+        for e, (estimator, attributes) in enumerate(zip(experiment.estimators, state["estimators"])):
+            estimator.restoreCheckpointState(attributes)
+            if (folder / f"estimator_{e}").exists():
+                _modelCheckpoint(estimator).read(str(folder / f"estimator_{e}" / "model")).expect_partial()
+            if hasattr(estimator, "restoreModes"):
+                estimator.restoreModes()
+
+        verbosePrint(f"Resumed after iteration {state['iterations']}", 1)
+        return state["iterations"]
+
+
+def seedIteration(seed, iteration):
+    """Seeds TensorFlow (imported by the estimators of the experiment) by a seed derived from the run seed and the iteration."""
+    tf = sys.modules.get("tensorflow")
+    if tf is not None:  # an experiment without neural network estimators
+        tf.random.set_seed(int(np.random.SeedSequence([seed, iteration]).generate_state(1)[0]))
+
+
+def runSimulations(experiment, iteration):
+    """The simulations of one iteration (as in `Experiment.run` of ML-DEECo)."""
+    for simulation in range(experiment.config.simulations):
+        verbosePrint(f"Simulation {simulation + 1}", 2)
+        components, ensembles = experiment.prepareSimulation(iteration, simulation)
+        experiment.runSimulation(components, ensembles, iteration, simulation)
+        experiment.simulationCallback(components, ensembles, iteration, simulation)
+
+
+def runIterations(experiment, checkpoint: Checkpoint = None, resume=False, runIteration=runSimulations, baselineCache=None):
+    """
+    The iterations of the experiment (as in `Experiment.run` of ML-DEECo) with a checkpoint after each of them (if
+    given) and the first iteration loaded from the `baselineCache` (if given, see `common/cache.py`).
+    """
+    if resume and (checkpoint is None or not checkpoint.exists()):
+        raise ValueError("There is no checkpoint to resume from in the output folder.")
+    start = checkpoint.restore(experiment) if resume else 0
+    for i in range(start, experiment.config.iterations):
+        verbosePrint(f"Iteration {i + 1}", 1)
+        seedIteration(experiment.config.seed, i)
+        if i == 0 and baselineCache is not None and baselineCache.exists():
+            baselineCache.load(experiment)
+        elif i == 0 and baselineCache is not None:
+            baselineCache.begin(experiment)
+            runIteration(experiment, i)
+            baselineCache.store(experiment)
+        else:
+            runIteration(experiment, i)
+        if not experiment.iterationCallback(i):
+            for estimator in experiment.estimators:
+                estimator.endIteration()
+            experiment.trainingCallback(i)
+        if checkpoint is not None:
+            checkpoint.save(experiment, i + 1)
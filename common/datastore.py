@@ -0,0 +1,146 @@
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+
+class TrainingDataStore:
+    """
+    Append-only store of the (inputs, targets) rows collected for an estimator, kept in memory-mapped chunk files.
+
+    The rows are written into the current chunk (a preallocated `.npy` file of `chunkRows` rows opened as a memory map),
+    so the collected data stay on the disk and only the pages being written are in memory. The chunks are read back by
+    `batches` in a shuffled order, `window` chunks at a time, so the memory used by the training is bounded by the size
+    of the window regardless of the amount of the collected data.
+    """
+
+    def __init__(self, folder, chunkRows=65536, dtype=np.float32):
+        self.folder = Path(folder)
+        self.chunkRows = chunkRows
+        self.dtype = dtype
+        self.chunks = []  # (inputs file, targets file, rows) of the closed chunks
+        self._inputs = None
+        self._targets = None
+        self._rows = 0  # rows in the current chunk
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self):
+        return sum(rows for _, _, rows in self.chunks) + self._rows
+
+    def _openChunk(self, inputWidth, targetWidth):
+        name = self.folder / f"chunk_{len(self.chunks):05d}"
+        self._inputs = np.lib.format.open_memmap(f"{name}.x.npy", mode="w+", dtype=self.dtype, shape=(self.chunkRows, inputWidth))
+        self._targets = np.lib.format.open_memmap(f"{name}.y.npy", mode="w+", dtype=self.dtype, shape=(self.chunkRows, targetWidth))
+        self._rows = 0
+
+    def _closeChunk(self):
+        self._inputs.flush()
+        self._targets.flush()
+        self.chunks.append((self._inputs.filename, self._targets.filename, self._rows))
+        self._inputs = self._targets = None
+        self._rows = 0
+
+    def append(self, x, y):
+        self.appendMany(np.reshape(x, (1, -1)), np.reshape(y, (1, -1)))
+
+    def appendMany(self, X, Y):
+        """Appends the rows of the inputs `X` and targets `Y` (2D arrays with the same number of rows)."""
+        start = 0
+        while start < len(X):
+            if self._inputs is None:
+                self._openChunk(X.shape[1], Y.shape[1])
+            count = min(len(X) - start, self.chunkRows - self._rows)
+            self._inputs[self._rows:self._rows + count] = X[start:start + count]
+            self._targets[self._rows:self._rows + count] = Y[start:start + count]
+            self._rows += count
+            start += count
+            if self._rows == self.chunkRows:
+                self._closeChunk()
+
+    def flush(self):
+        """Closes the current chunk (if it has any rows), so that all the rows are in `chunks`."""
+        if self._inputs is not None and self._rows:
+            self._closeChunk()
+        self._writeManifest()
+
+    def _writeManifest(self):
+        with open(self.folder / "manifest.json", "w") as file:
+            json.dump({"chunks": [[str(x), str(y), rows] for x, y, rows in self.chunks]}, file)
+
+    def branch(self, name):
+        """New empty store in a subfolder (e.g. for a forked process), whose chunks are later `adopt`ed."""
+        return TrainingDataStore(self.folder / name, self.chunkRows, self.dtype)
+
+    def adopt(self, chunks):
+        """Adds the closed chunks of a branch to this store."""
+        if self._inputs is not None and self._rows:
+            self._closeChunk()
+        self.chunks.extend(chunks)
+        self._writeManifest()
+
+    @staticmethod
+    def exportChunks(chunks, folder):
+        """
+        Copies the chunks into the folder, returns them with the file names relative to it (see `importChunks`). The
+        files are numbered, as the chunks adopted from branches have the same names as the chunks of the store.
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        exported = []
+        for c, (inputsFile, targetsFile, rows) in enumerate(chunks):
+            inputsName, targetsName = f"{c:05d}_{Path(inputsFile).name}", f"{c:05d}_{Path(targetsFile).name}"
+            shutil.copy2(inputsFile, folder / inputsName)
+            shutil.copy2(targetsFile, folder / targetsName)
+            exported.append((inputsName, targetsName, rows))
+        return exported
+
+    def importChunks(self, chunks, folder, name="imported"):
+        """Copies the exported chunks from the folder into a subfolder of this store, returns them (to be `adopt`ed)."""
+        target = self.folder / name
+        target.mkdir(parents=True, exist_ok=True)
+        imported = []
+        for inputsFile, targetsFile, rows in chunks:
+            shutil.copy2(Path(folder) / inputsFile, target / inputsFile)
+            shutil.copy2(Path(folder) / targetsFile, target / targetsFile)
+            imported.append((str(target / inputsFile), str(target / targetsFile), rows))
+        return imported
+
+    def clear(self):
+        """Deletes all the rows (and their files)."""
+        self._inputs = self._targets = None
+        self._rows = 0
+        self.chunks = []
+        shutil.rmtree(self.folder, ignore_errors=True)
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _loadChunk(chunk):
+        inputsFile, targetsFile, rows = chunk
+        return np.load(inputsFile, mmap_mode="r")[:rows], np.load(targetsFile, mmap_mode="r")[:rows]
+
+    def batches(self, batchSize, seed=None, window=4, validationSplit=0.0, validation=False):
+        """
+        Yields shuffled batches of (inputs, targets) -- the chunks are taken in a random order, `window` at a time, and
+        the rows of the window are shuffled. With `validationSplit`, a fixed (seeded per chunk) random subset of the
+        rows of each chunk is held out and yielded only with `validation`.
+        """
+        self.flush()
+        rng = np.random.default_rng(seed)
+        order = rng.permutation(len(self.chunks)) if not validation else np.arange(len(self.chunks))
+        for start in range(0, len(order), window):
+            inputs, targets = [], []
+            for c in order[start:start + window]:
+                X, Y = self._loadChunk(self.chunks[c])
+                if validationSplit:
+                    heldOut = np.random.default_rng(int(c)).random(len(X)) < validationSplit
+                    selected = heldOut if validation else ~heldOut
+                    X, Y = X[selected], Y[selected]
+                inputs.append(np.asarray(X))
+                targets.append(np.asarray(Y))
+            X, Y = np.concatenate(inputs), np.concatenate(targets)
+            if not validation:
+                permutation = rng.permutation(len(X))
+                X, Y = X[permutation], Y[permutation]
+            for b in range(0, len(X), batchSize):
+                yield X[b:b + batchSize], Y[b:b + batchSize]
@@ -0,0 +1,473 @@
+import itertools
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from ml_deeco.utils import verbosePrint
+
+from common.datastore import TrainingDataStore
+from common.inference import NumpyNetwork, verifyParity
+
+
+class FeatureDomain:
+    """
+    Finite domain of one input feature -- the preprocessed encodings of all its values (one row per value).
+
+    The encodings are matched after rounding to `decimals` places, so an input computed by a different sequence of
+    float operations (e.g. `t / steps` of the estimate vs. of the domain) still finds its value.
+    """
+
+    def __init__(self, encodings, decimals=9):
+        self.encodings = np.array(encodings, dtype=float).reshape(len(encodings), -1)
+        self.width = self.encodings.shape[1]
+        self.decimals = decimals
+        self._indices = {self._key(row): index for index, row in enumerate(self.encodings)}
+
+    def __len__(self):
+        return len(self.encodings)
+
+    def _key(self, encoding):
+        return (np.round(np.asarray(encoding, dtype=float), self.decimals) + 0.0).tobytes()  # + 0.0 turns -0.0 into 0.0
+
+    def indexOf(self, encoding):
+        """Index of the value with the given encoding, `None` if it is not in the domain."""
+        return self._indices.get(self._key(encoding))
+
+    @staticmethod
+    def ofValues(feature, values):
+        """Domain of the values preprocessed by the `feature` (e.g. a `CategoricalFeature`)."""
+        return FeatureDomain([feature.preprocess(value) for value in values])
+
+
+class LookupTableMixin:
+    """
+    Estimator mode evaluating the model from a dense lookup table.
+
+    At the end of each iteration, the table and the cache are dropped before the model is trained (so the training and
+    the evaluation use the model itself) and `compile()` rebuilds them afterwards: it enumerates all combinations of the
+    values of the declared feature `domains`, evaluates the model for them in one batch and stores the outputs in a dense
+    table indexed by the indices of the values. Inputs outside the domains (and all inputs if no domains are declared)
+    are evaluated by the model, memoized in an LRU cache of at most `cacheSize` inputs; the number of such inputs is
+    reported at the end of the iteration.
+    """
+
+    def __init__(self, *args, domains=None, cacheSize=4096, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.domains = domains
+        self.cacheSize = cacheSize
+        self.tableMisses = 0  # inputs outside the domains in the current iteration
+        self._table = None
+        self._cache = OrderedDict()
+
+    def endIteration(self):
+        if self._table is not None:
+            verbosePrint(f"Lookup table: {self.tableMisses} inputs outside the domains (evaluated by the model)", 2)
+        self._table = None
+        self._cache.clear()
+        self.tableMisses = 0
+        super().endIteration()
+        self.compile()
+
+    def compile(self):
+        self._table = None
+        self._cache.clear()
+        if not self.domains:
+            return
+        rows = [np.concatenate(encodings) for encodings in itertools.product(*(d.encodings for d in self.domains))]
+        outputs = super().predictBatch(np.array(rows))
+        self._table = outputs.reshape(*(len(d) for d in self.domains), -1)
+
+    def _lookup(self, x):
+        indices = []
+        start = 0
+        for domain in self.domains:
+            index = domain.indexOf(x[start:start + domain.width])
+            if index is None:
+                return None
+            indices.append(index)
+            start += domain.width
+        return self._table[tuple(indices)]
+
+    def _predictCached(self, X):
+        outputs = [None] * len(X)
+        missing = []
+        for i, x in enumerate(X):
+            key = x.tobytes()
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                outputs[i] = self._cache[key]
+            else:
+                missing.append(i)
+
+        if missing:
+            predicted = super().predictBatch(X[missing])
+            for i, y in zip(missing, predicted):
+                outputs[i] = y
+                self._cache[X[i].tobytes()] = y
+            while len(self._cache) > self.cacheSize:
+                self._cache.popitem(last=False)
+        return outputs
+
+    def predictBatch(self, X):
+        X = np.asarray(X, dtype=float)
+        if self._table is None and not self.cacheSize:
+            return super().predictBatch(X)
+
+        outputs = [None] * len(X)
+        if self._table is not None:
+            for i, x in enumerate(X):
+                outputs[i] = self._lookup(x)
+        missing = [i for i, y in enumerate(outputs) if y is None]
+        if self._table is not None:
+            self.tableMisses += len(missing)
+        if missing:
+            if self.cacheSize:
+                predicted = self._predictCached(X[missing])
+            else:
+                predicted = super().predictBatch(X[missing])
+            for i, y in zip(missing, predicted):
+                outputs[i] = y
+        return np.array(outputs)
+
+    def predict(self, x):
+        return self.predictBatch(np.array([x]))[0]
+
+    def restoreModes(self):
+        super().restoreModes()
+        self.compile()
+
+
+class EstimatorModesMixin:
+    """
+    Default hooks of the estimator modes (the last base before `NeuralNetworkEstimator`).
+
+    Transfer of the collected training data from forked processes (see `smart_factory/parallel.py`): `forkData` is
+    called in the forked process before the simulation, `collectedData` returns what was collected since then (it must
+    be picklable) and `mergeData` adds it to the estimator in the main process. The estimator modes storing the data
+    elsewhere than in `data` override these.
+
+    `fitParams` are the parameters of the `fit` of the model (ML-DEECo's `_model`) in the modes training it themselves.
+    `checkpointState` returns the `checkpointAttributes` of the estimator and its modes (saved in a checkpoint with the
+    model, see `common/checkpoint.py`), `restoreModes` recomputes what the modes derive from the model after it is
+    restored. The modes
+    keeping the data outside `data` train the model before ML-DEECo's `endIteration`, which then sees no data and skips
+    its evaluation, so they log their own by `logEvaluation`.
+    """
+
+    checkpointAttributes = ("data", "_iteration")  # the collected data and the iteration counter of ML-DEECo
+
+    def fitParams(self, validation):
+        """Parameters of the `fit` (`validation` -- whether validation data are given)."""
+        fitParams = dict(self._fit_params)
+        fitParams.pop("validation_split", None)
+        return fitParams
+
+    def checkpointState(self):
+        """The `checkpointAttributes` declared by the classes of the estimator (those the estimator has)."""
+        names = {name for cls in type(self).__mro__ for name in vars(cls).get("checkpointAttributes", ())}
+        return {name: getattr(self, name) for name in sorted(names) if hasattr(self, name)}
+
+    def restoreCheckpointState(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def restoreModes(self):
+        """Called after the estimator is restored from a checkpoint (see `common/checkpoint.py`)."""
+
+    def logEvaluation(self, label, metrics):
+        """Prints the metrics (`model.evaluate(..., return_dict=True)`) of a training done by an estimator mode."""
+        name = getattr(self, 'name', type(self).__name__)
+        verbosePrint(f"{name}: {label}: " + ", ".join(f"{metric} = {value:.4g}" for metric, value in metrics.items()), 1)
+
+    def forkData(self, name):
+        self._forkedDataStart = len(self.data)
+
+    def collectedData(self):
+        return self.data[getattr(self, "_forkedDataStart", 0):]
+
+    def mergeData(self, data):
+        self.data.extend(data)
+
+
+class DataStoreMixin:
+    """
+    Estimator mode collecting the training data into a disk-backed `TrainingDataStore` instead of the memory.
+
+    At the end of the iteration, the model is trained from the store by a streamed, shuffled dataset (the batch size
+    and epochs are taken from the `fit_params`, a `validationSplit` fraction of the rows is held out for validation)
+    and evaluated on the validation rows, then the store is cleared and ML-DEECo finishes the iteration with no data in
+    the memory.
+    """
+
+    checkpointAttributes = ("dataStore", "_trainings")
+
+    def __init__(self, *args, dataStore: TrainingDataStore = None, validationSplit=0.2, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dataStore = dataStore
+        self.validationSplit = validationSplit
+        self._trainings = 0
+
+    def collectData(self, x, y):
+        if self.dataStore is None:
+            return super().collectData(x, y)
+        self.dataStore.append(x, y)
+
+    def endIteration(self):
+        if self.dataStore is not None and len(self.dataStore):
+            self.trainFromStore()
+            self.dataStore.clear()
+        super().endIteration()
+
+    def forkData(self, name):
+        if self.dataStore is None:
+            return super().forkData(name)
+        # the forked process writes its rows into its own chunks, the main process adopts them
+        self.dataStore = self.dataStore.branch(name)
+
+    def collectedData(self):
+        if self.dataStore is None:
+            return super().collectedData()
+        self.dataStore.flush()
+        return self.dataStore.chunks
+
+    def mergeData(self, data):
+        if self.dataStore is None:
+            return super().mergeData(data)
+        self.dataStore.adopt(data)
+
+    def _dataset(self, batchSize, seed, validation):
+        import tensorflow as tf
+        inputs, targets = self.dataStore.chunks[0][0], self.dataStore.chunks[0][1]
+        signature = (tf.TensorSpec((None, np.load(inputs, mmap_mode="r").shape[1]), tf.float32),
+                     tf.TensorSpec((None, np.load(targets, mmap_mode="r").shape[1]), tf.float32))
+        epochs = iter(range(1_000_000))  # a different shuffle in each epoch
+
+        def generate():
+            return self.dataStore.batches(batchSize, seed=seed + next(epochs), validationSplit=self.validationSplit, validation=validation)
+
+        return tf.data.Dataset.from_generator(generate, output_signature=signature).prefetch(2)
+
+    def trainFromStore(self):
+        """Trains the model on the rows of the store."""
+        self.dataStore.flush()
+        fitParams = self.fitParams(validation=bool(self.validationSplit))
+        batchSize = fitParams.pop("batch_size", 32)
+        seed = 1000 * self._trainings
+        self._trainings += 1
+        validation = self._dataset(batchSize, seed, validation=True) if self.validationSplit else None
+        history = self._model.fit(self._dataset(batchSize, seed, validation=False), validation_data=validation, **fitParams)
+        evaluated = validation if validation is not None else self._dataset(batchSize, seed, validation=False)
+        metrics = self._model.evaluate(evaluated, return_dict=True, verbose=0)
+        self.logEvaluation(f"{len(self.dataStore)} rows from the store, {'validation' if validation is not None else 'training'} data", metrics)
+        return history
+
+
+class CompactDataMixin:
+    """
+    Estimator mode aggregating the collected rows with the same inputs into one row.
+
+    Each distinct input vector keeps the number of its rows and the sum of its targets, so the collected data take
+    memory proportional to the size of the input domain. At the end of the iteration, the model is fitted on the
+    distinct inputs with the mean targets, weighted by the row counts (normalized to the mean of 1). For the binary
+    cross-entropy and the mean squared error, this is the same loss as on the original rows (up to a constant), with
+    far fewer rows per epoch. The fitted model is evaluated on the weighted compacted rows.
+    """
+
+    checkpointAttributes = ("_compactRows",)
+
+    def __init__(self, *args, compactData=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compactData = compactData
+        self._compactRows = {}  # input bytes -> [inputs, sum of targets, count]
+
+    def collectData(self, x, y):
+        if not self.compactData:
+            return super().collectData(x, y)
+        self.collectMany(np.reshape(x, (1, -1)), np.reshape(y, (1, -1)))
+
+    def collectMany(self, X, Y, counts=None):
+        """Adds rows of inputs `X` and targets `Y` (sums of the targets of `counts` rows each, if given)."""
+        X = np.asarray(X, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        for i, (x, y) in enumerate(zip(X, Y)):
+            count = 1 if counts is None else counts[i]
+            row = self._compactRows.get(x.tobytes())
+            if row is None:
+                self._compactRows[x.tobytes()] = [x, y.copy(), count]
+            else:
+                row[1] += y
+                row[2] += count
+
+    def compacted(self):
+        """Distinct inputs, mean targets and counts of the collected rows."""
+        if not self._compactRows:
+            return np.empty((0, 0)), np.empty((0, 0)), np.empty(0)
+        X, sums, counts = zip(*self._compactRows.values())
+        counts = np.array(counts, dtype=float)
+        return np.array(X), np.array(sums) / counts[:, None], counts
+
+    def endIteration(self):
+        if self.compactData and self._compactRows:
+            self.trainCompacted()
+            self._compactRows = {}
+        super().endIteration()
+
+    def trainCompacted(self):
+        """Trains the model on the compacted rows."""
+        X, Y, counts = self.compacted()
+        history = self._model.fit(X, Y, sample_weight=counts / counts.mean(), **self.fitParams(validation=False))
+        metrics = self._model.evaluate(X, Y, sample_weight=counts / counts.mean(), return_dict=True, verbose=0)
+        self.logEvaluation(f"{int(counts.sum())} rows ({len(X)} distinct), training data", metrics)
+        return history
+
+    def forkData(self, name):
+        if not self.compactData:
+            return super().forkData(name)
+        self._compactRows = {}
+
+    def collectedData(self):
+        if not self.compactData:
+            return super().collectedData()
+        X, Y, counts = self.compacted()
+        return X, Y * counts[:, None], counts
+
+    def mergeData(self, data):
+        if not self.compactData:
+            return super().mergeData(data)
+        self.collectMany(*data)
+
+
+class IncrementalTrainingMixin:
+    """
+    Estimator mode retraining the model incrementally between the iterations.
+
+    The model (with the state of its optimizer) is kept from the previous iteration and fitted only on the data
+    collected in the last iteration, extended by a replay sample of the older data (`replayFraction` of the new rows,
+    drawn from a reservoir of at most `replaySize` older rows). The fit stops when the validation loss (the loss, if
+    there are no validation data) has not improved for `patience` epochs, and the best weights are restored. The early
+    stopping also applies to the training of the `CompactDataMixin` and `DataStoreMixin` modes (without the replay).
+
+    The fit replaces the training step of `NeuralNetworkEstimator` (`train`), so ML-DEECo's `endIteration` still splits
+    the test data off, evaluates the model and clears the data.
+    """
+
+    checkpointAttributes = ("_replay", "_replaySeen", "_replayRandom")
+
+    def __init__(self, *args, replayFraction=0.2, replaySize=100_000, patience=3, validationSplit=0.2, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replayFraction = replayFraction
+        self.replaySize = replaySize
+        self.patience = patience
+        self.validationSplit = validationSplit
+        self._replay = []  # reservoir of the older rows
+        self._replaySeen = 0
+        self._replayRandom = np.random.default_rng(0)
+
+    def fitParams(self, validation):
+        import tensorflow as tf
+        fitParams = super().fitParams(validation)
+        earlyStopping = tf.keras.callbacks.EarlyStopping(monitor="val_loss" if validation else "loss", patience=self.patience, restore_best_weights=True)
+        fitParams["callbacks"] = list(fitParams.get("callbacks", [])) + [earlyStopping]
+        return fitParams
+
+    def _addToReplay(self, rows):
+        for row in rows:
+            self._replaySeen += 1
+            if len(self._replay) < self.replaySize:
+                self._replay.append(row)
+            else:
+                index = self._replayRandom.integers(self._replaySeen)
+                if index < self.replaySize:
+                    self._replay[index] = row
+
+    def train(self, x, y):
+        rows = list(zip(x, y))
+        history = self.trainIncrementally(rows)
+        self._addToReplay(rows)
+        return history
+
+    def trainIncrementally(self, rows):
+        """Fits the current model on the new rows and a replay sample of the older ones."""
+        replayCount = min(len(self._replay), int(self.replayFraction * len(rows)))
+        replay = [self._replay[i] for i in self._replayRandom.choice(len(self._replay), replayCount, replace=False)] if replayCount else []
+        permutation = self._replayRandom.permutation(len(rows) + len(replay))  # the validation split takes the last rows
+        X = np.array([x for x, _ in rows + replay])[permutation]
+        Y = np.array([y for _, y in rows + replay])[permutation]
+        validation = self.validationSplit > 0
+        fitParams = self.fitParams(validation)
+        if validation:
+            fitParams["validation_split"] = self.validationSplit
+        return self._model.fit(X, Y, **fitParams)
+
+
+class NumpyInferenceMixin:
+    """
+    Estimator mode evaluating the trained model by the NumPy runtime (see `common/inference.py`) instead of Keras.
+
+    After each training, the model is exported into a `NumpyNetwork` and its outputs are compared with the model on
+    random inputs; if the model cannot be exported or they differ by more than `parityTolerance`, the model stays
+    evaluated by Keras. The exported network
+    is saved with the model (`numpy_model<suffix>.npz`) together with the feature `encoders`, so it can be evaluated
+    without TensorFlow.
+    """
+
+    def __init__(self, *args, encoders=(), parityTolerance=1e-5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.encoders = list(encoders)
+        self.parityTolerance = parityTolerance
+        self.outputFolder = kwargs.get("outputFolder")
+        self.network = None
+
+    def endIteration(self):
+        self.network = None  # the model is trained (and evaluated) by Keras, not the network of the previous iteration
+        super().endIteration()
+        self.exportNetwork()
+
+    def exportNetwork(self):
+        self.network = None
+        name = getattr(self, 'name', type(self).__name__)
+        try:
+            network = NumpyNetwork.fromKeras(self._model)
+        except ValueError as error:  # a layer or activation the NumPy runtime does not support
+            verbosePrint(f"{name}: the model cannot be exported to NumPy ({error}), using the model", 1)
+            return
+        difference = verifyParity(self._model, network)
+        if difference > self.parityTolerance:
+            verbosePrint(f"{name}: the NumPy network differs from the model by {difference:.3g}, using the model", 1)
+            return
+        self.network = network
+
+    def predictBatch(self, X):
+        if self.network is None:
+            return super().predictBatch(X)
+        return self.network.predictBatch(X)
+
+    def predict(self, x):
+        if self.network is None:
+            return super().predict(x)
+        return self.network.predict(x)
+
+    def restoreModes(self):
+        super().restoreModes()
+        self.exportNetwork()
+
+    def saveModel(self, suffix=""):
+        super().saveModel(suffix)
+        if self.network is not None and self.outputFolder is not None:
+            self.network.save(Path(self.outputFolder) / f"numpy_model{suffix}.npz", self.encoders)
+
+
+def configureTensorFlow(seed, threads):
+    """Seeds TensorFlow and sets its number of threads (imports it, call it before the estimators are created)."""
+    import tensorflow as tf
+    tf.random.set_seed(seed)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+
+
+def neuralNetworkEstimatorClass(*mixins):
+    """`NeuralNetworkEstimator` extended by the given estimator modes (e.g. `LookupTableMixin`, `CompactDataMixin`)."""
+    from ml_deeco.estimators import NeuralNetworkEstimator  # imports TensorFlow
+    name = "".join(mixin.__name__[:-len("Mixin")] for mixin in mixins) + "NeuralNetworkEstimator"
+    return type(name, (*mixins, EstimatorModesMixin, NeuralNetworkEstimator), {})
@@ -0,0 +1,40 @@
+import heapq
+
+import numpy as np
+
+
+class EventQueue:
+    """
+    Priority queue of the wake-up times of entities given by integer indices.
+
+    Each entity has at most one pending wake-up; scheduling a new one replaces the previous one (the replaced entries
+    stay in the heap and are skipped when popped).
+    """
+
+    def __init__(self, capacity):
+        self.wakeUpTime = np.full(capacity, -1, dtype=np.int64)  # -1 = no pending wake-up
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, index, time):
+        self.wakeUpTime[index] = time
+        heapq.heappush(self._heap, (int(time), int(index)))
+
+    def scheduleMany(self, indices, times):
+        for index, time in zip(indices, times):
+            self.schedule(index, time)
+
+    def cancel(self, index):
+        self.wakeUpTime[index] = -1
+
+    def popDue(self, time):
+        """Removes and returns the indices of the entities due to wake up at (or before) `time`."""
+        due = []
+        while self._heap and self._heap[0][0] <= time:
+            wakeUpTime, index = heapq.heappop(self._heap)
+            if self.wakeUpTime[index] == wakeUpTime:
+                self.wakeUpTime[index] = -1
+                due.append(index)
+        return np.array(due, dtype=np.int64)
@@ -0,0 +1,153 @@
+"""
+TensorFlow-free inference of the trained estimators.
+
+The small dense networks of the estimators are exported by `NumpyNetwork.fromKeras` into a list of (weights, bias,
+activation) layers evaluated by plain NumPy, which avoids the framework overhead of Keras for the batches of 1 to 100
+rows evaluated during the simulation. The preprocessing of the features (the scaling of a `NumericFeature`, the
+one-hot encoding of a `CategoricalFeature`) is exported by `FeatureEncoder`, so a saved network together with its
+encoders can be evaluated on the raw values in a process which does not import TensorFlow.
+
+`verifyParity` compares the outputs with the Keras model. The parity of a saved network is checked by (run from the
+repository root):
+
+    python -m common.inference results/late_workers/model.h5 results/late_workers/numpy_model.npz
+"""
+import argparse
+
+import numpy as np
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+    "softmax": lambda x: (lambda e: e / e.sum(axis=-1, keepdims=True))(np.exp(x - x.max(axis=-1, keepdims=True))),
+}
+
+
+class NumpyNetwork:
+    """Forward pass of a sequence of dense layers."""
+
+    def __init__(self, layers):
+        for _, _, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation '{activation}'.")
+        self.layers = layers
+
+    @property
+    def inputWidth(self):
+        return self.layers[0][0].shape[0]
+
+    @staticmethod
+    def fromKeras(model):
+        """Exports the dense layers of the Keras model (the layers without weights, e.g. the input layer, are skipped)."""
+        layers = []
+        for layer in model.layers:
+            weights = layer.get_weights()
+            if not weights:
+                continue
+            if len(weights) != 2 or not hasattr(layer, "activation"):
+                raise ValueError(f"Only dense layers can be exported ('{layer.name}' is {type(layer).__name__}).")
+            kernel, bias = weights
+            layers.append((kernel.astype(np.float32), bias.astype(np.float32), layer.activation.__name__))
+        return NumpyNetwork(layers)
+
+    def predictBatch(self, X):
+        outputs = np.asarray(X, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            outputs = ACTIVATIONS[activation](outputs @ kernel + bias)
+        return outputs
+
+    def predict(self, x):
+        return self.predictBatch(np.reshape(x, (1, -1)))[0]
+
+    def save(self, filename, encoders=()):
+        arrays = {}
+        for i, (kernel, bias, activation) in enumerate(self.layers):
+            arrays[f"layer{i}_kernel"] = kernel
+            arrays[f"layer{i}_bias"] = bias
+            arrays[f"layer{i}_activation"] = np.array(activation)
+        for i, encoder in enumerate(encoders):
+            arrays.update({f"encoder{i}_{name}": value for name, value in encoder.toArrays().items()})
+        np.savez(filename, **arrays)
+
+    @staticmethod
+    def load(filename):
+        """Loads the network and its feature encoders (see `save`)."""
+        with np.load(filename) as file:
+            layers = []
+            while f"layer{len(layers)}_kernel" in file:
+                i = len(layers)
+                layers.append((file[f"layer{i}_kernel"], file[f"layer{i}_bias"], str(file[f"layer{i}_activation"])))
+            encoders = []
+            while f"encoder{len(encoders)}_encodings" in file:
+                prefix = f"encoder{len(encoders)}_"
+                encoders.append(FeatureEncoder.fromArrays({name[len(prefix):]: file[name] for name in file.files if name.startswith(prefix)}))
+        return NumpyNetwork(layers), encoders
+
+
+class FeatureEncoder:
+    """
+    Preprocessing of one input feature exported from its `preprocess` -- a table of the encodings of the given values
+    (a `CategoricalFeature`) or, without values, the affine scaling of a number (a `NumericFeature`).
+    """
+
+    def __init__(self, encodings, values=None):
+        self.encodings = np.array(encodings, dtype=np.float32).reshape(len(encodings), -1)
+        self.values = None if values is None else list(values)
+
+    @staticmethod
+    def ofFeature(feature, values=None):
+        if values is None:
+            # scaling: encoding(v) = encoding(0) + v * (encoding(1) - encoding(0))
+            return FeatureEncoder([feature.preprocess(0), feature.preprocess(1)])
+        return FeatureEncoder([feature.preprocess(value) for value in values], [int(value) for value in values])
+
+    def encode(self, values):
+        """Encodings of the values (one row per value)."""
+        if self.values is None:
+            values = np.asarray(values, dtype=np.float32).reshape(-1, 1)
+            return self.encodings[0] + values * (self.encodings[1] - self.encodings[0])
+        return self.encodings[[self.values.index(int(value)) for value in values]]
+
+    def toArrays(self):
+        arrays = {"encodings": self.encodings}
+        if self.values is not None:
+            arrays["values"] = np.array(self.values)
+        return arrays
+
+    @staticmethod
+    def fromArrays(arrays):
+        return FeatureEncoder(arrays["encodings"], arrays["values"].tolist() if "values" in arrays else None)
+
+
+def encodeInputs(encoders, columns):
+    """Model inputs of the raw values (one column of values per feature)."""
+    return np.concatenate([encoder.encode(column) for encoder, column in zip(encoders, columns)], axis=1)
+
+
+def verifyParity(model, network: NumpyNetwork, X=None, rows=256, seed=0):
+    """Maximal absolute difference of the outputs of the Keras model and the network (on `X` or random inputs)."""
+    if X is None:
+        X = np.random.default_rng(seed).random((rows, network.inputWidth), dtype=np.float32)
+    expected = np.asarray(model(np.asarray(X, dtype=np.float32)))
+    return float(np.abs(expected - network.predictBatch(X)).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the parity of an exported NumPy network with the Keras model.")
+    parser.add_argument('model', type=str, help='The saved Keras model.')
+    parser.add_argument('network', type=str, help='The exported NumPy network.')
+    parser.add_argument('--tolerance', type=float, help='Maximal allowed absolute difference of the outputs.', required=False, default=1e-5)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    network, _ = NumpyNetwork.load(args.network)
+    difference = verifyParity(tf.keras.models.load_model(args.model, compile=False), network)
+    print(f"Maximal absolute difference: {difference:.3g}")
+    if difference > args.tolerance:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import csv
+
+import numpy as np
+
+
+class ColumnarLog:
+    """
+    Drop-in replacement of `ml_deeco.utils.Log` storing the records in typed, growable NumPy arrays (one per column).
+
+    The data types of the columns are given by `dtypes` or inferred from the first registered record; an inferred type
+    is widened when a later value does not fit it (e.g. an int column getting a float becomes a float column). Besides
+    the `register`/`records`/`export` API of `Log`, whole batches of rows can be registered at once by `registerMany` and
+    the log can be exported to `.npz` (the columns which are not numeric as strings) and Parquet (requires `pyarrow`).
+    """
+
+    def __init__(self, header, dtypes=None, capacity=1024):
+        self.header = list(header)
+        self.dtypes = list(dtypes) if dtypes is not None else None
+        self._inferred = dtypes is None
+        self._capacity = capacity
+        self._columns = None
+        self._size = 0
+        if self.dtypes is not None:
+            self._allocate()
+
+    def __len__(self):
+        return self._size
+
+    def _allocate(self):
+        self._columns = [np.empty(self._capacity, dtype=dtype) for dtype in self.dtypes]
+
+    @staticmethod
+    def _inferDtype(value):
+        if isinstance(value, (bool, np.bool_)):
+            return np.dtype(np.bool_)
+        if isinstance(value, (int, np.integer)):
+            return np.dtype(np.int64)
+        if isinstance(value, (float, np.floating)):
+            return np.dtype(np.float64)
+        return np.dtype(object)
+
+    def _promote(self, dtypes):
+        """Widens the inferred types of the columns which cannot hold values of the given types."""
+        for c, dtype in enumerate(dtypes):
+            if dtype == self.dtypes[c]:
+                continue
+            promoted = np.promote_types(self.dtypes[c], dtype)
+            if promoted != self.dtypes[c]:
+                self.dtypes[c] = promoted
+                if self._columns is not None:
+                    self._columns[c] = self._columns[c].astype(promoted)
+
+    def _reserve(self, count):
+        if self._columns is None:
+            self._allocate()
+        if self._size + count <= self._capacity:
+            return
+        while self._size + count > self._capacity:
+            self._capacity *= 2
+        for c, column in enumerate(self._columns):
+            grown = np.empty(self._capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[c] = grown
+
+    def register(self, record):
+        if self.dtypes is None:
+            self.dtypes = [self._inferDtype(value) for value in record]
+        elif self._inferred:
+            self._promote([self._inferDtype(value) for value in record])
+        self._reserve(1)
+        for column, value in zip(self._columns, record):
+            column[self._size] = value
+        self._size += 1
+
+    def registerMany(self, columns):
+        """Registers a batch of rows given as one array (or sequence) per column."""
+        columns = [np.asarray(column) for column in columns]
+        count = len(columns[0])
+        if count == 0:
+            return
+        dtypes = [column.dtype if column.dtype.kind in "biuf" else np.dtype(object) for column in columns]
+        if self.dtypes is None:
+            self.dtypes = dtypes
+        elif self._inferred:
+            self._promote(dtypes)
+        self._reserve(count)
+        for column, values in zip(self._columns, columns):
+            column[self._size:self._size + count] = values
+        self._size += count
+
+    def getColumn(self, name):
+        """Array of the values of the column (a view, valid until the next registration)."""
+        if self._columns is None:
+            return np.empty(0)
+        return self._columns[self.header.index(name)][:self._size]
+
+    @property
+    def columns(self):
+        return [self.getColumn(name) for name in self.header]
+
+    @property
+    def records(self):
+        return [list(record) for record in zip(*(column.tolist() for column in self.columns))]
+
+    def split(self, name):
+        """Splits the log to one log (without the column `name`) per value of the column."""
+        values = self.getColumn(name)
+        header = [h for h in self.header if h != name]
+        logs = {}
+        for value in np.unique(values):
+            mask = values == value
+            log = ColumnarLog(header, [c.dtype for h, c in zip(self.header, self.columns) if h != name], capacity=max(int(mask.sum()), 1))
+            log.registerMany([c[mask] for h, c in zip(self.header, self.columns) if h != name])
+            logs[value.item() if hasattr(value, "item") else value] = log
+        return logs
+
+    def export(self, filename):
+        with open(filename, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.header)
+            writer.writerows(zip(*(column.tolist() for column in self.columns)))
+
+    def exportNpz(self, filename):
+        columns = [column if column.dtype.kind in "biuf" else column.astype(str) for column in self.columns]
+        np.savez_compressed(filename, **dict(zip(self.header, columns)))
+
+    def exportParquet(self, filename):
+        import pyarrow
+        import pyarrow.parquet
+        table = pyarrow.table({name: column.tolist() if column.dtype == object else column for name, column in zip(self.header, self.columns)})
+        pyarrow.parquet.write_table(table, filename)
+
+    def exportAs(self, filename, fileFormat="csv"):
+        """Exports the log to `filename` with the suffix of the `fileFormat` ("csv", "npz" or "parquet") appended."""
+        filename = f"{filename}.{fileFormat}"
+        if fileFormat == "csv":
+            self.export(filename)
+        elif fileFormat == "npz":
+            self.exportNpz(filename)
+        elif fileFormat == "parquet":
+            self.exportParquet(filename)
+        else:
+            raise ValueError(f"Unknown log format '{fileFormat}'.")
+
+    @classmethod
+    def loadNpz(cls, filename):
+        with np.load(filename) as data:
+            header = list(data.keys())
+            dtypes = [data[h].dtype if data[h].dtype.kind in "biuf" else object for h in header]  # strings are stored as objects
+            log = cls(header, dtypes, capacity=max(len(data[header[0]]), 1))
+            log.registerMany([data[h] for h in header])
+        return log
@@ -0,0 +1,152 @@
+"""
+Per-phase profiling of the experiments (`--profile` of the `run.py` scripts).
+
+`PROFILER.phase(name)` times a block, `PROFILER.instrument(obj, methods, prefix)` wraps methods of an object or a class
+with timers. Disabled (the default), `phase` returns a shared no-op context manager and nothing is instrumented. The times
+are inclusive (e.g. the inference inside an ensemble is counted in both), and the time of the simulation loop which is
+not in any of its top-level phases (the actuation of the components, the materialization and actuation of the
+ensembles, the step callback) is reported as `simulation/other` (e.g. the ensemble ordering and data collection of
+ML-DEECo).
+"""
+import contextlib
+import functools
+import json
+import time
+from collections import defaultdict
+
+
+class _Timer:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+
+    def __init__(self):
+        self.enabled = False
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.rows = defaultdict(int)  # batch sizes of the inference calls
+        self._instrumented = set()
+        self._start = None
+
+    def enable(self):
+        self.enabled = True
+        self._start = time.perf_counter()
+
+    def record(self, name, seconds, rows=None):
+        self.times[name] += seconds
+        self.calls[name] += 1
+        if rows is not None:
+            self.rows[name] += rows
+
+    def phase(self, name):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return _Timer(self, name)
+
+    def instrument(self, obj, methods, prefix, countRows=False):
+        """
+        Wraps the `methods` of `obj` (an instance or a class) by timers named `prefix.method`. With `countRows`, the
+        number of rows of the first argument (a batch) is counted as well. A method a class inherits already wrapped
+        (from an instrumented base class) is not wrapped again, so its calls are timed once, under the base class.
+        """
+        if not self.enabled:
+            return
+        for method in methods:
+            original = getattr(obj, method, None)
+            if original is None or (id(obj), method) in self._instrumented:
+                continue
+            if isinstance(obj, type) and method not in vars(obj) and getattr(original, "_profiled", False):
+                continue
+            self._instrumented.add((id(obj), method))
+            batchArgument = (1 if isinstance(obj, type) else 0) if countRows else None  # skip `self` of a class method
+            setattr(obj, method, self._wrap(original, f"{prefix}.{method}", batchArgument))
+
+    def instrumentClasses(self, objects, methods, prefix):
+        """Instruments the classes of the `objects` (per-class breakdown `prefix/ClassName.method`)."""
+        if not self.enabled:
+            return
+        for cls in {type(o) for o in objects}:
+            self.instrument(cls, methods, f"{prefix}/{cls.__name__}")
+
+    def instrumentExperiment(self, experiment, logClasses=()):
+        """Instruments the callbacks of the experiment, its estimators and the export of the logs."""
+        prepareSimulation = experiment.prepareSimulation
+
+        def prepareAndInstrument(*args, **kwargs):
+            # per-class breakdown of the components and ensembles of the simulation
+            components, ensembles = prepareSimulation(*args, **kwargs)
+            self.instrumentClasses(components, ["actuate"], "actuation")
+            allEnsembles = getattr(ensembles, "ensembles", ensembles)  # all of them, also of a `scheduling.EnsembleScheduler`
+            self.instrumentClasses(allEnsembles, ["situation", "actuate", "materialize"], "ensembles")
+            return components, ensembles
+
+        experiment.prepareSimulation = prepareAndInstrument
+        self.instrument(experiment, ["prepareSimulation", "runSimulation", "stepCallback", "simulationCallback",
+                                     "iterationCallback", "trainingCallback", "exportData"], "experiment")
+        for estimator in experiment.estimators:
+            name = getattr(estimator, "name", type(estimator).__name__)
+            self.instrument(estimator, ["predict", "predictBatch"], f"inference/{name}", countRows=True)
+            self.instrument(estimator, ["collectData"], f"collection/{name}")
+            self.instrument(estimator, ["endIteration", "compile"], f"training/{name}")
+        for cls in logClasses:
+            self.instrument(cls, ["export", "exportAvg", "exportAs"], f"export/{cls.__name__}")
+
+    def _wrap(self, function, name, batchArgument):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                rows = None
+                if batchArgument is not None and len(args) > batchArgument:
+                    rows = len(args[batchArgument]) if hasattr(args[batchArgument], "__len__") else 1
+                self.record(name, time.perf_counter() - start, rows)
+        timed._profiled = True
+        return timed
+
+    def summary(self):
+        total = time.perf_counter() - self._start
+        phases = {name: {"seconds": self.times[name], "calls": self.calls[name]} for name in sorted(self.times)}
+        for name, rows in self.rows.items():
+            phases[name]["rows"] = rows
+            phases[name]["mean_batch_size"] = rows / max(self.calls[name], 1)
+
+        simulation = self.times.get("experiment.runSimulation", 0)
+        # only the top-level phases -- the situations are evaluated inside the materialization, the inference inside both
+        topLevel = [name for name in self.times if name == "experiment.stepCallback" or
+                    (name.startswith("actuation/") and name.endswith(".actuate")) or
+                    (name.startswith("ensembles/") and name.endswith((".materialize", ".actuate")))]
+        if simulation:
+            phases["simulation/other"] = {"seconds": simulation - sum(self.times[name] for name in topLevel),
+                                          "calls": self.calls["experiment.runSimulation"]}
+        return {"total_seconds": total, "phases": phases}
+
+    def export(self, filename):
+        with open(filename, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def formatTable(self):
+        summary = self.summary()
+        total = summary["total_seconds"]
+        lines = [f"{'phase':<60} {'calls':>10} {'total [s]':>10} {'%':>6} {'mean [ms]':>10} {'batch':>8}"]
+        for name, phase in sorted(summary["phases"].items(), key=lambda p: -p[1]["seconds"]):
+            batch = f"{phase['mean_batch_size']:.1f}" if "mean_batch_size" in phase else ""
+            lines.append(f"{name:<60} {phase['calls']:>10} {phase['seconds']:>10.3f} {100 * phase['seconds'] / total:>6.1f} "
+                         f"{1000 * phase['seconds'] / max(phase['calls'], 1):>10.3f} {batch:>8}")
+        lines.append(f"{'total':<60} {'':>10} {total:>10.3f}")
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
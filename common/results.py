@@ -0,0 +1,185 @@
+import io
+import json
+import zipfile
+from collections import defaultdict
+
+import numpy as np
+
+
+def _toArray(values):
+    array = np.asarray(values)
+    if array.dtype != object:
+        return array
+    try:
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+    except (TypeError, ValueError):
+        return np.array([str(v) for v in values])
+
+
+def _logColumns(log):
+    """Columns of a `Log` (or `ColumnarLog`) as arrays."""
+    if hasattr(log, "columns"):
+        return [_toArray(column) for column in log.columns]
+    if not log.records:
+        return [np.empty(0) for _ in log.header]
+    return [_toArray(column) for column in zip(*log.records)]
+
+
+class ResultsWriter:
+    """
+    Streaming writer of all the logs of a run into one long-format container file.
+
+    The rows of each table (e.g. "machines", "maintenance", "workers") are extended by the `entity`, `iteration` and
+    `simulation` keys and buffered; every `chunkSize` rows, the buffered rows are written as one compressed chunk to the
+    container (a zip file). An index of the entities in the chunks is written when the writer is closed, so that
+    `ResultsReader` can read the series of one entity without loading the whole file. A container which was not closed
+    cannot be read (the zip directory is written on closing, too), so the writer has to be closed also when the run fails.
+    """
+
+    KEYS = ["entity", "iteration", "simulation"]
+
+    def __init__(self, filename, chunkSize=65536):
+        self.filename = filename
+        self.chunkSize = chunkSize
+        self._file = zipfile.ZipFile(filename, "w", compression=zipfile.ZIP_DEFLATED)
+        self._headers = {}
+        self._buffers = defaultdict(list)
+        self._bufferedRows = defaultdict(int)
+        self._index = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def append(self, table, header, columns, entity, iteration, simulation):
+        """
+        Appends rows given by `columns` (one array per item of the `header`) to the `table`. The `entity` is either one
+        id for all the rows or an array with an id per row.
+        """
+        header = list(header)
+        if table not in self._headers:
+            self._headers[table] = header
+        elif self._headers[table] != header:
+            raise ValueError(f"Header of table '{table}' does not match: {header} != {self._headers[table]}")
+
+        count = len(columns[0]) if columns else 0
+        if count == 0:
+            return
+        if np.ndim(entity) == 0:
+            entity = np.full(count, str(entity))
+        keys = [np.asarray(entity).astype(str), np.full(count, iteration), np.full(count, simulation)]
+        self._buffers[table].append(keys + [_toArray(column) for column in columns])
+        self._bufferedRows[table] += count
+        if self._bufferedRows[table] >= self.chunkSize:
+            self._flush(table)
+
+    def appendLog(self, table, log, entity, iteration, simulation):
+        self.append(table, log.header, _logColumns(log), entity, iteration, simulation)
+
+    def _flush(self, table):
+        parts = self._buffers.pop(table, [])
+        self._bufferedRows.pop(table, None)
+        if not parts:
+            return
+        columns = [np.concatenate(column) for column in zip(*parts)]
+        names = self.KEYS + self._headers[table]
+
+        data = io.BytesIO()
+        np.savez(data, **dict(zip(names, columns)))
+        member = f"{table}/{len(self._index):06d}.npz"
+        self._file.writestr(member, data.getvalue())
+        self._index.append({
+            "table": table,
+            "member": member,
+            "rows": len(columns[0]),
+            "entities": np.unique(columns[0]).tolist(),
+            "iterations": np.unique(columns[1]).tolist(),
+            "simulations": np.unique(columns[2]).tolist(),
+        })
+
+    def close(self):
+        if self._file is None:
+            return
+        for table in list(self._buffers):
+            self._flush(table)
+        self._file.writestr("index.json", json.dumps({"headers": self._headers, "chunks": self._index}))
+        self._file.close()
+        self._file = None
+
+
+class ResultsBuffer:
+    """
+    Collects the rows appended to a results container in memory (with the `ResultsWriter` API) so that they can be
+    replayed into the real writer later, e.g., in the main process after a simulation ran in a worker process.
+    """
+
+    def __init__(self):
+        self.appended = []
+
+    def append(self, table, header, columns, entity, iteration, simulation):
+        self.appended.append((table, list(header), [_toArray(column) for column in columns], entity, iteration, simulation))
+
+    def appendLog(self, table, log, entity, iteration, simulation):
+        self.append(table, log.header, _logColumns(log), entity, iteration, simulation)
+
+    def replay(self, writer):
+        for appended in self.appended:
+            writer.append(*appended)
+
+
+class ResultsReader:
+    """Reader of the container written by `ResultsWriter`."""
+
+    def __init__(self, filename):
+        self._file = zipfile.ZipFile(filename, "r")
+        index = json.loads(self._file.read("index.json"))
+        self.headers = index["headers"]
+        self._chunks = index["chunks"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def tables(self):
+        return list(self.headers)
+
+    def entities(self, table):
+        return sorted({e for chunk in self._chunks if chunk["table"] == table for e in chunk["entities"]})
+
+    def read(self, table, entity=None, iteration=None, simulation=None):
+        """
+        Reads the rows of the `table` as a dictionary of columns, optionally only of one entity, iteration or
+        simulation. Only the chunks containing the requested rows are loaded.
+        """
+        names = ResultsWriter.KEYS + self.headers[table]
+        parts = []
+        for chunk in self._chunks:
+            if chunk["table"] != table:
+                continue
+            if entity is not None and str(entity) not in chunk["entities"]:
+                continue
+            if iteration is not None and iteration not in chunk["iterations"]:
+                continue
+            if simulation is not None and simulation not in chunk["simulations"]:
+                continue
+            with np.load(io.BytesIO(self._file.read(chunk["member"]))) as data:
+                columns = [data[name] for name in names]
+            mask = np.ones(chunk["rows"], dtype=bool)
+            if entity is not None:
+                mask &= columns[0] == str(entity)
+            if iteration is not None:
+                mask &= columns[1] == iteration
+            if simulation is not None:
+                mask &= columns[2] == simulation
+            parts.append([column[mask] for column in columns])
+
+        if not parts:
+            return {name: np.empty(0) for name in names}
+        return {name: np.concatenate(column) for name, column in zip(names, zip(*parts))}
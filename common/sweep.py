@@ -0,0 +1,127 @@
+"""
+Parallel parameter sweep over the `run.py` arguments of the simulations.
+
+Every combination of the grid values and seeds is run as a separate `run.py` process (so the runs are deterministic per
+seed and independent of each other), at most `--jobs` at once, each with a budget of `--threads` CPU threads. The
+summary of each run (`shifts_avg.csv` of the smart factory, `running_times.csv` of the production machines) is
+collected into one aggregated table.
+
+Example (run from the repository root):
+
+    py -m common.sweep smart_factory -g late=0.1,0.2,0.3 -g baseline=16 --seeds 42 43 44 -o results/sweep
+"""
+import argparse
+import csv
+import itertools
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SUMMARIES = {
+    "smart_factory": "shifts_avg.csv",
+    "machine_failure": "running_times.csv",
+}
+
+
+def parseGrid(grid):
+    """Parses `name=value1,value2,...` items to a dictionary of the value lists."""
+    result = {}
+    for item in grid:
+        name, values = item.split("=", 1)
+        result[name] = values.split(",")
+    return result
+
+
+def runArguments(params, seed, threads, output):
+    arguments = ["--seed", str(seed), "--threads", str(threads), "--output", str(output)]
+    for name, value in params.items():
+        if value.lower() == "true":  # flags (`store_true` arguments)
+            arguments.append(f"--{name}")
+        elif value.lower() != "false":
+            arguments += [f"--{name}", value]
+    return arguments
+
+
+def runName(params, seed):
+    return "_".join([f"{name}={value}" for name, value in params.items()] + [f"seed={seed}"])
+
+
+def threadEnvironment(threads):
+    """Environment limiting the number of threads of the numeric libraries used by the run."""
+    env = dict(os.environ)
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        env[variable] = str(threads)
+    env.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    return env
+
+
+def run(simulation, params, seed, threads, output):
+    output.mkdir(parents=True, exist_ok=True)
+    command = [sys.executable, "run.py"] + runArguments(params, seed, threads, output.resolve())
+    with open(output / "stdout.txt", "w") as stdout:
+        process = subprocess.run(command, cwd=ROOT / simulation, env=threadEnvironment(threads), stdout=stdout, stderr=subprocess.STDOUT)
+    return process.returncode
+
+
+def aggregate(simulation, runs, filename):
+    """Collects the summaries of the runs into one table with the parameters and the seed of the run as columns."""
+    header = None
+    rows = []
+    for params, seed, output in runs:
+        summary = output / SUMMARIES[simulation]
+        if not summary.exists():
+            continue
+        with open(summary, newline="") as file:
+            reader = csv.reader(file)
+            runHeader = next(reader)
+            if header is None:
+                header = list(params) + ["seed"] + runHeader
+            for row in reader:
+                rows.append(list(params.values()) + [seed] + row)
+
+    if header is None:
+        return
+    with open(filename, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel parameter sweep of the simulations')
+    parser.add_argument('simulation', type=str, choices=list(SUMMARIES), help='Simulation to run.')
+    parser.add_argument('-g', '--grid', type=str, action='append', help="Values of a run.py argument: 'name=value1,value2'.", required=False, default=[])
+    parser.add_argument('-s', '--seeds', type=int, nargs='+', help='Random seeds.', required=False, default=[42])
+    parser.add_argument('-j', '--jobs', type=int, help='Number of runs in parallel (default is CPU count / threads).', required=False, default=None)
+    parser.add_argument('--threads', type=int, help='Number of CPU threads of each run.', required=False, default=1)
+    parser.add_argument('-o', '--output', type=str, help='Output folder for the runs.', required=False, default='results/sweep')
+    args = parser.parse_args()
+
+    grid = parseGrid(args.grid)
+    jobs = args.jobs or max(1, (os.cpu_count() or 1) // args.threads)
+    output = Path(args.output)
+
+    runs = []
+    for values in itertools.product(*grid.values()):
+        params = dict(zip(grid, values))
+        for seed in args.seeds:
+            runs.append((params, seed, output / runName(params, seed)))
+
+    print(f"Running {len(runs)} runs of {args.simulation}, {jobs} in parallel.")
+    with ThreadPoolExecutor(max_workers=jobs) as executor:  # each run is a separate process, the threads only wait for them
+        returnCodes = list(executor.map(lambda r: run(args.simulation, r[0], r[1], args.threads, r[2]), runs))
+
+    for (params, seed, runOutput), returnCode in zip(runs, returnCodes):
+        if returnCode != 0:
+            print(f"Run {runOutput} failed with exit code {returnCode}, see {runOutput / 'stdout.txt'}.")
+
+    aggregate(args.simulation, runs, output / "sweep.csv")
+    print(f"Aggregated results saved to {output / 'sweep.csv'}.")
+
+
+if __name__ == "__main__":
+    main()
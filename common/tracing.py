@@ -0,0 +1,264 @@
+"""
+Structured tracing of the hot-path events of the simulations.
+
+An event is declared once by `traceEvent` with its verbosity level, a message template and the types of its arguments.
+`TRACER.emit(event, *args)` first compares the level of the event with the configured one, so a disabled event costs
+one comparison and nothing is formatted. Without a trace file, the enabled events are formatted and printed by
+`verbosePrint` (as before). With a trace file, they are encoded into compact binary records, which are put into a ring
+buffer and written to the file by a background thread. The trace file is rendered into the text messages offline:
+
+    python -m common.tracing results/trace.bin
+
+Argument types: `s` string (interned, the strings are written only once), `l` list of strings, `i` integer, `f` float,
+`b` bool.
+"""
+import argparse
+import struct
+import sys
+import threading
+
+from ml_deeco.utils import verbosePrint
+
+MAGIC = b"MLDEECO-TRACE-1\n"
+
+# record kinds
+_STRING = 0
+_EVENT = 1
+_RECORD = 2
+
+_HEADER = struct.Struct("<BH")  # kind, event id
+_STRING_HEADER = struct.Struct("<BII")  # kind, string id, length
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+_BOOL = struct.Struct("<?")
+_ID = struct.Struct("<I")
+
+
+class TraceEvent:
+
+    def __init__(self, id, name, level, template, argTypes):
+        self.id = id
+        self.name = name
+        self.level = level
+        self.template = template
+        self.argTypes = argTypes
+
+    def format(self, args):
+        return self.template.format(*(_formatList(a) if t == "l" else a for t, a in zip(self.argTypes, args)))
+
+
+def _formatList(values):
+    return "[" + ", ".join(map(str, values)) + "]"
+
+
+_EVENTS = []
+
+
+def traceEvent(name, level, template, argTypes=""):
+    """Declares a trace event (at the module level)."""
+    event = TraceEvent(len(_EVENTS), name, level, template, argTypes)
+    _EVENTS.append(event)
+    return event
+
+
+class RingBuffer:
+    """Byte ring buffer of one producer (the simulation) and one consumer (the writer thread)."""
+
+    def __init__(self, size):
+        self.size = size
+        self._buffer = bytearray(size)
+        self._start = 0  # total bytes read
+        self._end = 0  # total bytes written
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def write(self, data):
+        # a record larger than the buffer is written in buffer-sized pieces (the consumer sees one stream of bytes)
+        for start in range(0, len(data), self.size):
+            self._writePiece(data[start:start + self.size])
+
+    def _writePiece(self, data):
+        with self._condition:
+            while self.size - (self._end - self._start) < len(data):  # full -- wait for the writer
+                self._condition.notify_all()
+                self._condition.wait()
+            position = self._end % self.size
+            first = min(len(data), self.size - position)
+            self._buffer[position:position + first] = data[:first]
+            self._buffer[:len(data) - first] = data[first:]
+            self._end += len(data)
+            if self._end - self._start >= self.size // 2:
+                self._condition.notify_all()
+
+    def read(self, timeout=0.5):
+        """Returns all the buffered bytes (waits for at least half a buffer, the timeout or closing), `None` at the end."""
+        with self._condition:
+            if not self._closed and self._end - self._start < self.size // 2:
+                self._condition.wait(timeout)
+            if self._closed and self._end == self._start:
+                return None
+            start, end = self._start % self.size, self._end % self.size
+            if self._end - self._start == self.size or end < start:
+                data = bytes(self._buffer[start:]) + bytes(self._buffer[:end])
+            else:
+                data = bytes(self._buffer[start:end])
+            self._start = self._end
+            self._condition.notify_all()
+            return data
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class Tracer:
+
+    def __init__(self):
+        self.level = 0
+        self._buffer = None
+        self._writer = None
+        self._strings = {}
+        self._declared = set()
+
+    def configure(self, level, filename=None, bufferSize=1 << 20):
+        """Sets the level of the enabled events and, optionally, the binary trace file to write them into."""
+        self.close()
+        self.level = level
+        if filename is not None:
+            self._strings = {}
+            self._declared = set()
+            self._buffer = RingBuffer(bufferSize)
+            self._writer = threading.Thread(target=self._write, args=(filename, self._buffer), daemon=True, name="trace-writer")
+            self._writer.start()
+
+    def enabled(self, level):
+        return level <= self.level
+
+    def emit(self, event: TraceEvent, *args):
+        if event.level > self.level:
+            return
+        if self._buffer is None:
+            verbosePrint(event.format(args), event.level)
+        else:
+            self._buffer.write(self._encode(event, args))
+
+    def _string(self, value, parts):
+        value = str(value)
+        id = self._strings.get(value)
+        if id is None:
+            id = self._strings[value] = len(self._strings)
+            encoded = value.encode()
+            parts.append(_STRING_HEADER.pack(_STRING, id, len(encoded)))
+            parts.append(encoded)
+        return id
+
+    def _encode(self, event, args):
+        parts = []
+        if event.id not in self._declared:
+            self._declared.add(event.id)
+            ids = [self._string(value, parts) for value in (event.name, event.level, event.template, event.argTypes)]
+            parts.append(_HEADER.pack(_EVENT, event.id))
+            parts.extend(_ID.pack(id) for id in ids)
+
+        payload = []
+        for argType, arg in zip(event.argTypes, args):
+            if argType == "s":
+                payload.append(_ID.pack(self._string(arg, parts)))
+            elif argType == "l":
+                payload.append(_ID.pack(len(arg)))
+                payload.extend(_ID.pack(self._string(a, parts)) for a in arg)
+            elif argType == "i":
+                payload.append(_INT.pack(arg))
+            elif argType == "f":
+                payload.append(_FLOAT.pack(arg))
+            else:
+                payload.append(_BOOL.pack(arg))
+        parts.append(_HEADER.pack(_RECORD, event.id))
+        parts.extend(payload)
+        return b"".join(parts)
+
+    @staticmethod
+    def _write(filename, buffer):
+        with open(filename, "wb") as file:
+            file.write(MAGIC)
+            while (data := buffer.read()) is not None:
+                file.write(data)
+
+    def detach(self):
+        """Stops writing into the trace file without flushing it (in a forked process, where the writer is not running)."""
+        self._buffer = None
+        self._writer = None
+
+    def close(self):
+        """Flushes and closes the trace file (if any)."""
+        if self._buffer is not None:
+            self._buffer.close()
+            self._writer.join()
+            self._buffer = None
+            self._writer = None
+
+
+TRACER = Tracer()
+
+
+def decode(filename):
+    """Yields the `(level, message)` of the events recorded in the trace file."""
+    with open(filename, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{filename} is not a trace file")
+
+    strings = {}
+    events = {}
+    position = len(MAGIC)
+
+    def readId():
+        nonlocal position
+        value, = _ID.unpack_from(data, position)
+        position += _ID.size
+        return value
+
+    while position < len(data):
+        kind, = struct.unpack_from("<B", data, position)
+        if kind == _STRING:
+            _, id, length = _STRING_HEADER.unpack_from(data, position)
+            position += _STRING_HEADER.size
+            strings[id] = data[position:position + length].decode()
+            position += length
+            continue
+
+        _, eventId = _HEADER.unpack_from(data, position)
+        position += _HEADER.size
+        if kind == _EVENT:
+            name, level, template, argTypes = (strings[readId()] for _ in range(4))
+            events[eventId] = TraceEvent(eventId, name, int(level), template, argTypes)
+            continue
+
+        event = events[eventId]
+        args = []
+        for argType in event.argTypes:
+            if argType == "s":
+                args.append(strings[readId()])
+            elif argType == "l":
+                args.append([strings[readId()] for _ in range(readId())])
+            else:
+                struct_ = {"i": _INT, "f": _FLOAT, "b": _BOOL}[argType]
+                args.append(struct_.unpack_from(data, position)[0])
+                position += struct_.size
+        yield event.level, event.format(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renders a binary trace file into the text messages.")
+    parser.add_argument('file', type=str, help='The trace file.')
+    parser.add_argument('-v', '--verbose', type=int, help='Render only the events up to this level.', required=False, default=None)
+    args = parser.parse_args()
+
+    for level, message in decode(args.file):
+        if args.verbose is None or level <= args.verbose:
+            sys.stdout.write(message + "\n")
+
+
+if __name__ == '__main__':
+    main()
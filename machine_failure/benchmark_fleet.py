@@ -0,0 +1,57 @@
+"""
+Scaling benchmark of the per-object simulation (`ProductionMachine`) against the vectorized fleet (`MachineFleet`).
+
+Runs one simulation of the Proactive (Rigid) baseline for increasing numbers of machines and reports the steps per second.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")  # Report only TF errors by default
+
+from configuration import CONFIGURATION
+
+
+def benchmark(machineCount, fleet, steps):
+    from run import ProductionMachineExperiment, createArgumentParser
+
+    random.seed(42)
+    np.random.seed(42)
+    CONFIGURATION.machineCount = machineCount
+    CONFIGURATION.steps = steps
+
+    with tempfile.TemporaryDirectory() as output:
+        args = createArgumentParser().parse_args(["-v", "0", "-o", output, "-i", "1", "-b", "-m", str(machineCount)] + (["-f"] if fleet else []))
+        experiment = ProductionMachineExperiment(args)
+        components, ensembles = experiment.prepareSimulation(0, 0)
+
+        start = time.perf_counter()
+        experiment.runSimulation(components, ensembles, 0, 0)
+        elapsed = time.perf_counter() - start
+
+    return steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the production machines simulation')
+    parser.add_argument('-m', '--machines', type=int, nargs='+', help='Numbers of machines to benchmark.', required=False, default=[100, 1000, 10000, 100000])
+    parser.add_argument('--object_limit', type=int, help='Largest number of machines to run with the per-object simulation.', required=False, default=10000)
+    parser.add_argument('-s', '--steps', type=int, help='Number of steps of the simulation.', required=False, default=200)
+    args = parser.parse_args()
+
+    print(f"{'machines':>10} {'objects [steps/s]':>18} {'fleet [steps/s]':>16} {'speedup':>8}")
+    for machineCount in args.machines:
+        fleetRate = benchmark(machineCount, True, args.steps)
+        if machineCount <= args.object_limit:
+            objectRate = benchmark(machineCount, False, args.steps)
+            print(f"{machineCount:>10} {objectRate:>18.1f} {fleetRate:>16.1f} {fleetRate / objectRate:>7.1f}x")
+        else:
+            print(f"{machineCount:>10} {'-':>18} {fleetRate:>16.1f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
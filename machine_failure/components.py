@@ -1,15 +1,24 @@
-from ml_deeco.estimators import TimeEstimate, NumericFeature
+import numpy as np
+
+from ml_deeco.estimators import TimeEstimate
 from ml_deeco.simulation import Component
 
 from configuration import CONFIGURATION
-from ml_deeco.utils import verbosePrint, Log
+from features import failureRateFeature, timeSinceRepairFeature
+from ml_deeco.utils import Log
+
+from common.tracing import TRACER, traceEvent  # `common` is added to the path by `run.py`
+
+expectingFailureEvent = traceEvent("expectingFailure", 3, "{0}: Expecting failure in {1:.0f} time steps, calling maintenance.", "sf")
+machineFailedEvent = traceEvent("machineFailed", 3, "{0}: Machine failed, calling maintenance.", "s")
 
 
 class ProductionMachine(Component):
 
-    def __init__(self, experiment):
+    def __init__(self, experiment, index):
         super().__init__()
         self.experiment = experiment
+        self.index = index  # index of the random stream (see `CONFIGURATION.randomStreams`)
 
         self.isRunning = True
         self.failureRate = 0
@@ -22,11 +31,11 @@ class ProductionMachine(Component):
 
     timeToFailure = TimeEstimate().using(CONFIGURATION.timeToFailureEstimator)
 
-    @timeToFailure.input(NumericFeature(0, 1))
+    @timeToFailure.input(failureRateFeature)
     def failure_rate(self):
         return self.failureRate
 
-    @timeToFailure.input(NumericFeature(0, 100))
+    @timeToFailure.input(timeSinceRepairFeature)
     def time_since_repair(self):
         return self.timeSinceLastRepair
 
@@ -61,20 +70,19 @@ class ProductionMachine(Component):
             self.timeToRepair = CONFIGURATION.timeToRepair
             self.maintenanceLog.register([self.experiment.currentTimeStep, self.timeSinceLastRepair, self.isRunning, expectedFailure])
             if expectedFailure:
-                verbosePrint(f"{self.id}: Expecting failure in {expectedFailure:.0f} time steps, calling maintenance.", 3)
+                TRACER.emit(expectingFailureEvent, self.id, expectedFailure)
             else:
-                verbosePrint(f"{self.id}: Machine failed, calling maintenance.", 3)
+                TRACER.emit(machineFailedEvent, self.id)
         else:
             pass  # maintenance is already called
 
     def simulateFailureRate(self):
-        self.failureRate = CONFIGURATION.getFailureRate(self.failureRate, self.timeSinceLastRepair)
+        self.failureRate = CONFIGURATION.getFailureRate(self.failureRate, self.timeSinceLastRepair, self.index)
         self.failureRate = max(self.failureRate, 0)
         self.timeSinceLastRepair += 1
 
-    def preventFailure(self):
+    def preventFailure(self, timeToFailure):
         """Call the maintenance if we predict the machine will fail soon"""
-        timeToFailure = self.timeToFailure()
         if timeToFailure is None:  # baseline without failure prevention
             return
 
@@ -82,6 +90,10 @@ class ProductionMachine(Component):
             # Call maintenance
             self.callMaintenance(timeToFailure)
 
+    def checkFailure(self):
+        if self.failureRate >= CONFIGURATION.failureThreshold:
+            self.fail()
+
     def actuate(self):
         if self.timeToRepair > 0:
             self.timeToRepair -= 1
@@ -90,6 +102,54 @@ class ProductionMachine(Component):
 
         if self.isRunning:
             self.simulateFailureRate()
-            self.preventFailure()
-            if self.failureRate >= CONFIGURATION.failureThreshold:
-                self.fail()
+            if self.experiment.config.batch:
+                return  # the failure prevention is done by the `TimeToFailureBatch` after all machines are actuated
+            self.preventFailure(self.timeToFailure())
+            self.checkFailure()
+
+
+class TimeToFailureBatch(Component):
+    """
+    Batched evaluation phase of `ProductionMachine.timeToFailure`.
+
+    It is actuated after all the machines. Once the model is trained, the estimate is evaluated for all running
+    machines by one `predictBatch` call (see `predictTimeToFailure`) and each machine gets its result before deciding
+    whether to call maintenance.
+    """
+
+    def __init__(self, experiment, machines):
+        super().__init__()
+        self.experiment = experiment
+        self.machines = machines
+
+    def actuate(self):
+        running = [machine for machine in self.machines if machine.is_running()]
+        if self.experiment.modelTrained:
+            timesToFailure = predictTimeToFailure([m.failure_rate() for m in running], [m.time_since_repair() for m in running])
+        else:
+            timesToFailure = [machine.timeToFailure() for machine in running]  # baseline
+
+        for machine, timeToFailure in zip(running, timesToFailure):
+            machine.preventFailure(timeToFailure)
+            machine.checkFailure()
+
+
+def _preprocessColumn(feature, values):
+    return np.reshape(feature.preprocess(np.asarray(values, dtype=float)), (len(values), -1))
+
+
+def timeToFailureInputs(failureRate, timeSinceLastRepair):
+    """Inputs of `ProductionMachine.timeToFailure` preprocessed by the `preprocess` of its input features (vectorized)."""
+    return np.concatenate([_preprocessColumn(failureRateFeature, failureRate), _preprocessColumn(timeSinceRepairFeature, timeSinceLastRepair)], axis=1)
+
+
+def predictTimeToFailure(failureRate, timeSinceLastRepair):
+    """
+    Times to failure predicted by the trained model for the inputs of `ProductionMachine.timeToFailure` (one forward
+    pass). The model predicts the time divided by the number of steps (the time target of the estimate and the targets
+    of `fleet.MachineFleet`, see `MachineFleet.collectTrainingData`).
+    """
+    if len(failureRate) == 0:
+        return np.zeros(0)
+    outputs = CONFIGURATION.timeToFailureEstimator.predictBatch(timeToFailureInputs(failureRate, timeSinceLastRepair))
+    return outputs.reshape(-1) * CONFIGURATION.steps
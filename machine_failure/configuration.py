@@ -13,27 +13,66 @@ class Configuration:
     timeToRepair = 30
     machineCount = 100
     # machineCount = 10
+    fleetLoggedMachines = 100  # in the fleet mode, the per-step log is kept only for the first machines
 
-    def getFailureRate(self, lastFailureRate, timeSinceLastRepair):
-        # return self._failureRateSigmoid(timeSinceLastRepair)
-        # return self._failureRateExp(timeSinceLastRepair)
-        return self._failureRateCategorical(lastFailureRate)
+    randomStreams = None  # per-machine random streams (`random_streams.RandomStreams`), the global NumPy RNG is used if None
 
-    @staticmethod
-    def _failureRateSigmoid(timeSinceLastRepair):
+    def getFailureRate(self, lastFailureRate, timeSinceLastRepair, machine):
+        # return self._failureRateSigmoid(timeSinceLastRepair, machine)
+        # return self._failureRateExp(timeSinceLastRepair, machine)
+        return self._failureRateCategorical(lastFailureRate, machine)
+
+    def getFailureRates(self, lastFailureRates, timesSinceLastRepair, machines):
+        """Vectorized `getFailureRate` for a whole fleet of machines (see `fleet.MachineFleet`)."""
+        # return self._failureRatesSigmoid(timesSinceLastRepair, machines)
+        # return self._failureRatesExp(timesSinceLastRepair, machines)
+        return self._failureRatesCategorical(lastFailureRates, machines)
+
+    def _normal(self, mean, var, machine):
+        if self.randomStreams is None:
+            return np.random.normal(mean, var)
+        return mean + var * self.randomStreams.drawOne("normal", machine)
+
+    def _increment(self, machine):
+        if self.randomStreams is None:
+            return np.random.choice([0, 0.05], p=[0.9, 0.1])
+        return 0.05 if self.randomStreams.drawOne("uniform", machine) >= 0.9 else 0  # same as `np.random.choice`
+
+    def _failureRateSigmoid(self, timeSinceLastRepair, machine):
         mean = 0.5 / (1 + math.exp(-0.1 * (timeSinceLastRepair - 60)))  # sigmoid, > 0.4 around x == 75
         var = 0.01 + timeSinceLastRepair / 2500
-        return np.random.normal(mean, var)
+        return self._normal(mean, var, machine)
 
-    @staticmethod
-    def _failureRateExp(timeSinceLastRepair):
+    def _failureRateExp(self, timeSinceLastRepair, machine):
         mean = (1.1 ** (timeSinceLastRepair - 100)) / 2  # exponential, at x == 100 => return 0.5 (which is failThreshold)
         var = 0.01 + timeSinceLastRepair / 2500
-        return np.random.normal(mean, var)
+        return self._normal(mean, var, machine)
+
+    def _failureRateCategorical(self, lastFailureRate, machine):
+        return lastFailureRate + self._increment(machine)
+
+    def _normals(self, mean, var, machines):
+        if self.randomStreams is None:
+            return np.random.normal(mean, var)
+        return mean + var * self.randomStreams.normal(machines)
+
+    def _increments(self, machines):
+        if self.randomStreams is None:
+            return np.random.choice([0, 0.05], p=[0.9, 0.1], size=len(machines))
+        return np.where(self.randomStreams.uniform(machines) >= 0.9, 0.05, 0)
+
+    def _failureRatesSigmoid(self, timesSinceLastRepair, machines):
+        mean = 0.5 / (1 + np.exp(-0.1 * (timesSinceLastRepair - 60)))
+        var = 0.01 + timesSinceLastRepair / 2500
+        return self._normals(mean, var, machines)
+
+    def _failureRatesExp(self, timesSinceLastRepair, machines):
+        mean = (1.1 ** (timesSinceLastRepair - 100.)) / 2
+        var = 0.01 + timesSinceLastRepair / 2500
+        return self._normals(mean, var, machines)
 
-    @staticmethod
-    def _failureRateCategorical(lastFailureRate):
-        return lastFailureRate + np.random.choice([0, 0.05], p=[0.9, 0.1])
+    def _failureRatesCategorical(self, lastFailureRates, machines):
+        return lastFailureRates + self._increments(machines)
 
     def __init__(self):
         if 'CONFIGURATION' in locals():
@@ -0,0 +1,6 @@
+from ml_deeco.estimators import NumericFeature
+
+# input features of `ProductionMachine.timeToFailure`, shared with its batched evaluation (see
+# `components.timeToFailureInputs`) and the NumPy encoders of the estimator (see `run.py`)
+failureRateFeature = NumericFeature(0, 1)
+timeSinceRepairFeature = NumericFeature(0, 100)
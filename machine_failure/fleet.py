@@ -0,0 +1,183 @@
+import numpy as np
+
+from ml_deeco.simulation import Component
+from ml_deeco.utils import Log
+
+from common.tracing import TRACER
+from configuration import CONFIGURATION
+from components import timeToFailureInputs, predictTimeToFailure, expectingFailureEvent, machineFailedEvent
+
+
+class FleetMachine:
+    """Handle of one machine of a `MachineFleet` (used as a key of the machine logs)."""
+
+    def __init__(self, fleet, index):
+        self.fleet = fleet
+        self.index = index
+        self.id = fleet.machineId(index)
+
+    def __repr__(self):
+        return self.id
+
+
+class MachineFleet(Component):
+    """
+    Struct-of-arrays counterpart of `components.ProductionMachine`.
+
+    The state of all machines is kept in NumPy arrays and the whole fleet is advanced by masked array operations in one
+    `actuate` call. The semantics of one step (repair, failure rate update, failure prevention and failure) is the same
+    as in `ProductionMachine.actuate`; the maintenance and repair logs have the same records.
+    """
+
+    def __init__(self, experiment, machineCount):
+        super().__init__()
+        self.experiment = experiment
+        self.machineCount = machineCount
+
+        self.isRunning = np.ones(machineCount, dtype=bool)
+        self.failureRate = np.zeros(machineCount)
+        self.timeToRepair = np.zeros(machineCount, dtype=np.int64)
+        self.timeSinceLastRepair = np.zeros(machineCount, dtype=np.int64)
+
+        # maintenance and repair events -- lists of (machine indices, records) per step, split to machines on demand
+        self.maintenanceEvents = []
+        self.repairEvents = []
+
+        # failure rates since the last repair (column `t` is the failure rate at `timeSinceLastRepair == t + 1`),
+        # used to create the training data for the time-to-failure estimator when a machine fails
+        self.failureRateHistory = np.zeros((machineCount, 128), dtype=np.float32)
+
+        self.runningTime = np.zeros(machineCount, dtype=np.int64)
+
+    def machineId(self, index):
+        return f"{self.id}_{index + 1}"
+
+    # region prediction
+
+    def timeToFailureBaseline(self, running):
+        """Vectorized `ProductionMachine.timeToFailureBaseline`."""
+        return np.where(self.timeSinceLastRepair[running] >= 70, 0, 999)
+
+    def predictTimeToFailure(self, running):
+        """Estimates the time to failure of the running machines; `None` for the baseline without failure prevention."""
+        if not self.experiment.modelTrained:
+            if self.experiment.config.baseline:
+                return self.timeToFailureBaseline(running)
+            return None
+
+        return predictTimeToFailure(self.failureRate[running], self.timeSinceLastRepair[running])
+
+    # endregion
+
+    # region training data
+
+    def recordFailureRate(self, running):
+        columns = self.timeSinceLastRepair[running] - 1
+        if columns.max(initial=0) >= self.failureRateHistory.shape[1]:
+            grown = np.zeros((self.machineCount, self.failureRateHistory.shape[1] * 2), dtype=np.float32)
+            grown[:, :self.failureRateHistory.shape[1]] = self.failureRateHistory
+            self.failureRateHistory = grown
+        self.failureRateHistory[running, columns] = self.failureRate[running]
+
+    def collectTrainingData(self, failed):
+        """When a machine fails, all its records since the last repair get the time to the failure as the target."""
+        estimator = CONFIGURATION.timeToFailureEstimator
+        for index in np.flatnonzero(failed):
+            failedAt = self.timeSinceLastRepair[index]
+            timeSinceRepair = np.arange(1, failedAt)
+            failureRate = self.failureRateHistory[index, :failedAt - 1]
+            inputs = timeToFailureInputs(failureRate, timeSinceRepair)
+            targets = (failedAt - timeSinceRepair) / CONFIGURATION.steps
+            for x, y in zip(inputs, targets):
+                estimator.collectData(x, np.array([y]))
+
+    # endregion
+
+    # region logs
+
+    def maintenanceLogs(self):
+        """Per-machine maintenance logs (same records as `ProductionMachine.maintenanceLog`)."""
+        def toRecord(step, timeSinceLastRepair, isRunning, expectedFailure):
+            return [int(step), int(timeSinceLastRepair), bool(isRunning), None if np.isnan(expectedFailure) else float(expectedFailure)]
+        return self._splitEvents(self.maintenanceEvents, ["step", "timeSinceLastRepair", "isRunning", "expectedFailure"], toRecord)
+
+    def repairLogs(self):
+        """Per-machine repair logs (same records as `ProductionMachine.repairLog`)."""
+        def toRecord(step, timeSinceLastRepair, isRunning):
+            return [int(step), int(timeSinceLastRepair), bool(isRunning)]
+        return self._splitEvents(self.repairEvents, ["step", "timeSinceLastRepair", "isRunning"], toRecord)
+
+    def _splitEvents(self, events, header, toRecord):
+        logs = [Log(header) for _ in range(self.machineCount)]
+        if not events:
+            return logs
+        indices = np.concatenate([i for i, _ in events])
+        records = np.concatenate([r for _, r in events])
+        for e in np.argsort(indices, kind="stable"):  # stable sort keeps the records of a machine ordered by time
+            logs[indices[e]].register(toRecord(*records[e]))
+        return logs
+
+    # endregion
+
+    def repair(self, repaired):
+        indices = np.flatnonzero(repaired)
+        step = np.full(len(indices), self.experiment.currentTimeStep)
+        self.repairEvents.append((indices, np.stack([step, self.timeSinceLastRepair[indices], self.isRunning[indices]], axis=1)))
+        self.isRunning[repaired] = True
+        self.failureRate[repaired] = 0
+        self.timeSinceLastRepair[repaired] = 0
+        self.timeToRepair[repaired] = 0
+
+    def callMaintenance(self, called, expectedFailure=None):
+        called = called & (self.timeToRepair == 0)  # maintenance is already called for the others
+        if not called.any():
+            return
+        indices = np.flatnonzero(called)
+        self.timeToRepair[called] = CONFIGURATION.timeToRepair
+
+        step = np.full(len(indices), self.experiment.currentTimeStep)
+        expected = np.full(len(indices), np.nan) if expectedFailure is None else expectedFailure[called]
+        self.maintenanceEvents.append((indices, np.stack([step, self.timeSinceLastRepair[indices], self.isRunning[indices], expected], axis=1)))
+
+        if not TRACER.enabled(expectingFailureEvent.level):
+            return
+        for index, expectedSteps in zip(indices, expected):
+            if expectedFailure is not None:
+                TRACER.emit(expectingFailureEvent, self.machineId(index), float(expectedSteps))
+            else:
+                TRACER.emit(machineFailedEvent, self.machineId(index))
+
+    def simulateFailureRate(self, running):
+        failureRate = CONFIGURATION.getFailureRates(self.failureRate[running], self.timeSinceLastRepair[running], np.flatnonzero(running))
+        self.failureRate[running] = np.maximum(failureRate, 0)
+        self.timeSinceLastRepair[running] += 1
+
+    def preventFailure(self, running):
+        timeToFailure = self.predictTimeToFailure(running)
+        if timeToFailure is None:  # baseline without failure prevention
+            return
+
+        expectedFailure = np.full(self.machineCount, np.nan)
+        expectedFailure[running] = timeToFailure
+        self.callMaintenance(running & (expectedFailure <= CONFIGURATION.timeToRepair), expectedFailure)
+
+    def actuate(self):
+        repairing = self.timeToRepair > 0
+        self.timeToRepair[repairing] -= 1
+        repaired = repairing & (self.timeToRepair == 0)
+        if repaired.any():
+            self.repair(repaired)
+
+        running = self.isRunning.copy()
+        self.simulateFailureRate(running)
+        self.recordFailureRate(running)
+        self.preventFailure(running)
+
+        failed = running & (self.failureRate >= CONFIGURATION.failureThreshold)
+        if failed.any():
+            self.isRunning[failed] = False
+            self.callMaintenance(failed)
+            self.collectTrainingData(failed)
+
+        self.runningTime += self.isRunning
+
@@ -1,10 +1,10 @@
 import itertools
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 
 def plotFailureRate(machineLogs, maxMachines=None, filename=None, show=False, figsize=None, title="Failure rate of machines"):
+    import matplotlib.pyplot as plt  # imported when the first figure is rendered
     if not figsize:
         figsize = (10, 4.5)
     machines = list(machineLogs.keys())
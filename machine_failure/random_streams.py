@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class RandomStreams:
+    """
+    Independent, reproducible random streams -- one per entity (machine) and kind of the distribution.
+
+    The generator of each stream is seeded by a `SeedSequence` with a spawn key derived from the entity index (and the
+    `key` of the simulation), so the numbers drawn by a machine do not depend on the number of machines, on the order in
+    which they are evaluated or on the process they run in. The numbers are drawn in blocks of `blockSize` values per
+    entity, so a single draw is only an array lookup. Only the state of the generator of each stream is kept (it is
+    loaded into a shared generator to draw the next block), so a stream takes `8 * blockSize` bytes for the block and
+    about 200 bytes for the state, i.e. about 70 MB per kind for 100,000 machines with the default block. The block
+    size does not change the drawn numbers.
+    """
+
+    KINDS = ("uniform", "normal")
+
+    def __init__(self, seed, key=(), blockSize=64):
+        self.seed = seed
+        self.key = tuple(key)
+        self.blockSize = blockSize
+        self._bitGenerator = np.random.PCG64()
+        self._generator = np.random.Generator(self._bitGenerator)
+        self._states = {kind: [] for kind in self.KINDS}
+        self._blocks = {kind: np.zeros((0, blockSize)) for kind in self.KINDS}
+        self._positions = {kind: np.zeros(0, dtype=np.int64) for kind in self.KINDS}
+
+    def _ensureEntities(self, kind, count):
+        states = self._states[kind]
+        if count <= len(states):
+            return
+        count = max(count, 2 * len(states))
+        kindIndex = self.KINDS.index(kind)
+        for index in range(len(states), count):
+            state = np.random.PCG64(np.random.SeedSequence(self.seed, spawn_key=(*self.key, kindIndex, index))).state["state"]
+            states.append((state["state"], state["inc"]))
+        blocks = np.zeros((count, self.blockSize))
+        blocks[:len(self._blocks[kind])] = self._blocks[kind]
+        self._blocks[kind] = blocks
+        positions = np.full(count, self.blockSize, dtype=np.int64)  # new streams are drawn on their first use
+        positions[:len(self._positions[kind])] = self._positions[kind]
+        self._positions[kind] = positions
+
+    def _refill(self, kind, index):
+        state, inc = self._states[kind][index]
+        self._bitGenerator.state = {"bit_generator": "PCG64", "state": {"state": state, "inc": inc}, "has_uint32": 0, "uinteger": 0}
+        if kind == "uniform":
+            self._blocks[kind][index] = self._generator.random(self.blockSize)
+        else:
+            self._blocks[kind][index] = self._generator.standard_normal(self.blockSize)
+        self._states[kind][index] = (self._bitGenerator.state["state"]["state"], inc)
+        self._positions[kind][index] = 0
+
+    def draw(self, kind, indices):
+        """Next number of the stream of each of the entities (`indices` must not contain duplicates)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return np.zeros(0)
+        self._ensureEntities(kind, indices.max() + 1)
+
+        positions = self._positions[kind]
+        for index in indices[positions[indices] >= self.blockSize]:
+            self._refill(kind, index)
+
+        values = self._blocks[kind][indices, positions[indices]]
+        positions[indices] += 1
+        return values
+
+    def drawOne(self, kind, index):
+        """Next number of the stream of one entity."""
+        self._ensureEntities(kind, index + 1)
+        if self._positions[kind][index] >= self.blockSize:
+            self._refill(kind, index)
+        value = self._blocks[kind][index, self._positions[kind][index]]
+        self._positions[kind][index] += 1
+        return value
+
+    def uniform(self, indices):
+        return self.draw("uniform", indices)
+
+    def normal(self, indices):
+        return self.draw("normal", indices)
@@ -1,21 +1,34 @@
 import argparse
 import os
 import random
+import sys
 from pathlib import Path
 
 import numpy as np
 
 os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")  # Report only TF errors by default
 # os.environ["CUDA_VISIBLE_DEVICES"] = "-1"  # Disable GPU in TF. The models are small, so it is actually faster to use the CPU.
-import tensorflow as tf
 
-from ml_deeco.estimators import NeuralNetworkEstimator
 from ml_deeco.simulation import Experiment, Configuration
 from ml_deeco.utils import setVerboseLevel, Log, setVerbosePrintFile, closeVerbosePrintFile, verbosePrint
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))  # the `common` package shared by the simulations
+from common.datastore import TrainingDataStore
+from common.estimators import configureTensorFlow, LookupTableMixin, DataStoreMixin, CompactDataMixin, IncrementalTrainingMixin, NumpyInferenceMixin, neuralNetworkEstimatorClass
+from common.inference import FeatureEncoder
+from common.cache import BaselineCache
+from common.checkpoint import Checkpoint, runIterations
+from common.logs import ColumnarLog
+from common.results import ResultsWriter
+from common.profiling import PROFILER
+from common.tracing import TRACER
+
 from configuration import CONFIGURATION
 from plots import plotFailureRate
 
+MACHINE_LOG_HEADER = ["step", "timeSinceLastFailure", "isRunning", "failureRate"]
+MACHINE_LOG_DTYPES = [np.int64, np.int64, np.bool_, np.float64]
+
 
 class ProductionMachineExperiment(Experiment):
 
@@ -23,20 +36,50 @@ class ProductionMachineExperiment(Experiment):
         config = Configuration(**args.__dict__, name="machine", steps=CONFIGURATION.steps, simulations=1)
         super().__init__(config)
 
+        if config.resume and config.results_file:
+            raise ValueError("The results container cannot be resumed, use --resume without --results_file.")
+        if config.resume and config.trace:
+            raise ValueError("The trace file cannot be resumed, use --resume without --trace.")
+        if config.resume and not Checkpoint(Path(config.output) / "checkpoint").exists():
+            raise ValueError(f"There is no checkpoint to resume from in '{config.output}', run with --checkpoint first.")
+
         # initialize output path
         CONFIGURATION.outputFolder = Path(config.output)
         os.makedirs(CONFIGURATION.outputFolder, exist_ok=True)
-        outputFile = open(CONFIGURATION.outputFolder / "output.txt", "w")
+        outputFile = open(CONFIGURATION.outputFolder / "output.txt", "a" if config.resume else "w")
 
         # initialize configuration
-        CONFIGURATION.timeToFailureEstimator = NeuralNetworkEstimator(
+        configureTensorFlow(config.seed, config.threads)  # TF is imported only for the experiment (by its estimators)
+        from features import failureRateFeature, timeSinceRepairFeature  # `components` needs the estimator created below
+        estimatorModes, estimatorParams = [], {}
+        if config.memo_cache:
+            estimatorModes.append(LookupTableMixin)
+            estimatorParams["cacheSize"] = config.memo_cache
+        if config.compact_data:
+            estimatorModes.append(CompactDataMixin)
+        elif config.data_store:
+            estimatorModes.append(DataStoreMixin)
+            estimatorParams["dataStore"] = TrainingDataStore(CONFIGURATION.outputFolder / "time_to_failure" / "data")
+        if config.incremental:
+            estimatorModes.append(IncrementalTrainingMixin)
+        if config.numpy_inference:
+            estimatorModes.append(NumpyInferenceMixin)
+            estimatorParams["encoders"] = [FeatureEncoder.ofFeature(failureRateFeature), FeatureEncoder.ofFeature(timeSinceRepairFeature)]
+        CONFIGURATION.timeToFailureEstimator = neuralNetworkEstimatorClass(*estimatorModes)(
             self, hidden_layers=[128], fit_params={"batch_size": 64}, baseline=None,
-            name="time_to_failure", outputFolder=CONFIGURATION.outputFolder / "time_to_failure"
+            name="time_to_failure", outputFolder=CONFIGURATION.outputFolder / "time_to_failure",
+            **estimatorParams
         )
 
         # initialize verbose printing
         setVerboseLevel(args.verbose)
         setVerbosePrintFile(outputFile)
+        TRACER.configure(args.verbose, CONFIGURATION.outputFolder / "trace.bin" if config.trace else None)
+
+        if config.profile:
+            PROFILER.enable()
+            PROFILER.instrumentExperiment(self, [Log, ColumnarLog])
+            PROFILER.instrument(sys.modules[__name__], ["plotFailureRate"], "plots")
 
         # import the component with estimate after the `CONFIGURATION.timeToFailureEstimator` is created
         from components import ProductionMachine
@@ -45,38 +88,107 @@ class ProductionMachineExperiment(Experiment):
 
         # prepare the logs
         self.machineLogs = {}
+        self.modelTrained = False
+        self.resultsWriter = ResultsWriter(CONFIGURATION.outputFolder / "results.zip") if config.results_file else None
+        self.runningTimesLog = Log(["iteration", "simulation", "machines", "total_running_time", "avg_running_time"])
+        self.checkpoint = Checkpoint(CONFIGURATION.outputFolder / "checkpoint") if config.checkpoint or config.resume else None
+        if config.baseline_cache and config.results_file:
+            raise ValueError("The results container cannot be cached, use --baseline_cache without --results_file.")
+        self.baselineCache = BaselineCache(config.baseline_cache, "machine_failure", self, CONFIGURATION) if config.baseline_cache else None
+
+    def baselineKey(self):
+        """The arguments the results of the baseline iteration depend on (see `common/cache.py`)."""
+        return {"seed": self.config.seed, "baseline": self.config.baseline, "fleet": self.config.fleet, "batch": self.config.batch,
+                "random_streams": self.config.random_streams, "log_format": self.config.log_format}
+
+    def checkpointState(self):
+        return {"runningTimesLog": self.runningTimesLog, "modelTrained": self.modelTrained}
+
+    def restoreCheckpointState(self, state):
+        self.runningTimesLog = state["runningTimesLog"]
+        self.modelTrained = state["modelTrained"]
+
+    def run(self):
+        if self.checkpoint is None and self.baselineCache is None:
+            return super().run()
+        runIterations(self, self.checkpoint, self.config.resume, baselineCache=self.baselineCache)
 
-    def prepareSimulation(self, _i, _s):
+    def prepareSimulation(self, i, s):
         """Prepares the components for the simulation"""
-        from components import ProductionMachine
+        if self.config.random_streams:
+            from random_streams import RandomStreams
+            CONFIGURATION.randomStreams = RandomStreams(self.config.seed, key=(i, s))
+
+        if self.config.fleet:
+            return self.prepareFleetSimulation()
 
-        machines = [ProductionMachine(self) for _ in range(CONFIGURATION.machineCount)]
+        from components import ProductionMachine, TimeToFailureBatch
+
+        machines = [ProductionMachine(self, index) for index in range(CONFIGURATION.machineCount)]
 
         self.machineLogs = {}
         for machine in machines:
-            self.machineLogs[machine] = Log(["step", "timeSinceLastFailure", "isRunning", "failureRate"])
+            self.machineLogs[machine] = ColumnarLog(MACHINE_LOG_HEADER, MACHINE_LOG_DTYPES, capacity=CONFIGURATION.steps)
 
+        if self.config.batch:
+            return machines + [TimeToFailureBatch(self, machines)], []
         return machines, []
 
+    def prepareFleetSimulation(self):
+        """Prepares the simulation of the whole fleet of machines in one component (see `fleet.MachineFleet`)"""
+        from fleet import MachineFleet
+
+        fleet = MachineFleet(self, CONFIGURATION.machineCount)
+
+        # rows of all logged machines are registered at once, the log is split to the machines after the simulation
+        self.loggedMachines = min(CONFIGURATION.machineCount, CONFIGURATION.fleetLoggedMachines)
+        self.fleetLog = ColumnarLog(["machine"] + MACHINE_LOG_HEADER, [np.int64] + MACHINE_LOG_DTYPES, capacity=CONFIGURATION.steps * self.loggedMachines)
+        self.machineLogs = {}
+
+        return [fleet], []
+
     def stepCallback(self, components, _ensembles, step):
-        for machine in components:
-            self.machineLogs[machine].register([step, machine.timeSinceLastRepair, machine.isRunning, machine.failureRate])
+        if self.config.fleet:
+            fleet, = components
+            logged = slice(0, self.loggedMachines)
+            self.fleetLog.registerMany([np.arange(self.loggedMachines), np.full(self.loggedMachines, step),
+                                        fleet.timeSinceLastRepair[logged], fleet.isRunning[logged], fleet.failureRate[logged]])
+            return
+
+        for machine, log in self.machineLogs.items():
+            log.register([step, machine.timeSinceLastRepair, machine.isRunning, machine.failureRate])
+
+    def exportMachineLogs(self, machineLogs, maintenanceLogs, repairLogs, i, s):
+        """Exports the logs (dictionaries machine id -> log) to the results container or to separate files per machine."""
+        if self.resultsWriter:
+            for table, logs in (("machines", machineLogs), ("maintenance", maintenanceLogs), ("repair", repairLogs)):
+                for machine, log in logs.items():
+                    self.resultsWriter.appendLog(table, log, machine, i + 1, s + 1)
+            return
 
-    def computeMachinesRunning(self):
-        def runningTimeForMachine(machineLog):
-            runningTime = 0
-            for _, _, isRunning, _ in machineLog.records:
-                if isRunning:
-                    runningTime += 1
-            return runningTime
-        return [runningTimeForMachine(log) for log in self.machineLogs.values()]
-
-    def simulationCallback(self, components, _ens, i, _s):
         os.makedirs(CONFIGURATION.outputFolder / f"machines/{i+1}", exist_ok=True)
-        for machine in components:
-            self.machineLogs[machine].export(CONFIGURATION.outputFolder / f"machines/{i+1}/{machine}.csv")
-            machine.maintenanceLog.export(CONFIGURATION.outputFolder / f"machines/{i+1}/{machine}_maintenance.csv")
-            machine.repairLog.export(CONFIGURATION.outputFolder / f"machines/{i+1}/{machine}_repair.csv")
+        for machine, log in machineLogs.items():
+            log.exportAs(CONFIGURATION.outputFolder / f"machines/{i+1}/{machine}", self.config.log_format)
+        for machine, log in maintenanceLogs.items():
+            log.export(CONFIGURATION.outputFolder / f"machines/{i+1}/{machine}_maintenance.csv")
+        for machine, log in repairLogs.items():
+            log.export(CONFIGURATION.outputFolder / f"machines/{i+1}/{machine}_repair.csv")
+
+    def computeMachinesRunning(self):
+        return [int(log.getColumn("isRunning").sum()) for log in self.machineLogs.values()]
+
+    def simulationCallback(self, components, _ens, i, s):
+        if self.config.fleet:
+            fleet, = components
+            from fleet import FleetMachine
+            self.machineLogs = {FleetMachine(fleet, index): log for index, log in self.fleetLog.split("machine").items()}
+            machineIds = [fleet.machineId(index) for index in range(fleet.machineCount)]
+            maintenanceLogs = dict(zip(machineIds, fleet.maintenanceLogs()))
+            repairLogs = dict(zip(machineIds, fleet.repairLogs()))
+        else:
+            maintenanceLogs = {str(machine): machine.maintenanceLog for machine in self.machineLogs}
+            repairLogs = {str(machine): machine.repairLog for machine in self.machineLogs}
+        self.exportMachineLogs({str(machine): log for machine, log in self.machineLogs.items()}, maintenanceLogs, repairLogs, i, s)
 
         if i == 0:
             if self.config.baseline:
@@ -87,8 +199,12 @@ class ProductionMachineExperiment(Experiment):
             title = "Proactive (Machine Learning)"
         plotFailureRate(self.machineLogs, maxMachines=1, filename=CONFIGURATION.outputFolder / f"failure_rate_{i+1}.png",
                         title=f"Failure rate of machines – {title}")
-        machineRunningTimes = self.computeMachinesRunning()
+        if self.config.fleet:
+            machineRunningTimes = components[0].runningTime.tolist()
+        else:
+            machineRunningTimes = self.computeMachinesRunning()
         verbosePrint(f"Running times: {machineRunningTimes}, total: {sum(machineRunningTimes)}", 2)
+        self.runningTimesLog.register([i + 1, s + 1, len(machineRunningTimes), sum(machineRunningTimes), sum(machineRunningTimes) / len(machineRunningTimes)])
 
     def iterationCallback(self, i):
         return i == self.config.iterations - 1  # do not train after last iteration
@@ -96,9 +212,17 @@ class ProductionMachineExperiment(Experiment):
     def trainingCallback(self, i):
         # save the ML model
         CONFIGURATION.timeToFailureEstimator.saveModel(i)
+        self.modelTrained = True
 
+    def exportData(self):
+        self.runningTimesLog.export(CONFIGURATION.outputFolder / "running_times.csv")
+        if self.resultsWriter:
+            self.resultsWriter.close()
+        TRACER.close()
+        closeVerbosePrintFile()
 
-def main():
+
+def createArgumentParser():
     parser = argparse.ArgumentParser(description='Smart factory simulation')
     parser.add_argument('-v', '--verbose', type=int, help='the verboseness between 0 and 4.', required=False, default=2)
     parser.add_argument('--seed', type=int, help='Random seed.', required=False, default=42)
@@ -106,21 +230,44 @@ def main():
     parser.add_argument('-o', '--output', type=str, help='Output folder for the logs.', required=False, default='results')
     parser.add_argument('-i', '--iterations', type=int, help="Number of iterations to run.", required=False, default=2)
     parser.add_argument('-b', '--baseline', action='store_true', help="Use a baseline.", required=False, default=False)
-    args = parser.parse_args()
+    parser.add_argument('-f', '--fleet', action='store_true', help="Simulate the machines as one vectorized fleet.", required=False, default=False)
+    parser.add_argument('--batch', action='store_true', help="Evaluate the time-to-failure estimate of all machines in one batch per step.", required=False, default=False)
+    parser.add_argument('-r', '--random_streams', action='store_true', help="Use per-machine random streams (independent of the number and order of machines).", required=False, default=False)
+    parser.add_argument('--log_format', type=str, choices=['csv', 'npz', 'parquet'], help="Format of the exported machine logs.", required=False, default='csv')
+    parser.add_argument('--results_file', action='store_true', help="Write the logs of all machines into one results container instead of files per machine.", required=False, default=False)
+    parser.add_argument('--trace', action='store_true', help="Write the detailed (per-step) verbose messages as binary records into 'trace.bin' in the output folder (render them by 'python -m common.tracing').", required=False, default=False)
+    parser.add_argument('--profile', action='store_true', help="Measure the time spent in the phases of the run, export it to 'profile.json' in the output folder and print a summary table.", required=False, default=False)
+    parser.add_argument('--numpy_inference', action='store_true', help="Evaluate the trained model by a NumPy forward pass (checked against the Keras model) instead of Keras.", required=False, default=False)
+    parser.add_argument('--incremental', action='store_true', help="Retrain the model from its previous weights on the newly collected data (with a replay sample of the older data) with early stopping.", required=False, default=False)
+    parser.add_argument('--compact_data', action='store_true', help="Aggregate the collected training rows with the same inputs into one weighted row (takes precedence over --data_store).", required=False, default=False)
+    parser.add_argument('--data_store', action='store_true', help="Collect the training data into memory-mapped files in the output folder and train from them by a streamed dataset.", required=False, default=False)
+    parser.add_argument('--memo_cache', type=int, help="Memoize up to this many predictions of the trained model (LRU cache).", required=False, default=0)
+    parser.add_argument('--checkpoint', action='store_true', help="Save a checkpoint (model, collected data, logs, random states) into 'checkpoint' in the output folder after each iteration.", required=False, default=False)
+    parser.add_argument('--resume', action='store_true', help="Continue from the checkpoint in the output folder (implies --checkpoint).", required=False, default=False)
+    parser.add_argument('--baseline_cache', type=str, help="Folder of the cached results of the first (baseline) iteration -- load them if this run was cached before, otherwise store them.", required=False, default=None)
+    parser.add_argument('-m', '--machines', type=int, help="Number of machines.", required=False, default=CONFIGURATION.machineCount)
+    return parser
+
+
+def main():
+    args = createArgumentParser().parse_args()
 
     # Fix random seeds
     random.seed(args.seed)
     np.random.seed(args.seed)
-    tf.random.set_seed(args.seed)
-
-    # Set number of threads
-    tf.config.threading.set_inter_op_parallelism_threads(args.threads)
-    tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    CONFIGURATION.machineCount = args.machines
 
     experiment = ProductionMachineExperiment(args)
-    experiment.run()
+    try:
+        experiment.run()
+    finally:
+        if experiment.resultsWriter:
+            experiment.resultsWriter.close()  # also after a crash, so that the results written so far can be read
+    experiment.exportData()
 
-    closeVerbosePrintFile()
+    if args.profile:
+        PROFILER.export(CONFIGURATION.outputFolder / "profile.json")
+        print(PROFILER.formatTable())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+import numpy as np
+
+_ONE = np.uint64(1)
+
+
+class AccessControl:
+    """
+    Store of the access rules of security components -- a bitset of the allowed subjects per (component, action).
+
+    Every subject gets a dense integer index on its first use. Grants are either permanent (a set bit) or time-limited
+    (the step from which the grant is no longer valid). The expired grants are not swept, the check just compares the
+    expiration with the current step.
+    """
+
+    def __init__(self, capacity=64):
+        self.subjects = []
+        self._indices = {}
+        self.capacity = capacity
+        self._bits = {}  # (component, action) -> bitset as uint64 words
+        self._expirations = {}  # (component, action) -> expiration steps (only if a time-limited grant was used)
+
+    # region subject indices
+
+    def indexOf(self, subject):
+        index = self._indices.get(subject)
+        if index is None:
+            index = len(self.subjects)
+            self._indices[subject] = index
+            self.subjects.append(subject)
+            if index >= self.capacity:
+                self._grow(2 * index)
+        return index
+
+    def indicesOf(self, subjects):
+        return np.fromiter((self.indexOf(s) for s in subjects), dtype=np.int64)
+
+    def _grow(self, capacity):
+        self.capacity = capacity
+        for key, bits in self._bits.items():
+            self._bits[key] = np.concatenate([bits, np.zeros(self._words() - len(bits), dtype=np.uint64)])
+        for key, expirations in self._expirations.items():
+            self._expirations[key] = np.concatenate([expirations, np.zeros(capacity - len(expirations), dtype=np.int64)])
+
+    def _words(self):
+        return (self.capacity + 63) // 64
+
+    # endregion
+
+    def _bitset(self, component, action):
+        bits = self._bits.get((component, action))
+        if bits is None:
+            bits = self._bits[component, action] = np.zeros(self._words(), dtype=np.uint64)
+        return bits
+
+    def _expiration(self, component, action):
+        expirations = self._expirations.get((component, action))
+        if expirations is None:
+            expirations = self._expirations[component, action] = np.zeros(self.capacity, dtype=np.int64)
+        return expirations
+
+    def grant(self, component, action, indices, until=None):
+        """Allows the subjects (given by indices) the `action` on the `component`, until the step `until` if given."""
+        if until is None:
+            np.bitwise_or.at(self._bitset(component, action), indices >> 6, _ONE << (indices & 63).astype(np.uint64))
+        else:
+            expirations = self._expiration(component, action)
+            expirations[indices] = np.maximum(expirations[indices], until)
+
+    def revoke(self, component, action, indices):
+        """Removes both the permanent and the time-limited grants of the subjects (given by indices)."""
+        np.bitwise_and.at(self._bitset(component, action), indices >> 6, ~(_ONE << (indices & 63).astype(np.uint64)))
+        if (component, action) in self._expirations:
+            self._expirations[component, action][indices] = 0
+
+    def allows(self, component, action, index, time):
+        bits = self._bits.get((component, action))
+        if bits is not None and (int(bits[index >> 6]) >> (index & 63)) & 1:
+            return True
+        expirations = self._expirations.get((component, action))
+        return expirations is not None and time < expirations[index]
+
+    def allowsMany(self, component, action, indices, time):
+        """Vectorized `allows` for the subjects given by indices."""
+        allowed = np.zeros(len(indices), dtype=bool)
+        bits = self._bits.get((component, action))
+        if bits is not None:
+            allowed |= ((bits[indices >> 6] >> (indices & 63).astype(np.uint64)) & _ONE).astype(bool)
+        expirations = self._expirations.get((component, action))
+        if expirations is not None:
+            allowed |= time < expirations[indices]
+        return allowed
+
+    def allowed(self, component, action, time):
+        """The subjects allowed the `action` on the `component` in the step `time`."""
+        indices = np.arange(len(self.subjects))
+        return [self.subjects[i] for i in indices[self.allowsMany(component, action, indices, time)]]
@@ -1,45 +1,75 @@
 import enum
-from collections import defaultdict
-from typing import List, Set, Optional
+from typing import List, Set, Optional, TYPE_CHECKING
 
-from ml_deeco.utils import verbosePrint
 from ml_deeco.simulation import StationaryComponent2D, MovingComponent2D, Component, Point2D
 
+from common.tracing import TRACER, traceEvent  # `common` is added to the path by `run.py`
+
+from access import AccessControl
 from helpers import now
 
+if TYPE_CHECKING:
+    from routing import Route
+
+allowsEvent = traceEvent("allows", 5, "{0}, {1}: {2} '{3}' action '{4}'", "sisss")
+arrivedAtFactoryEvent = traceEvent("arrivedAtFactory", 4, "{0}: arrived at factory", "s")
+arrivedAtWorkplaceEvent = traceEvent("arrivedAtWorkplace", 4, "{0}: arrived at workplace", "s")
+
 
 class SecurityComponent(Component):
     """Base class for components with security rules (Door, Dispenser)."""
 
     def __init__(self):
         super().__init__()
-        self.allowed = defaultdict(set)
+        self.accessControl = AccessControl()  # replaced by the store shared by the factory
+
+    def allow(self, subject, action, until=None):
+        self.allowMany([subject], action, until)
+
+    def allowMany(self, subjects, action, until=None):
+        self.accessControl.grant(self, action, self.accessControl.indicesOf(subjects), until)
+
+    def revoke(self, subject, action):
+        self.revokeMany([subject], action)
+
+    def revokeMany(self, subjects, action):
+        self.accessControl.revoke(self, action, self.accessControl.indicesOf(subjects))
 
-    def allow(self, subject, action):
-        self.allowed[action].add(subject)
+    def allowed(self, action):
+        return self.accessControl.allowed(self, action, now())
 
     def allows(self, subject, action):
-        actionAllowed = subject in self.allowed[action]
-        verbosePrint(f"{self}, {now() + 1}: {'allowing' if actionAllowed else 'denying'} '{subject}' action '{action}'", 5)
+        actionAllowed = self.accessControl.allows(self, action, self.accessControl.indexOf(subject), now())
+        TRACER.emit(allowsEvent, self, now() + 1, 'allowing' if actionAllowed else 'denying', subject, action)
         return actionAllowed
 
 
 class Door(StationaryComponent2D, SecurityComponent):
 
-    def __init__(self, x, y):
+    def __init__(self, x, y, accessControl: Optional[AccessControl] = None):
         super().__init__(Point2D(x, y))
+        if accessControl is not None:
+            self.accessControl = accessControl
 
 
 class Dispenser(StationaryComponent2D, SecurityComponent):
 
-    def __init__(self, x, y):
+    def __init__(self, x, y, accessControl: Optional[AccessControl] = None):
         super().__init__(Point2D(x, y))
+        if accessControl is not None:
+            self.accessControl = accessControl
 
 
 class Factory(Component):
 
     entryDoor: Door
     dispenser: Dispenser
+    entryDoors: List[Door]
+    dispensers: List[Dispenser]
+
+    def __init__(self):
+        super().__init__()
+        self.accessControl = AccessControl()  # shared by all the security components of the factory
 
 
 class WorkPlace(Component):
@@ -47,6 +77,7 @@ class WorkPlace(Component):
     factory: Factory
     entryDoor: Door
     pathTo: List[Point2D]  # waypoints from the dispenser to the workplace door
+    route: 'Route'  # shared by the workers of the workplace
 
     def __init__(self, factory: Factory):
         super().__init__()
@@ -66,10 +97,23 @@ class Shift(Component):
         self.cancelled: Set['Worker'] = set()
         self.calledStandbys: Set['Worker'] = set()
         self.workers: Set['Worker'] = set()  # actually working (subset of assigned and standbys)
+        # membership indices -- updated incrementally by `cancel` and `callStandbys`, so that the selections of the
+        # ensembles are O(1) lookups without computing set differences
+        self.activeAssigned: Set['Worker'] = set(assigned)  # assigned - cancelled
+        self.availableStandbys: Set['Worker'] = set(standbys)  # standbys - calledStandbys
+        self.team: Set['Worker'] = set(assigned)  # (assigned - cancelled) | calledStandbys
 
-    @property
-    def availableStandbys(self):
-        return self.standbys - self.calledStandbys
+    def cancel(self, workers):
+        for worker in workers:
+            self.cancelled.add(worker)
+            self.activeAssigned.discard(worker)
+            self.team.discard(worker)
+
+    def callStandbys(self, standbys):
+        for standby in standbys:
+            self.calledStandbys.add(standby)
+            self.availableStandbys.discard(standby)
+            self.team.add(standby)
 
 
 class WorkerState(enum.IntEnum):
@@ -85,13 +129,17 @@ class WorkerState(enum.IntEnum):
     CALLED_STANDBY = 9
 
 
+WORKER_SPEED = 10
+
+
 class Worker(MovingComponent2D):
 
     def __init__(self, workplace: WorkPlace, location):
-        super().__init__(location, speed=10)
+        super().__init__(location, speed=WORKER_SPEED)
         # references
         self.workplace = workplace
         self.factory = workplace.factory
+        self.route = workplace.route
         # state variables
         self.hasHeadGear = False
         self.isAtFactory = False
@@ -115,37 +163,37 @@ class Worker(MovingComponent2D):
 
         # walk to the factory
         if self.state == WorkerState.WALKING_TO_FACTORY:
-            if self.move(self.factory.entryDoor.location):
+            if self.move(self.route.entryDoor.location):
                 self.state = WorkerState.AT_FACTORY_DOOR
 
         # enter the factory
         if self.state == WorkerState.AT_FACTORY_DOOR:
-            if self.factory.entryDoor.allows(self, 'enter'):
+            if self.route.entryDoor.allows(self, 'enter'):
                 self.state = WorkerState.WALKING_TO_DISPENSER
                 self.isAtFactory = True
                 self.arrivedAtFactoryTime = now()
-                verbosePrint(f"{self}: arrived at factory", 4)
+                TRACER.emit(arrivedAtFactoryEvent, self)
                 return
 
         # walk to the dispenser
         if self.state == WorkerState.WALKING_TO_DISPENSER:
-            if self.move(self.factory.dispenser.location):
+            if self.move(self.route.dispenser.location):
                 self.state = WorkerState.AT_DISPENSER
 
         # use the dispenser
         if self.state == WorkerState.AT_DISPENSER:
-            if self.factory.dispenser.allows(self, 'use'):
+            if self.route.dispenser.allows(self, 'use'):
                 self.state = WorkerState.WALKING_TO_WORKPLACE
                 self.hasHeadGear = True
                 return
 
         # work to the workplace
         if self.state == WorkerState.WALKING_TO_WORKPLACE:
-            if self.pathToWorkplaceIndex >= len(self.workplace.pathTo):
+            if self.pathToWorkplaceIndex >= len(self.route.waypoints):
                 if self.move(self.workplace.entryDoor.location):
                     self.state = WorkerState.AT_WORKPLACE_DOOR
             else:
-                if self.move(self.workplace.pathTo[self.pathToWorkplaceIndex]):
+                if self.move(self.route.waypoints[self.pathToWorkplaceIndex]):
                     self.pathToWorkplaceIndex += 1
 
         # enter the workplace and start working
@@ -153,4 +201,4 @@ class Worker(MovingComponent2D):
             if self.workplace.entryDoor.allows(self, 'enter'):
                 self.state = WorkerState.AT_WORKPLACE
                 self.arrivedAtWorkplaceTime = now()
-                verbosePrint(f"{self}: arrived at workplace", 4)
+                TRACER.emit(arrivedAtWorkplaceEvent, self)
@@ -1,4 +1,5 @@
 import enum
+import math
 import random
 from typing import Tuple, List
 import numpy as np
@@ -7,6 +8,7 @@ import numpy.random as npr
 from ml_deeco.simulation import Point2D, Experiment
 
 from components import WorkPlace, Factory, Door, Dispenser, Worker
+from routing import Route, RoutingTable
 
 
 class Configuration:
@@ -21,6 +23,11 @@ class Configuration:
     latePercentage = 0.1
     dayOfWeek = None
 
+    # factory layout -- 0 workplaces is the hand-written factory of `createFactory`, otherwise `createLargeFactory`
+    workplaces = 0
+    entryDoors = 1
+    dispensers = 1
+
     outputFolder = None
     cancellationBaseline = 16
     lateWorkersNN = None
@@ -35,24 +42,111 @@ CONFIGURATION = Configuration()
 
 def createFactory() -> Tuple[Factory, List[WorkPlace], Point2D]:
     factory = Factory()
-    factory.entryDoor = Door(20, 90)
-    factory.dispenser = Dispenser(30, 90)
+    factory.entryDoor = Door(20, 90, factory.accessControl)
+    factory.dispenser = Dispenser(30, 90, factory.accessControl)
 
     workplace1 = WorkPlace(factory)
-    workplace1.entryDoor = Door(40, 50)
+    workplace1.entryDoor = Door(40, 50, factory.accessControl)
     workplace1.pathTo = [Point2D(30, 50)]
 
     workplace2 = WorkPlace(factory)
-    workplace2.entryDoor = Door(120, 50)
+    workplace2.entryDoor = Door(120, 50, factory.accessControl)
     workplace2.pathTo = [Point2D(110, 90), Point2D(110, 50)]
 
     workplace3 = WorkPlace(factory)
-    workplace3.entryDoor = Door(120, 110)
+    workplace3.entryDoor = Door(120, 110, factory.accessControl)
     workplace3.pathTo = [Point2D(110, 90), Point2D(110, 110)]
 
     busStop = Point2D(0, 90)
 
-    return factory, [workplace1, workplace2, workplace3], busStop
+    factory.entryDoors = [factory.entryDoor]
+    factory.dispensers = [factory.dispenser]
+    workplaces = [workplace1, workplace2, workplace3]
+    for workplace in workplaces:
+        workplace.route = Route(busStop, factory.entryDoor, factory.dispenser, workplace.pathTo, workplace.entryDoor)
+
+    return factory, workplaces, busStop
+
+
+# layout of the generated factories
+corridorY = 90
+columnSpacing = 80
+branchSpacing = 20
+workplacesPerBranch = 3
+
+
+def createLargeFactory(workplaceCount, entryDoorCount=1, dispenserCount=1) -> Tuple[Factory, List[WorkPlace], Point2D]:
+    """
+    Generates a factory with `workplaceCount` workplaces, `entryDoorCount` entry doors and `dispenserCount` dispensers.
+
+    The workplaces are along branches going up and down from a main corridor (`workplacesPerBranch` in each), one
+    column of branches after another. The entry doors are in the north wall of the entrance hall, the dispensers are at
+    the corridors connecting the hall with the main corridor between the columns. The routes from the dispensers to the
+    workplaces are precomputed shortest paths in the corridor graph; each workplace uses the dispenser closest to it and
+    the entry door closest to the dispenser. Returns the bus stop of the first entry door.
+    """
+    columns = max(1, math.ceil(workplaceCount / (2 * workplacesPerBranch)))
+    if entryDoorCount > columns or dispenserCount > columns:
+        raise ValueError(f"The factory with {workplaceCount} workplaces has room for at most {columns} entry doors and dispensers.")
+
+    factory = Factory()
+    nodes: List[Point2D] = []
+    edges = []
+
+    def addNode(x, y):
+        nodes.append(Point2D(x, y))
+        return len(nodes) - 1
+
+    # the main corridor -- a connector to the entrance hall before each column of branches
+    columnX = [columnSpacing * (c + 1) for c in range(columns)]
+    connectorX = [x - columnSpacing // 2 for x in columnX]
+    corridor = []
+    for c in range(columns):
+        corridor += [addNode(connectorX[c], corridorY), addNode(columnX[c], corridorY)]
+    edges += list(zip(corridor, corridor[1:]))
+
+    workplaces = []
+    workplaceNodes = []
+    branchEnds = {}
+    for index in range(workplaceCount):
+        column, position = divmod(index, 2 * workplacesPerBranch)
+        direction = -1 if position < workplacesPerBranch else 1
+        depth = position % workplacesPerBranch + 1
+        x, y = columnX[column], corridorY + direction * branchSpacing * depth
+
+        branchNode = addNode(x, y)
+        edges.append((branchEnds.get((column, direction), corridor[2 * column + 1]), branchNode))
+        branchEnds[column, direction] = branchNode
+
+        workplace = WorkPlace(factory)
+        workplace.entryDoor = Door(x + 10, y, factory.accessControl)
+        workplaceNodes.append(addNode(x + 10, y))
+        edges.append((branchNode, workplaceNodes[-1]))
+        workplaces.append(workplace)
+
+    def spread(count):
+        return [round(i * (columns - 1) / max(count - 1, 1)) for i in range(count)]
+
+    factory.dispensers = []
+    dispenserNodes = []
+    for column in spread(dispenserCount):
+        factory.dispensers.append(Dispenser(connectorX[column], 20, factory.accessControl))
+        dispenserNodes.append(addNode(connectorX[column], 20))
+        edges.append((dispenserNodes[-1], corridor[2 * column]))
+
+    factory.entryDoors = [Door(connectorX[column], 0, factory.accessControl) for column in spread(entryDoorCount)]
+    busStops = [Point2D(door.location.x, -20) for door in factory.entryDoors]
+    factory.entryDoor, factory.dispenser = factory.entryDoors[0], factory.dispensers[0]
+
+    table = RoutingTable(nodes, edges, dispenserNodes)
+    for workplace, workplaceNode in zip(workplaces, workplaceNodes):
+        d = int(np.argmin(table.distance[:, workplaceNode]))
+        dispenser = factory.dispensers[d]
+        e = int(np.argmin([abs(door.location.x - dispenser.location.x) for door in factory.entryDoors]))
+        workplace.pathTo = table.waypoints(dispenserNodes[d], workplaceNode)
+        workplace.route = Route(busStops[e], factory.entryDoors[e], dispenser, workplace.pathTo, workplace.entryDoor)
+
+    return factory, workplaces, busStops[0]
 
 
 # workers arrive by a bus
@@ -1,12 +1,15 @@
 from typing import List
 
+import numpy as np
+
 from configuration import setStandbyArrivedAtWorkplaceTime, CONFIGURATION, DayOfWeek
 from ml_deeco.estimators import NeuralNetworkEstimator, CategoricalFeature, BinaryFeature, NumericFeature
 from ml_deeco.simulation import Ensemble, someOf
-from ml_deeco.utils import verbosePrint
 
 from components import Shift, Worker, WorkerState
 from helpers import allow, now
+from common.tracing import TRACER, traceEvent
+from scheduling import TimeWindowEnsemble, EnsembleScheduler
 
 
 class ShiftTeam(Ensemble):
@@ -25,56 +28,51 @@ class ShiftTeam(Ensemble):
 
     @workers.select
     def workers(self, worker, otherEnsembles):
-        return worker in (self.shift.assigned - self.shift.cancelled) or \
-            worker in self.shift.calledStandbys
+        return worker in self.shift.team
 
     def actuate(self):
         self.shift.workers = set(self.workers)
 
 
-class AccessToFactory(Ensemble):
+class AccessToFactory(TimeWindowEnsemble):
 
     shift: Shift
 
     def __init__(self, shift: Shift):
         super().__init__()
         self.shift = shift
-        self.factory = shift.workPlace.factory
+        self.entryDoor = shift.workPlace.route.entryDoor
 
     def priority(self):
         return 4
 
-    def situation(self):
-        startTime = self.shift.startTime
-        endTime = self.shift.endTime
-        return startTime - 30 <= now() <= endTime + 30
+    def activationInterval(self):
+        return self.shift.startTime - 30, self.shift.endTime + 30
 
     def actuate(self):
-        allow(self.shift.workers, "enter", self.factory.entryDoor)
+        allow(self.shift.workers, "enter", self.entryDoor)
 
 
-class AccessToDispenser(Ensemble):
+class AccessToDispenser(TimeWindowEnsemble):
 
     shift: Shift
 
     def __init__(self, shift: Shift):
         super().__init__()
         self.shift = shift
-        self.dispenser = shift.workPlace.factory.dispenser
+        self.dispenser = shift.workPlace.route.dispenser
 
     def priority(self):
         return 4
 
-    def situation(self):
-        startTime = self.shift.startTime
-        endTime = self.shift.endTime
-        return startTime - 20 <= now() <= endTime
+    def activationInterval(self):
+        return self.shift.startTime - 20, self.shift.endTime
 
     def actuate(self):
         allow(self.shift.workers, "use", self.dispenser)
 
 
-class AccessToWorkPlace(Ensemble):
+class AccessToWorkPlace(TimeWindowEnsemble):
 
     shift: Shift
 
@@ -86,10 +84,8 @@ class AccessToWorkPlace(Ensemble):
     def priority(self):
         return 3
 
-    def situation(self):
-        startTime = self.shift.startTime
-        endTime = self.shift.endTime
-        return startTime - 30 <= now() <= endTime + 30
+    def activationInterval(self):
+        return self.shift.startTime - 30, self.shift.endTime + 30
 
     workers = someOf(Worker, selectedAllAtOnce=True)  # subset of self.shift.workers
 
@@ -101,21 +97,23 @@ class AccessToWorkPlace(Ensemble):
         allow(self.workers, "enter", self.workPlace.entryDoor)
 
 
-class CancelLateWorkers(Ensemble):
+class CancelLateWorkers(TimeWindowEnsemble):
 
     shift: Shift
+    collectsWhenInactive = True  # the `lateWorkers` estimate collects data also when the ensemble is not materialized
 
     def __init__(self, shift: Shift):
         super().__init__()
         self.shift = shift
+        # late workers estimated by the batched pre-pass (see `estimateLateWorkers`)
+        self.batchEstimates = {}
+        self.batchEstimatesStep = None
 
     def priority(self):
         return 2
 
-    def situation(self):
-        startTime = self.shift.startTime
-        endTime = self.shift.endTime
-        return startTime - 30 <= now() <= endTime
+    def activationInterval(self):
+        return self.shift.startTime - 30, self.shift.endTime
 
     # region late workers
 
@@ -137,13 +135,32 @@ class CancelLateWorkers(Ensemble):
             # estimatedArrival = now() + self.lateWorkers.estimate(worker)
             # return estimatedArrival > self.shift.startTime
             timeToShift = self.shift.startTime - now()
+            if CONFIGURATION.experiment.config.batch and CONFIGURATION.experiment.modelTrained:
+                return self.estimateLateWorkers()[worker]
             return self.lateWorkers.estimate(worker, timeToShift)
         return False
 
+    def lateWorkersInputs(self, worker, timeToShift):
+        """Preprocessed inputs of the `lateWorkers` estimate (time to shift scaled by the number of steps, see `plotLateWorkersNN`)."""
+        return np.concatenate([[timeToShift / CONFIGURATION.steps], dayOfWeekFeature.preprocess(self.dayOfWeek(worker))])
+
+    def estimateLateWorkers(self):
+        """Batched pre-pass of the `lateWorkers` estimate -- one prediction for all potentially late workers per step."""
+        if self.batchEstimatesStep != now():
+            candidates = [worker for worker in self.shift.activeAssigned if not worker.isAtFactory]
+            self.batchEstimates = {}
+            if candidates:
+                timeToShift = self.shift.startTime - now()
+                inputs = np.array([self.lateWorkersInputs(worker, timeToShift) for worker in candidates])
+                outputs = CONFIGURATION.lateWorkersNN.predictBatch(inputs).reshape(-1)
+                self.batchEstimates = dict(zip(candidates, outputs > 0.5))  # `BinaryFeature` target
+            self.batchEstimatesStep = now()
+        return self.batchEstimates
+
     # @lateWorkers.estimate.conditionsValid
     @lateWorkers.estimate.targetsValid
     def belongsToShift(self, worker):
-        return worker in self.shift.assigned - self.shift.cancelled
+        return worker in self.shift.activeAssigned
 
     @lateWorkers.estimate.inputsValid
     def potentiallyLate(self, worker):
@@ -168,12 +185,16 @@ class CancelLateWorkers(Ensemble):
     # endregion
 
     def actuate(self):
-        self.shift.cancelled.update(self.lateWorkers)
+        self.shift.cancel(self.lateWorkers)
         for worker in self.lateWorkers:
             worker.state = WorkerState.CANCELLED  # this is instead of the notification
 
 
-class ReplaceLateWithStandbys(Ensemble):
+dayOfWeekFeature = CategoricalFeature(DayOfWeek)
+standbysEvent = traceEvent("standbys", 5, "{0}", "l")
+
+
+class ReplaceLateWithStandbys(TimeWindowEnsemble):
 
     lateWorkersEnsemble: CancelLateWorkers
     shift: Shift
@@ -186,8 +207,12 @@ class ReplaceLateWithStandbys(Ensemble):
     def priority(self):
         return 1
 
+    def activationInterval(self):
+        # the `materialized` flag of the late workers ensemble is only updated in its activation interval (and reset after it)
+        return self.lateWorkersEnsemble.activationInterval()
+
     def situation(self):
-        return self.lateWorkersEnsemble.materialized
+        return super().situation() and self.lateWorkersEnsemble.materialized
 
     standbys = someOf(Worker)
 
@@ -201,8 +226,8 @@ class ReplaceLateWithStandbys(Ensemble):
         return 0, len(self.lateWorkersEnsemble.lateWorkers)
 
     def actuate(self):
-        verbosePrint(str(self.standbys), 5)
-        self.shift.calledStandbys.update(self.standbys)
+        TRACER.emit(standbysEvent, self.standbys)
+        self.shift.callStandbys(self.standbys)
         for standby in self.standbys:
             standby.state = WorkerState.CALLED_STANDBY  # this is instead of the notification of the standby
             setStandbyArrivedAtWorkplaceTime(standby)
@@ -221,4 +246,4 @@ def getEnsembles(shifts: List[Shift]):
         ensembles.append(lateWorkersEnsemble)
         ensembles.append(ReplaceLateWithStandbys(lateWorkersEnsemble))
 
-    return ensembles
+    return EnsembleScheduler(ensembles)
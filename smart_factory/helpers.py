@@ -1,16 +1,18 @@
-from ml_deeco.utils import verbosePrint
+from common.tracing import TRACER, traceEvent  # `common` is added to the path by `run.py`
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from components import SecurityComponent
 
 
+allowEvent = traceEvent("allow", 6, "Allowing {0} '{1}' '{2}'", "lss")
+
+
 def allow(subjects, action, object: 'SecurityComponent'):
     subjects = list(subjects)
-    for s in subjects:
-        object.allow(s, action)
+    object.allowMany(subjects, action)
     if len(subjects) > 0:
-        verbosePrint(f"Allowing {subjects} '{action}' '{object}'", 6)
+        TRACER.emit(allowEvent, subjects, action, object)
 
 
 def now():
@@ -0,0 +1,116 @@
+"""
+Parallel execution of the day simulations of one iteration.
+
+Within an iteration, the model is frozen, so the simulations of the days are independent apart from the shared logs and
+the collected training data. Each day runs in a forked process (which inherits the experiment including the current
+model) and returns what it added to the logs and the estimators; the results are merged back in the day order. The
+verbose messages of a day are collected in the forked process too and written into `output.txt` when the day is merged
+(the forked processes exit without flushing the inherited file).
+
+The random generators are seeded per day (`seedSimulation`), so the results are the same as when the days are run
+sequentially with `--parallel_days 1`.
+"""
+import io
+import multiprocessing
+import random
+import sys
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from ml_deeco.utils import verbosePrint, setVerbosePrintFile
+
+from common.results import ResultsBuffer  # `common` is added to the path by `run.py`
+from common.tracing import TRACER
+
+
+def seedSimulation(seed, iteration, simulation):
+    """Seeds the global random generators by a seed derived from the run seed, iteration and simulation."""
+    daySeed = int(np.random.SeedSequence([seed, iteration, simulation]).generate_state(1)[0])
+    random.seed(daySeed)
+    np.random.seed(daySeed)
+
+
+@dataclass
+class DayResult:
+    simulation: int
+    estimatorData: List[list] = field(default_factory=list)  # newly collected records of each estimator
+    shiftRecords: List[list] = field(default_factory=list)
+    arrivedAtWorkplaceTimeAvgTimes: List[float] = field(default_factory=list)
+    results: ResultsBuffer = None
+    messages: str = ""  # the verbose messages written into the output file
+
+
+def runDay(experiment, iteration, simulation):
+    """Runs one day simulation and returns what it added to the shared logs and the estimators."""
+    seedSimulation(experiment.config.seed, iteration, simulation)
+
+    for estimator in experiment.estimators:
+        estimator.forkData(f"day_{iteration + 1}_{simulation + 1}")
+    shiftRecordsStart = len(experiment.shiftsLog.records)
+    avgTimesStart = len(experiment.arrivedAtWorkplaceTimeAvgTimes)
+    if experiment.resultsWriter:
+        experiment.resultsWriter = ResultsBuffer()
+
+    verbosePrint(f"Simulation {simulation + 1}", 2)
+    components, ensembles = experiment.prepareSimulation(iteration, simulation)
+    experiment.runSimulation(components, ensembles, iteration, simulation)
+    experiment.simulationCallback(components, ensembles, iteration, simulation)
+
+    return DayResult(
+        simulation=simulation,
+        estimatorData=[estimator.collectedData() for estimator in experiment.estimators],
+        shiftRecords=experiment.shiftsLog.records[shiftRecordsStart:],
+        arrivedAtWorkplaceTimeAvgTimes=experiment.arrivedAtWorkplaceTimeAvgTimes[avgTimesStart:],
+        results=experiment.resultsWriter,
+    )
+
+
+_forkedExperiment = None  # the experiment inherited by the forked worker processes
+
+
+def _runForkedDay(iteration, simulation):
+    TRACER.detach()  # the trace writer thread is not forked, the messages are printed instead
+    messages = io.StringIO()
+    setVerbosePrintFile(messages)  # the inherited output file is written by the main process in `mergeDay`
+    result = runDay(_forkedExperiment, iteration, simulation)
+    result.messages = messages.getvalue()
+    sys.stdout.flush()  # the pool workers exit by `os._exit`
+    return result
+
+
+def mergeDay(experiment, result: DayResult):
+    experiment.outputFile.write(result.messages)
+    for estimator, data in zip(experiment.estimators, result.estimatorData):
+        estimator.mergeData(data)
+    for record in result.shiftRecords:
+        experiment.shiftsLog.register(record)
+    experiment.shiftsLog.registerAvg()
+    experiment.arrivedAtWorkplaceTimeAvgTimes.extend(result.arrivedAtWorkplaceTimeAvgTimes)
+    if result.results is not None:
+        result.results.replay(experiment.resultsWriter)
+
+
+def runIterationDays(experiment, iteration, jobs):
+    """Runs the day simulations of the iteration (in `jobs` processes) and merges their results in the day order."""
+    simulations = range(experiment.config.simulations)
+    if jobs <= 1:
+        for simulation in simulations:
+            seedSimulation(experiment.config.seed, iteration, simulation)
+            verbosePrint(f"Simulation {simulation + 1}", 2)
+            components, ensembles = experiment.prepareSimulation(iteration, simulation)
+            experiment.runSimulation(components, ensembles, iteration, simulation)
+            experiment.simulationCallback(components, ensembles, iteration, simulation)
+        return
+
+    global _forkedExperiment
+    _forkedExperiment = experiment
+    experiment.outputFile.flush()  # otherwise the buffered bytes would be written again by the forked processes
+    sys.stdout.flush()
+    with multiprocessing.get_context("fork").Pool(min(jobs, len(simulations)), maxtasksperchild=1) as pool:
+        results = pool.starmap(_runForkedDay, [(iteration, simulation) for simulation in simulations])
+    _forkedExperiment = None
+
+    for result in sorted(results, key=lambda r: r.simulation):
+        mergeDay(experiment, result)
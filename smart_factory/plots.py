@@ -3,18 +3,19 @@ import csv
 from pathlib import Path
 from statistics import mean
 
-import matplotlib
-import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
-from matplotlib.colors import ListedColormap
 
 from configuration import CONFIGURATION, DayOfWeek
-from ml_deeco.estimators import CategoricalFeature
 
 font = {'size': 12}
 
-matplotlib.rc('font', **font)
+
+def pyplot():
+    """`matplotlib.pyplot` imported (and configured) when the first figure is rendered."""
+    import matplotlib
+    import matplotlib.pyplot as plt
+    matplotlib.rc('font', **font)
+    return plt
 
 
 def computeWeeklyAverages(data, iterations, simulations):
@@ -28,6 +29,7 @@ def computeWeeklyAverages(data, iterations, simulations):
 
 
 def plotStandbysAndLateness(shiftsLog, iterations, simulations, filename=None, show=False, figsize=None):
+    plt = pyplot()
     if not figsize:
         figsize = (9, 5)
     fig, ax_s = plt.subplots(figsize=figsize)
@@ -82,6 +84,7 @@ def plotStandbysAndLateness(shiftsLog, iterations, simulations, filename=None, s
 
 
 def generateColormap():
+    from matplotlib.colors import ListedColormap
 
     def lerp(a, b, t):
         return tuple(a[i] * (1 - t) + b[i] * t for i in range(len(a)))
@@ -97,6 +100,10 @@ def generateColormap():
 
 
 def plotLateWorkersNN(estimator, filename=None, subtitle="", show=False, figsize=None):
+    from ml_deeco.estimators import CategoricalFeature
+    import seaborn as sns
+    plt = pyplot()
+
     timeSteps = CONFIGURATION.shiftStart + 1
     timeToShift = np.linspace(CONFIGURATION.shiftStart / CONFIGURATION.steps, 0, timeSteps)
     daysOfWeekFeature = CategoricalFeature(DayOfWeek)
@@ -0,0 +1,374 @@
+import math
+from typing import List
+
+import numpy as np
+
+from ml_deeco.simulation import Component, Point2D
+
+from components import Worker, WorkerState, WorkPlace, Factory, SecurityComponent, WORKER_SPEED, arrivedAtFactoryEvent, arrivedAtWorkplaceEvent
+from helpers import now
+
+from common.events import EventQueue  # `common` is added to the path by `run.py`
+from common.tracing import TRACER
+
+
+class WorkerPopulation(Component):
+    """
+    Array-backed engine advancing all the workers at once.
+
+    The positions, states, path indices and the other state variables of the workers are stored in NumPy arrays and
+    one `actuate` call advances all the workers by vectorized moves and state transitions (the same state machine as
+    `Worker.actuate`). The workers themselves are `ArrayWorker`s -- thin views of the arrays, so that the ensembles and
+    estimates work with them as with ordinary workers. The workers walk along the precomputed routes of their workplaces
+    (see `routing.Route`) and the permissions are checked by one batch per door or dispenser.
+
+    With `eventDriven`, the time advance is discrete-event: only the workers with a pending wake-up (the bus arrival or
+    the predicted arrival at the end of the walked segment) and the workers waiting for a permission at a door or the
+    dispenser are processed in a step. The position of a walking worker is computed from the start of the segment when
+    it is read.
+    """
+
+    def __init__(self, factory: Factory, workplaces: List[WorkPlace], capacity, eventDriven=False):
+        super().__init__()
+        self.factory = factory
+        self.workplaces = workplaces
+        self.workers: List['ArrayWorker'] = []
+
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.state = np.zeros(capacity, dtype=np.int8)
+        self.pathToWorkplaceIndex = np.zeros(capacity, dtype=np.int64)
+        self.hasHeadGear = np.zeros(capacity, dtype=bool)
+        self.isAtFactory = np.zeros(capacity, dtype=bool)
+        self.workplace = np.zeros(capacity, dtype=np.int64)
+        self.accessIndex = np.zeros(capacity, dtype=np.int64)  # index of the worker in the access control store
+        # times, -1 stands for None
+        self.busArrivalTime = np.full(capacity, -1, dtype=np.int64)
+        self.arrivedAtFactoryTime = np.full(capacity, -1, dtype=np.int64)
+        self.arrivedAtWorkplaceTime = np.full(capacity, -1, dtype=np.int64)
+
+        # routes of the workplaces -- the points [bus stop, entry door, dispenser, *waypoints, workplace door] and the
+        # precomputed steps of walking their segments
+        self.routeLength = np.array([len(w.route.waypoints) for w in workplaces], dtype=np.int64)
+        self.routePoints = np.zeros((len(workplaces), self.routeLength.max(initial=0) + 4, 2))
+        self.segmentSteps = np.zeros(self.routePoints.shape[:2], dtype=np.int64)
+        for w, workplace in enumerate(workplaces):
+            points = workplace.route.points
+            self.routePoints[w, :len(points)] = [(point.x, point.y) for point in points]
+            self.segmentSteps[w, :len(points)] = workplace.route.segmentSteps
+        # security components of the workplaces (the permissions are checked by one batch per component)
+        self.entryDoors, self.entryDoorIndex = _indexComponents([w.route.entryDoor for w in workplaces])
+        self.dispensers, self.dispenserIndex = _indexComponents([w.route.dispenser for w in workplaces])
+        self.workplaceDoors, self.workplaceDoorIndex = _indexComponents([w.entryDoor for w in workplaces])
+
+        self.eventDriven = eventDriven
+        if eventDriven:
+            self.events = EventQueue(capacity)
+            self.waiting = set()  # workers waiting for a permission
+            self.departureTime = np.full(capacity, -1, dtype=np.int64)  # start of the walked segment (from `x`, `y`)
+            self.arrivalTime = np.full(capacity, -1, dtype=np.int64)  # predicted end of the walked segment
+            self.lastStep = -1
+
+    def add(self, worker: 'ArrayWorker', workplace: WorkPlace):
+        index = len(self.workers)
+        self.workers.append(worker)
+        self.workplace[index] = self.workplaces.index(workplace)
+        self.accessIndex[index] = self.factory.accessControl.indexOf(worker)
+        return index
+
+    def _targetIndex(self, indices):
+        """Indices of the route points the workers walk to (or stand at)."""
+        state = self.state[indices]
+        targets = np.zeros(len(indices), dtype=np.int64)
+        targets[(state == WorkerState.WALKING_TO_FACTORY) | (state == WorkerState.AT_FACTORY_DOOR)] = 1
+        targets[(state == WorkerState.WALKING_TO_DISPENSER) | (state == WorkerState.AT_DISPENSER)] = 2
+        workplace = (state == WorkerState.WALKING_TO_WORKPLACE) | (state == WorkerState.AT_WORKPLACE_DOOR)
+        targets[workplace] = 3 + np.minimum(self.pathToWorkplaceIndex[indices[workplace]], self.routeLength[self.workplace[indices[workplace]]])
+        return targets
+
+    def _targets(self, indices):
+        """Targets of the currently walked segments."""
+        return self.routePoints[self.workplace[indices], self._targetIndex(indices)]
+
+    def _move(self, moving):
+        """Moves the workers towards their targets, returns the ones which arrived."""
+        indices = np.flatnonzero(moving)
+        targets = self._targets(indices)
+        dx = targets[:, 0] - self.x[indices]
+        dy = targets[:, 1] - self.y[indices]
+        dist = np.sqrt(dx ** 2 + dy ** 2)
+        arrived = dist <= WORKER_SPEED
+
+        walking = indices[~arrived]
+        self.x[walking] += dx[~arrived] / dist[~arrived] * WORKER_SPEED
+        self.y[walking] += dy[~arrived] / dist[~arrived] * WORKER_SPEED
+        self.x[indices[arrived]] = targets[arrived, 0]
+        self.y[indices[arrived]] = targets[arrived, 1]
+
+        result = np.zeros(len(self.x), dtype=bool)
+        result[indices[arrived]] = True
+        return result
+
+    def _allows(self, candidates, components, componentIndex, action):
+        """Batched `allows` of the security components of the candidate workers (given per workplace by `componentIndex`)."""
+        indices = np.flatnonzero(candidates)
+        result = np.zeros(len(self.x), dtype=bool)
+        result[indices] = self._allowed(indices, components, componentIndex, action)
+        return result
+
+    def _allowed(self, indices, components, componentIndex, action):
+        """Batched `allows` for the workers given by indices -- one call per security component with any candidates."""
+        result = np.zeros(len(indices), dtype=bool)
+        if len(components) == 1:
+            groups = [(0, slice(None))]
+        else:
+            group = componentIndex[self.workplace[indices]]
+            groups = [(c, group == c) for c in np.unique(group)]
+        for c, members in groups:
+            securityComponent: SecurityComponent = components[c]
+            result[members] = securityComponent.accessControl.allowsMany(securityComponent, action, self.accessIndex[indices[members]], now())
+        return result
+
+    def actuate(self):
+        if self.eventDriven:
+            self._actuateDue()
+            return
+
+        time = now()
+        done = np.zeros(len(self.x), dtype=bool)
+        done[len(self.workers):] = True  # unused capacity
+
+        # activate the workers who arrived by bus
+        notActive = ~done & (self.state == WorkerState.NOT_ACTIVE_YET)
+        activated = notActive & (self.busArrivalTime >= 0) & (time >= self.busArrivalTime)
+        self.state[activated] = WorkerState.WALKING_TO_FACTORY
+        done |= notActive
+        done |= (self.state == WorkerState.CANCELLED) | (self.state == WorkerState.CALLED_STANDBY)
+
+        # walk to the factory
+        arrived = self._move(~done & (self.state == WorkerState.WALKING_TO_FACTORY))
+        self.state[arrived] = WorkerState.AT_FACTORY_DOOR
+
+        # enter the factory
+        entered = self._allows(~done & (self.state == WorkerState.AT_FACTORY_DOOR), self.entryDoors, self.entryDoorIndex, 'enter')
+        self.state[entered] = WorkerState.WALKING_TO_DISPENSER
+        self.isAtFactory[entered] = True
+        self.arrivedAtFactoryTime[entered] = time
+        for index in np.flatnonzero(entered):
+            TRACER.emit(arrivedAtFactoryEvent, self.workers[index])
+        done |= entered
+
+        # walk to the dispenser
+        arrived = self._move(~done & (self.state == WorkerState.WALKING_TO_DISPENSER))
+        self.state[arrived] = WorkerState.AT_DISPENSER
+
+        # use the dispenser
+        used = self._allows(~done & (self.state == WorkerState.AT_DISPENSER), self.dispensers, self.dispenserIndex, 'use')
+        self.state[used] = WorkerState.WALKING_TO_WORKPLACE
+        self.hasHeadGear[used] = True
+        done |= used
+
+        # walk to the workplace
+        walking = ~done & (self.state == WorkerState.WALKING_TO_WORKPLACE)
+        toDoor = self.pathToWorkplaceIndex >= self.routeLength[self.workplace]
+        arrived = self._move(walking)
+        self.state[arrived & toDoor] = WorkerState.AT_WORKPLACE_DOOR
+        self.pathToWorkplaceIndex[arrived & ~toDoor] += 1
+
+        # enter the workplace and start working
+        entered = self._allows(~done & (self.state == WorkerState.AT_WORKPLACE_DOOR), self.workplaceDoors, self.workplaceDoorIndex, 'enter')
+        self.state[entered] = WorkerState.AT_WORKPLACE
+        self.arrivedAtWorkplaceTime[entered] = time
+        for index in np.flatnonzero(entered):
+            TRACER.emit(arrivedAtWorkplaceEvent, self.workers[index])
+
+
+    # region discrete-event time advance
+
+    def _depart(self, indices, time):
+        """Starts walking the next segment of the route -- the first move is done in the next step."""
+        arrival = time + self.segmentSteps[self.workplace[indices], self._targetIndex(indices)]
+        self.departureTime[indices] = time
+        self.arrivalTime[indices] = arrival
+        self.events.scheduleMany(indices, arrival)
+
+    def _arrive(self, indices):
+        targets = self._targets(indices)
+        self.x[indices] = targets[:, 0]
+        self.y[indices] = targets[:, 1]
+        self.departureTime[indices] = -1
+
+    def _wait(self, indices):
+        self.waiting.update(indices.tolist())
+
+    def scheduleBusArrival(self, index):
+        busArrivalTime = self.busArrivalTime[index]
+        if self.eventDriven and busArrivalTime >= 0 and self.state[index] == WorkerState.NOT_ACTIVE_YET:
+            self.events.schedule(index, max(busArrivalTime, self.lastStep + 1))
+
+    def location(self, index):
+        """Current location of the worker (computed from the start of the segment while walking)."""
+        x, y = self.x[index], self.y[index]
+        if self.eventDriven and self.departureTime[index] >= 0:
+            moves = self.lastStep - self.departureTime[index]
+            target = self._targets(np.array([index]))[0]
+            if self.lastStep >= self.arrivalTime[index]:
+                x, y = target
+            elif moves > 0:
+                dist = math.hypot(target[0] - x, target[1] - y)
+                x += (target[0] - x) / dist * WORKER_SPEED * moves
+                y += (target[1] - y) / dist * WORKER_SPEED * moves
+        return Point2D(float(x), float(y))
+
+    def interrupt(self, index):
+        """Stops the worker whose state was changed from the outside (e.g. cancelled) where it currently is."""
+        if not self.eventDriven:
+            return
+        location = self.location(index)
+        self.x[index], self.y[index] = location.x, location.y
+        self.departureTime[index] = -1
+        self.events.cancel(index)
+        self.waiting.discard(index)
+
+    def _actuateDue(self):
+        time = now()
+        self.lastStep = time
+        indices = np.union1d(self.events.popDue(time), np.fromiter(self.waiting, dtype=np.int64))
+        self.waiting.clear()
+
+        def select(mask):
+            return indices[mask & ~done]
+
+        state = self.state[indices]
+        arrived = self.arrivalTime[indices] == time
+
+        # activate the workers who arrived by bus
+        activated = indices[(state == WorkerState.NOT_ACTIVE_YET) & (self.busArrivalTime[indices] >= 0) & (time >= self.busArrivalTime[indices])]
+        self.state[activated] = WorkerState.WALKING_TO_FACTORY
+        self._depart(activated, time)
+        done = np.isin(state, [WorkerState.NOT_ACTIVE_YET, WorkerState.CANCELLED, WorkerState.CALLED_STANDBY])
+
+        # walk to the factory
+        reached = select(arrived & (state == WorkerState.WALKING_TO_FACTORY))
+        self._arrive(reached)
+        self.state[reached] = WorkerState.AT_FACTORY_DOOR
+
+        # enter the factory
+        state = self.state[indices]
+        atDoor = select(state == WorkerState.AT_FACTORY_DOOR)
+        allowed = self._allowed(atDoor, self.entryDoors, self.entryDoorIndex, 'enter')
+        entered = atDoor[allowed]
+        self.state[entered] = WorkerState.WALKING_TO_DISPENSER
+        self.isAtFactory[entered] = True
+        self.arrivedAtFactoryTime[entered] = time
+        for index in entered:
+            TRACER.emit(arrivedAtFactoryEvent, self.workers[index])
+        self._depart(entered, time)
+        self._wait(atDoor[~allowed])
+        done |= np.isin(indices, entered)
+
+        # walk to the dispenser
+        reached = select(arrived & (state == WorkerState.WALKING_TO_DISPENSER))
+        self._arrive(reached)
+        self.state[reached] = WorkerState.AT_DISPENSER
+
+        # use the dispenser
+        state = self.state[indices]
+        atDispenser = select(state == WorkerState.AT_DISPENSER)
+        allowed = self._allowed(atDispenser, self.dispensers, self.dispenserIndex, 'use')
+        used = atDispenser[allowed]
+        self.state[used] = WorkerState.WALKING_TO_WORKPLACE
+        self.hasHeadGear[used] = True
+        self._depart(used, time)
+        self._wait(atDispenser[~allowed])
+        done |= np.isin(indices, used)
+
+        # walk to the workplace
+        reached = select(arrived & (state == WorkerState.WALKING_TO_WORKPLACE))
+        toDoor = self.pathToWorkplaceIndex[reached] >= self.routeLength[self.workplace[reached]]
+        self._arrive(reached)
+        self.state[reached[toDoor]] = WorkerState.AT_WORKPLACE_DOOR
+        self.pathToWorkplaceIndex[reached[~toDoor]] += 1
+        self._depart(reached[~toDoor], time)
+
+        # enter the workplace and start working
+        state = self.state[indices]
+        atDoor = select(state == WorkerState.AT_WORKPLACE_DOOR)
+        allowed = self._allowed(atDoor, self.workplaceDoors, self.workplaceDoorIndex, 'enter')
+        entered = atDoor[allowed]
+        self.state[entered] = WorkerState.AT_WORKPLACE
+        self.arrivedAtWorkplaceTime[entered] = time
+        for index in entered:
+            TRACER.emit(arrivedAtWorkplaceEvent, self.workers[index])
+        self._wait(atDoor[~allowed])
+
+    # endregion
+
+
+def _indexComponents(components):
+    """Distinct components (in the order of the first occurrence) and the index of each of the given components in them."""
+    distinct = list(dict.fromkeys(components))
+    return distinct, np.array([distinct.index(c) for c in components], dtype=np.int64)
+
+
+def _arrayAttribute(name, fromArray=lambda v: v, toArray=lambda v: v):
+    def get(worker):
+        return fromArray(getattr(worker.population, name)[worker.index])
+
+    def set(worker, value):
+        getattr(worker.population, name)[worker.index] = toArray(value)
+
+    return property(get, set)
+
+
+def _optionalTime(value):
+    return None if value < 0 else int(value)
+
+
+def _noneToMissing(value):
+    return -1 if value is None else value
+
+
+class ArrayWorker(Worker):
+    """`Worker` with the state stored in a `WorkerPopulation`, which actuates all its workers at once."""
+
+    def __init__(self, population: WorkerPopulation, workplace: WorkPlace, location):
+        self.population = population
+        self.index = population.add(self, workplace)
+        super().__init__(workplace, location)
+
+    def actuate(self):
+        pass  # actuated by the population
+
+    hasHeadGear = _arrayAttribute("hasHeadGear", bool)
+    isAtFactory = _arrayAttribute("isAtFactory", bool)
+    pathToWorkplaceIndex = _arrayAttribute("pathToWorkplaceIndex", int)
+    arrivedAtFactoryTime = _arrayAttribute("arrivedAtFactoryTime", _optionalTime, _noneToMissing)
+    arrivedAtWorkplaceTime = _arrayAttribute("arrivedAtWorkplaceTime", _optionalTime, _noneToMissing)
+
+    @property
+    def state(self):
+        return WorkerState(self.population.state[self.index])
+
+    @state.setter
+    def state(self, state):
+        self.population.interrupt(self.index)
+        self.population.state[self.index] = state
+
+    @property
+    def busArrivalTime(self):
+        return _optionalTime(self.population.busArrivalTime[self.index])
+
+    @busArrivalTime.setter
+    def busArrivalTime(self, busArrivalTime):
+        self.population.busArrivalTime[self.index] = _noneToMissing(busArrivalTime)
+        self.population.scheduleBusArrival(self.index)
+
+    @property
+    def location(self):
+        return self.population.location(self.index)
+
+    @location.setter
+    def location(self, location):
+        self.population.x[self.index] = location.x
+        self.population.y[self.index] = location.y
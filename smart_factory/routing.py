@@ -0,0 +1,97 @@
+import heapq
+import math
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from ml_deeco.simulation import Point2D
+
+from components import Door, Dispenser, WORKER_SPEED
+
+
+def walkingSteps(origin: Point2D, target: Point2D):
+    """
+    Steps needed by a worker to walk from `origin` to `target` (at least one, the worker arrives in a later step). The
+    moves of `MovingComponent2D.move` are iterated, as the rounding errors of a diagonal segment can make their count
+    differ from `ceil(distance / speed)` by one.
+    """
+    x, y = origin.x, origin.y
+    steps = 1
+    while True:
+        dx, dy = target.x - x, target.y - y
+        dist = math.sqrt(dx ** 2 + dy ** 2)
+        if dist <= WORKER_SPEED:
+            return steps
+        x += dx / dist * WORKER_SPEED
+        y += dy / dist * WORKER_SPEED
+        steps += 1
+
+
+class Route:
+    """
+    Route of the workers of one workplace: from the bus stop to the factory entry door, to the dispenser, along the
+    waypoints to the workplace door. The route is shared by all the workers of the workplace, and the walking times of
+    its segments are precomputed (see `WorkerPopulation` with `eventDriven`).
+    """
+
+    def __init__(self, busStop: Point2D, entryDoor: Door, dispenser: Dispenser, waypoints: List[Point2D], workplaceDoor: Door):
+        self.busStop = busStop
+        self.entryDoor = entryDoor
+        self.dispenser = dispenser
+        self.waypoints = waypoints
+        self.workplaceDoor = workplaceDoor
+        self.points = [busStop, entryDoor.location, dispenser.location, *waypoints, workplaceDoor.location]
+        # segmentSteps[k] -- steps to walk from points[k - 1] to points[k]
+        self.segmentSteps = np.array([0] + [walkingSteps(a, b) for a, b in zip(self.points, self.points[1:])], dtype=np.int64)
+
+
+class RoutingTable:
+    """
+    Shortest paths in a corridor graph from a set of source nodes (the dispensers) to all the nodes, computed once by
+    Dijkstra's algorithm and shared by all the routes.
+    """
+
+    def __init__(self, nodes: List[Point2D], edges: List[Tuple[int, int]], sources: List[int]):
+        self.nodes = nodes
+        neighbors: Dict[int, List[Tuple[int, float]]] = {node: [] for node in range(len(nodes))}
+        for a, b in edges:
+            length = math.hypot(nodes[a].x - nodes[b].x, nodes[a].y - nodes[b].y)
+            neighbors[a].append((b, length))
+            neighbors[b].append((a, length))
+
+        self.sources = {source: row for row, source in enumerate(sources)}
+        self.distance = np.full((len(sources), len(nodes)), np.inf)
+        self.previous = np.full((len(sources), len(nodes)), -1, dtype=np.int64)
+        for row, source in enumerate(sources):
+            self._dijkstra(row, source, neighbors)
+
+    def _dijkstra(self, row, source, neighbors):
+        distance, previous = self.distance[row], self.previous[row]
+        distance[source] = 0
+        queue = [(0.0, source)]
+        while queue:
+            d, node = heapq.heappop(queue)
+            if d > distance[node]:
+                continue
+            for neighbor, length in neighbors[node]:
+                if d + length < distance[neighbor]:
+                    distance[neighbor] = d + length
+                    previous[neighbor] = node
+                    heapq.heappush(queue, (d + length, neighbor))
+
+    def path(self, source, target):
+        """Nodes of the shortest path from the `source` to the `target` (both included)."""
+        previous = self.previous[self.sources[source]]
+        path = [target]
+        while path[-1] != source:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+    def waypoints(self, source, target):
+        """Corners of the shortest path (the straight parts are merged), without the source and the target."""
+        points = [self.nodes[node] for node in self.path(source, target)]
+        corners = []
+        for previous, point, following in zip(points, points[1:], points[2:]):
+            if (point.x - previous.x) * (following.y - point.y) != (point.y - previous.y) * (following.x - point.x):
+                corners.append(point)
+        return corners
@@ -1,20 +1,31 @@
 import argparse
 import os
 import random
+import sys
 from pathlib import Path
 from typing import List
 import numpy as np
 
 os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")  # Report only TF errors by default
 # os.environ["CUDA_VISIBLE_DEVICES"] = "-1"  # Disable GPU in TF. The models are small, so it is actually faster to use the CPU.
-import tensorflow as tf
 
-from ml_deeco.estimators import NeuralNetworkEstimator
 from ml_deeco.simulation import Component, Experiment, Configuration
 from ml_deeco.utils import setVerboseLevel, verbosePrint, Log, setVerbosePrintFile, AverageLog, closeVerbosePrintFile
 
-from configuration import CONFIGURATION, createFactory, setArrivalTime, DayOfWeek
+sys.path.append(str(Path(__file__).resolve().parent.parent))  # the `common` package shared by the simulations
+from common.datastore import TrainingDataStore
+from common.estimators import configureTensorFlow, LookupTableMixin, DataStoreMixin, CompactDataMixin, IncrementalTrainingMixin, NumpyInferenceMixin, FeatureDomain, neuralNetworkEstimatorClass
+from common.inference import FeatureEncoder
+from common.cache import BaselineCache
+from common.checkpoint import Checkpoint, runIterations, runSimulations
+from common.logs import ColumnarLog
+from common.results import ResultsWriter
+from common.profiling import PROFILER
+from common.tracing import TRACER
+
+from configuration import CONFIGURATION, createFactory, createLargeFactory, setArrivalTime, DayOfWeek
 from components import Shift, Worker
+from population import WorkerPopulation, ArrayWorker
 from plots import plotStandbysAndLateness, plotLateWorkersNN
 
 
@@ -31,22 +42,58 @@ class LateWorkersExperiment(Experiment):
         config = Configuration(**args.__dict__, name="machine", steps=CONFIGURATION.steps, simulations=7)
         super().__init__(config)
 
+        if config.resume and config.results_file:
+            raise ValueError("The results container cannot be resumed, use --resume without --results_file.")
+        if config.resume and config.trace:
+            raise ValueError("The trace file cannot be resumed, use --resume without --trace.")
+        if config.resume and not Checkpoint(Path(config.output) / "checkpoint").exists():
+            raise ValueError(f"There is no checkpoint to resume from in '{config.output}', run with --checkpoint first.")
+
         # initialize output path
         CONFIGURATION.outputFolder = Path(config.output)
         os.makedirs(CONFIGURATION.outputFolder, exist_ok=True)
-        outputFile = open(CONFIGURATION.outputFolder / "output.txt", "w")
+        self.outputFile = open(CONFIGURATION.outputFolder / "output.txt", "a" if config.resume else "w")
 
         # initialize configuration
         CONFIGURATION.cancellationBaseline = args.baseline
         CONFIGURATION.latePercentage = args.late
-        CONFIGURATION.lateWorkersNN = NeuralNetworkEstimator(
+        CONFIGURATION.workplaces = args.workplaces
+        CONFIGURATION.entryDoors = args.entry_doors
+        CONFIGURATION.dispensers = args.dispensers
+        configureTensorFlow(config.seed, config.threads)  # TF is imported only for the experiment (by its estimators)
+        from ml_deeco.estimators import CategoricalFeature
+        estimatorModes, estimatorParams = [], {}
+        if config.lookup:
+            # the inputs are the time to shift (whole steps) and the day of week -- compile the NN into a lookup table
+            timeToShiftDomain = FeatureDomain([[t / CONFIGURATION.steps] for t in range(CONFIGURATION.shiftStart - CONFIGURATION.shiftEnd, CONFIGURATION.shiftStart + 1)])
+            dayOfWeekDomain = FeatureDomain.ofValues(CategoricalFeature(DayOfWeek), DayOfWeek)
+            estimatorModes.append(LookupTableMixin)
+            estimatorParams["domains"] = [timeToShiftDomain, dayOfWeekDomain]
+        if config.compact_data:
+            estimatorModes.append(CompactDataMixin)
+        elif config.data_store:
+            estimatorModes.append(DataStoreMixin)
+            estimatorParams["dataStore"] = TrainingDataStore(CONFIGURATION.outputFolder / "late_workers" / "data")
+        if config.incremental:
+            estimatorModes.append(IncrementalTrainingMixin)
+        if config.numpy_inference:
+            estimatorModes.append(NumpyInferenceMixin)
+            estimatorParams["encoders"] = [FeatureEncoder([[0], [1 / CONFIGURATION.steps]]), FeatureEncoder.ofFeature(CategoricalFeature(DayOfWeek), DayOfWeek)]
+        CONFIGURATION.lateWorkersNN = neuralNetworkEstimatorClass(*estimatorModes)(
             self, hidden_layers=[32, 64, 32], fit_params={"batch_size": 4096},
-            name="late_workers", outputFolder=CONFIGURATION.outputFolder / "late_workers"
+            name="late_workers", outputFolder=CONFIGURATION.outputFolder / "late_workers",
+            **estimatorParams
         )
 
         # initialize verbose printing
         setVerboseLevel(args.verbose)
-        setVerbosePrintFile(outputFile)
+        setVerbosePrintFile(self.outputFile)
+        TRACER.configure(args.verbose, CONFIGURATION.outputFolder / "trace.bin" if config.trace else None)
+
+        if config.profile:
+            PROFILER.enable()
+            PROFILER.instrumentExperiment(self, [Log, AverageLog, ColumnarLog])
+            PROFILER.instrument(sys.modules[__name__], ["plotStandbysAndLateness", "plotLateWorkersNN"], "plots")
 
         # import the ensemble with estimate after the `CONFIGURATION.lateWorkersNN` is created
         from ensembles import CancelLateWorkers
@@ -56,6 +103,12 @@ class LateWorkersExperiment(Experiment):
         self.workerLogs = {}
         self.cancelledWorkersLog: Log = ...
         self.shiftsLog = AverageLog(["iteration", "simulation", "shift", "arrived", "standbys", "avg_work_start_time", "lateness"])
+        self.resultsWriter = ResultsWriter(CONFIGURATION.outputFolder / "results.zip") if config.results_file else None
+        self.modelTrained = False
+        self.checkpoint = Checkpoint(CONFIGURATION.outputFolder / "checkpoint") if config.checkpoint or config.resume else None
+        if config.baseline_cache and config.results_file:
+            raise ValueError("The results container cannot be cached, use --baseline_cache without --results_file.")
+        self.baselineCache = BaselineCache(config.baseline_cache, "smart_factory", self, CONFIGURATION) if config.baseline_cache else None
 
     def prepareSimulation(self, _i, simulation):
         """Prepares the components and ensembles for the simulation."""
@@ -67,21 +120,37 @@ class LateWorkersExperiment(Experiment):
         components: List[Component] = []
         shifts = []
 
-        factory, workplaces, busStop = createFactory()
+        if CONFIGURATION.workplaces:
+            factory, workplaces, _ = createLargeFactory(CONFIGURATION.workplaces, CONFIGURATION.entryDoors, CONFIGURATION.dispensers)
+        else:
+            factory, workplaces, _ = createFactory()
         components.append(factory)
 
+        if self.config.array_engine or self.config.event_driven:
+            # the workers are views of the population arrays, the population actuates all of them at once
+            population = WorkerPopulation(factory, workplaces, len(workplaces) * (CONFIGURATION.workersPerShift + CONFIGURATION.standbysPerShift),
+                                          eventDriven=self.config.event_driven)
+            createWorker = lambda workplace: ArrayWorker(population, workplace, workplace.route.busStop)
+        else:
+            population = None
+            createWorker = lambda workplace: Worker(workplace, workplace.route.busStop)
+
         for workplace in workplaces:
-            workers = [Worker(workplace, busStop) for _ in range(CONFIGURATION.workersPerShift)]
+            workers = [createWorker(workplace) for _ in range(CONFIGURATION.workersPerShift)]
             for worker in workers:
                 setArrivalTime(worker, simulation)
-            standbys = [Worker(workplace, busStop) for _ in range(CONFIGURATION.standbysPerShift)]
+            standbys = [createWorker(workplace) for _ in range(CONFIGURATION.standbysPerShift)]
             shift = Shift(workplace, workers, standbys)
             components += [workplace, shift, *workers, *standbys]
             shifts.append(shift)
 
             if self.config.log_workers:
                 for worker in workers + standbys:
-                    self.workerLogs[worker] = Log(["x", "y", "state", "isAtFactory", "hasHeadGear"])
+                    self.workerLogs[worker] = ColumnarLog(["x", "y", "state", "isAtFactory", "hasHeadGear"],
+                                                          [np.int64, np.int64, np.int8, np.bool_, np.bool_], capacity=CONFIGURATION.steps)
+
+        if population is not None:
+            components.append(population)
 
         from ensembles import getEnsembles
         return components, getEnsembles(shifts)
@@ -117,6 +186,10 @@ class LateWorkersExperiment(Experiment):
             avgFactoryArrivalTime = sum(map(lambda w: w.arrivedAtFactoryTime, workersAtFactory)) / len(workersAtFactory)
             verbosePrint(f"Average arrival at factory = {avgFactoryArrivalTime:.2f}", 2)
 
+        if self.resultsWriter:
+            self.exportToResultsFile(components, workersLog, i, s)
+            return
+
         os.makedirs(CONFIGURATION.outputFolder / f"cancelled_workers/{i + 1}/", exist_ok=True)
         self.cancelledWorkersLog.export(CONFIGURATION.outputFolder / f"cancelled_workers/{i + 1}/{s + 1}.csv")
 
@@ -126,7 +199,18 @@ class LateWorkersExperiment(Experiment):
         if self.config.log_workers:
             os.makedirs(CONFIGURATION.outputFolder / f"all_workers/{i+1}/{s+1}", exist_ok=True)
             for worker in filter(lambda c: isinstance(c, Worker), components):
-                self.workerLogs[worker].export(CONFIGURATION.outputFolder / f"all_workers/{i+1}/{s+1}/{worker}.csv")
+                self.workerLogs[worker].exportAs(CONFIGURATION.outputFolder / f"all_workers/{i+1}/{s+1}/{worker}", self.config.log_format)
+
+    def exportToResultsFile(self, components, workersLog, i, s):
+        """Appends the logs of the simulation to the results container (keyed by the worker)."""
+        cancelledWorkers = [str(record[1]) for record in self.cancelledWorkersLog.records]
+        self.resultsWriter.appendLog("cancelled_workers", self.cancelledWorkersLog, cancelledWorkers, i + 1, s + 1)
+        workers = [str(record[0]) for record in workersLog.records]
+        self.resultsWriter.appendLog("workers", workersLog, workers, i + 1, s + 1)
+
+        if self.config.log_workers:
+            for worker in filter(lambda c: isinstance(c, Worker), components):
+                self.resultsWriter.appendLog("all_workers", self.workerLogs[worker], str(worker), i + 1, s + 1)
 
     def iterationCallback(self, i):
         avgTimesAverage = sum(self.arrivedAtWorkplaceTimeAvgTimes) / len(self.arrivedAtWorkplaceTimeAvgTimes)
@@ -138,41 +222,92 @@ class LateWorkersExperiment(Experiment):
     def trainingCallback(self, i):
         # save the NN
         CONFIGURATION.lateWorkersNN.saveModel(str(i + 1))
+        self.modelTrained = True
         plotLateWorkersNN(CONFIGURATION.lateWorkersNN, CONFIGURATION.outputFolder / f"nn_{i + 1}.png", f"Iteration {i + 1}", show=self.config.show_plots)
 
+    def baselineKey(self):
+        """The arguments the results of the baseline iteration depend on (see `common/cache.py`)."""
+        return {"seed": self.config.seed, "log_workers": self.config.log_workers, "log_format": self.config.log_format,
+                "array_engine": self.config.array_engine, "event_driven": self.config.event_driven,
+                "parallel_days": bool(self.config.parallel_days)}  # seeded per day with any number of processes
+
+    def checkpointState(self):
+        return {"shiftsLog": self.shiftsLog, "arrivedAtWorkplaceTimeAvgTimes": self.arrivedAtWorkplaceTimeAvgTimes, "modelTrained": self.modelTrained}
+
+    def restoreCheckpointState(self, state):
+        self.shiftsLog = state["shiftsLog"]
+        self.arrivedAtWorkplaceTimeAvgTimes = state["arrivedAtWorkplaceTimeAvgTimes"]
+        self.modelTrained = state["modelTrained"]
+
+    def run(self):
+        if self.checkpoint is None and self.baselineCache is None and not self.config.parallel_days:
+            return super().run()
+
+        from parallel import runIterationDays
+        runIteration = (lambda experiment, i: runIterationDays(experiment, i, self.config.parallel_days)) if self.config.parallel_days else runSimulations
+        runIterations(self, self.checkpoint, self.config.resume, runIteration, self.baselineCache)
+
     def exportData(self):
         self.shiftsLog.export(CONFIGURATION.outputFolder / "shifts.csv")
         self.shiftsLog.exportAvg(CONFIGURATION.outputFolder / "shifts_avg.csv")
         plotStandbysAndLateness(self.shiftsLog, self.config.iterations, 7, CONFIGURATION.outputFolder / "shifts.png", show=self.config.show_plots)
+        if self.resultsWriter:
+            self.resultsWriter.close()
+        TRACER.close()
         closeVerbosePrintFile()
 
 
-def main():
+def createArgumentParser():
     parser = argparse.ArgumentParser(description='Smart factory simulation')
     parser.add_argument('-v', '--verbose', type=int, help='the verboseness between 0 and 4.', required=False, default="0")
     parser.add_argument('-s', '--seed', type=int, help='Random seed.', required=False, default=42)
     parser.add_argument('--threads', type=int, help='Number of CPU threads TF can use.', required=False, default=4)
     parser.add_argument('-o', '--output', type=str, help='Output folder for the logs.', required=True, default='results')
     parser.add_argument('-w', '--log_workers', action='store_true', help='Save logs of all workers.', required=False, default=False)
+    parser.add_argument('--log_format', type=str, choices=['csv', 'npz', 'parquet'], help="Format of the exported logs of all workers.", required=False, default='csv')
+    parser.add_argument('--results_file', action='store_true', help="Write the logs of all simulations into one results container instead of files per worker and simulation.", required=False, default=False)
+    parser.add_argument('--trace', action='store_true', help="Write the detailed (per-step) verbose messages as binary records into 'trace.bin' in the output folder (render them by 'python -m common.tracing').", required=False, default=False)
+    parser.add_argument('--profile', action='store_true', help="Measure the time spent in the phases of the run, export it to 'profile.json' in the output folder and print a summary table.", required=False, default=False)
     parser.add_argument('-b', '--baseline', type=int, help="Cancel missing workers 'baseline' minutes before the shift starts.", required=False, default=16)
     parser.add_argument('-l', '--late', type=float, help="Percentage of late workers.", required=False, default=0.1)
     parser.add_argument('-i', '--iterations', type=int, help="Number of iterations to run.", required=False, default=3)
     parser.add_argument('-p', '--show_plots', action='store_true', help='Show plots during the run.', required=False, default=False)
-    args = parser.parse_args()
+    parser.add_argument('--batch', action='store_true', help="Estimate the late workers of a shift by one batched prediction per step.", required=False, default=False)
+    parser.add_argument('--lookup', action='store_true', help="Compile the trained NN into a lookup table over the time to shift and day of week.", required=False, default=False)
+    parser.add_argument('--numpy_inference', action='store_true', help="Evaluate the trained model by a NumPy forward pass (checked against the Keras model) instead of Keras.", required=False, default=False)
+    parser.add_argument('--incremental', action='store_true', help="Retrain the model from its previous weights on the newly collected data (with a replay sample of the older data) with early stopping.", required=False, default=False)
+    parser.add_argument('--compact_data', action='store_true', help="Aggregate the collected training rows with the same inputs into one weighted row (takes precedence over --data_store).", required=False, default=False)
+    parser.add_argument('--data_store', action='store_true', help="Collect the training data into memory-mapped files in the output folder and train from them by a streamed dataset.", required=False, default=False)
+    parser.add_argument('--array_engine', action='store_true', help="Store the state of the workers in arrays and advance all of them by one vectorized update per step.", required=False, default=False)
+    parser.add_argument('--event_driven', action='store_true', help="Advance only the workers with a due event (bus arrival, end of a walked segment) or waiting for a permission (implies --array_engine).", required=False, default=False)
+    parser.add_argument('--checkpoint', action='store_true', help="Save a checkpoint (model, collected data, logs, random states) into 'checkpoint' in the output folder after each iteration.", required=False, default=False)
+    parser.add_argument('--resume', action='store_true', help="Continue from the checkpoint in the output folder (implies --checkpoint).", required=False, default=False)
+    parser.add_argument('--baseline_cache', type=str, help="Folder of the cached results of the first (baseline) iteration -- load them if this run was cached before, otherwise store them.", required=False, default=None)
+    parser.add_argument('--parallel_days', type=int, help="Run the day simulations of an iteration in this many processes (seeded per day; 1 runs them sequentially with the same seeds).", required=False, default=0)
+    parser.add_argument('--workplaces', type=int, help="Generate a factory with this many workplaces (0 uses the default factory with 3 workplaces).", required=False, default=CONFIGURATION.workplaces)
+    parser.add_argument('--entry_doors', type=int, help="Number of entry doors of the generated factory.", required=False, default=CONFIGURATION.entryDoors)
+    parser.add_argument('--dispensers', type=int, help="Number of dispensers of the generated factory.", required=False, default=CONFIGURATION.dispensers)
+    return parser
+
+
+def main():
+    args = createArgumentParser().parse_args()
 
     # Fix random seeds
     random.seed(args.seed)
     np.random.seed(args.seed)
-    tf.random.set_seed(args.seed)
-
-    # Set number of threads
-    tf.config.threading.set_inter_op_parallelism_threads(args.threads)
-    tf.config.threading.set_intra_op_parallelism_threads(args.threads)
-
     experiment = LateWorkersExperiment(args)
-    experiment.run()
+    try:
+        experiment.run()
+    finally:
+        if experiment.resultsWriter:
+            experiment.resultsWriter.close()  # also after a crash, so that the results written so far can be read
     experiment.exportData()
 
+    if args.profile:
+        PROFILER.export(CONFIGURATION.outputFolder / "profile.json")
+        print(PROFILER.formatTable())
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,73 @@
+from collections import defaultdict
+from typing import Tuple
+
+from ml_deeco.simulation import Ensemble
+
+from helpers import now
+
+
+class TimeWindowEnsemble(Ensemble):
+    """Ensemble which can be materialized only in a time window given by `activationInterval` (both ends inclusive)."""
+
+    # the estimates of the ensemble collect data also when it is not materialized (`collectOnlyIfMaterialized=False`),
+    # so ML-DEECo has to iterate it in all the steps (see `EnsembleScheduler`)
+    collectsWhenInactive = False
+
+    def activationInterval(self) -> Tuple[int, int]:
+        raise NotImplementedError()
+
+    def situation(self):
+        start, end = self.activationInterval()
+        return start <= now() <= end
+
+
+class EnsembleScheduler:
+    """
+    Ensembles of a simulation of which only those that can be active in the current time step are materialized.
+
+    `active(step)` returns the ensembles that can be active in the step: the `TimeWindowEnsemble`s are woken up at the
+    start of their activation interval and put to sleep after its end (their `materialized` flag is reset then, as
+    ML-DEECo does for an ensemble whose situation does not hold), so in a step outside of all the windows, they cost
+    nothing. The other ensembles, and those which collect the data of their estimates also when they are not
+    materialized (`collectsWhenInactive`), are active in every step. The activation intervals must not change during the
+    simulation. ML-DEECo iterates the ensembles in each step, which yields `active(now())`; all the ensembles are in
+    `ensembles`.
+    """
+
+    def __init__(self, ensembles):
+        self.ensembles = list(ensembles)
+        self._always = []
+        self._starts = defaultdict(list)
+        self._ends = defaultdict(list)
+        for index, ensemble in enumerate(self.ensembles):
+            if isinstance(ensemble, TimeWindowEnsemble) and not ensemble.collectsWhenInactive:
+                start, end = ensemble.activationInterval()
+                self._starts[start].append(index)
+                self._ends[end + 1].append(index)
+            else:
+                self._always.append(index)
+        self._reset()
+
+    def _reset(self):
+        self._step = min(self._starts, default=0) - 1
+        self._active = set()
+        self._current = None
+
+    def active(self, step):
+        """The ensembles that can be active in the step (in their original order)."""
+        if step < self._step:  # a new simulation
+            self._reset()
+        if step == self._step and self._current is not None:
+            return self._current
+        for s in range(self._step + 1, step + 1):
+            self._active.update(self._starts.get(s, ()))
+            ended = self._active.intersection(self._ends.get(s, ()))
+            self._active.difference_update(ended)
+            for index in ended:
+                self.ensembles[index].materialized = False
+        self._step = step
+        self._current = [self.ensembles[index] for index in sorted(self._active.union(self._always))]
+        return self._current
+
+    def __iter__(self):
+        return iter(self.active(now()))
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SIMULATIONS = ("smart_factory", "machine_failure")
+
+
+def _useSimulation(monkeypatch, name):
+    """
+    Imports the modules of the simulation by their bare names (as its `run.py` does). Both simulations have modules of
+    the same names (`components`, `configuration`, `run`, ...), so the ones imported from the other simulation are
+    forgotten.
+    """
+    folder = ROOT / name
+    monkeypatch.setattr(sys, "path", [str(folder)] + [p for p in sys.path if Path(p).resolve() not in {ROOT / s for s in SIMULATIONS}])
+    names = {file.stem for simulation in SIMULATIONS for file in (ROOT / simulation).glob("*.py")}
+    for moduleName in names:
+        module = sys.modules.get(moduleName)
+        if module is not None and Path(getattr(module, "__file__", "") or "").resolve().parent != folder:
+            del sys.modules[moduleName]
+
+
+@pytest.fixture
+def smartFactory(monkeypatch):
+    _useSimulation(monkeypatch, "smart_factory")
+
+
+@pytest.fixture
+def machineFailure(monkeypatch):
+    _useSimulation(monkeypatch, "machine_failure")
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def accessControl(smartFactory):
+    from access import AccessControl
+    return AccessControl(capacity=4)
+
+
+def test_permanent_grants_survive_growing(accessControl):
+    subjects = [f"worker{i}" for i in range(200)]
+    indices = accessControl.indicesOf(subjects[:3])
+    accessControl.grant("door", "enter", indices)
+    indices = accessControl.indicesOf(subjects)  # grows the bitsets past one word
+    accessControl.grant("door", "enter", indices[[70, 199]])
+
+    allowed = accessControl.allowsMany("door", "enter", indices, 0)
+    assert np.flatnonzero(allowed).tolist() == [0, 1, 2, 70, 199]
+    assert accessControl.allows("door", "enter", 70, 0)
+    assert not accessControl.allows("door", "enter", 69, 0)
+    assert not accessControl.allowsMany("door", "use", indices, 0).any()
+    assert accessControl.allowed("door", "enter", 0) == [subjects[i] for i in (0, 1, 2, 70, 199)]
+
+
+def test_time_limited_grants_expire(accessControl):
+    indices = accessControl.indicesOf(["a", "b", "c"])
+    accessControl.grant("dispenser", "use", indices[:2], until=10)
+    accessControl.grant("dispenser", "use", indices[1:2], until=5)  # the later expiration is kept
+    assert accessControl.allowsMany("dispenser", "use", indices, 9).tolist() == [True, True, False]
+    assert accessControl.allowsMany("dispenser", "use", indices, 10).tolist() == [False, False, False]
+
+
+def test_revoke_removes_both_kinds_of_grants(accessControl):
+    indices = accessControl.indicesOf(["a", "b"])
+    accessControl.grant("door", "enter", indices)
+    accessControl.grant("door", "enter", indices, until=10)
+    accessControl.revoke("door", "enter", indices[:1])
+    assert accessControl.allowsMany("door", "enter", indices, 0).tolist() == [False, True]
+    assert accessControl.indexOf("b") == 1
@@ -0,0 +1,74 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("ml_deeco")
+
+from common.cache import BaselineCache
+
+
+class Estimator:
+
+    def __init__(self):
+        self.data = []
+
+    def collectedData(self):
+        return list(self.data)
+
+    def mergeData(self, data):
+        self.data.extend(data)
+
+
+class Experiment:
+
+    def __init__(self, late=0.2):
+        self.late = late
+        self.estimators = [Estimator()]
+        self.logs = []
+
+    def baselineKey(self):
+        return {"late": self.late}
+
+    def checkpointState(self):
+        return {"logs": list(self.logs)}
+
+    def restoreCheckpointState(self, state):
+        self.logs = state["logs"]
+
+
+def test_stored_baseline_is_loaded_by_a_run_with_the_same_key(tmp_path):
+    configuration = SimpleNamespace(outputFolder=tmp_path / "output", steps=100)
+    configuration.outputFolder.mkdir()
+    experiment = Experiment()
+    cache = BaselineCache(tmp_path / "cache", "machine_failure", experiment, configuration)
+    assert not cache.exists()
+
+    cache.begin(experiment)
+    experiment.estimators[0].data = [([1.0], [2.0])]
+    experiment.logs = ["day 1"]
+    (configuration.outputFolder / "machines.csv").write_text("step\n1\n")
+    random.seed(1)
+    np.random.seed(1)
+    cache.store(experiment)
+    expected = random.random(), np.random.random()
+
+    (configuration.outputFolder / "machines.csv").unlink()
+    loaded = Experiment()
+    cache = BaselineCache(tmp_path / "cache", "machine_failure", loaded, configuration)
+    assert cache.exists()
+    cache.load(loaded)
+    assert loaded.estimators[0].data == [([1.0], [2.0])]
+    assert loaded.logs == ["day 1"]
+    assert (configuration.outputFolder / "machines.csv").read_text() == "step\n1\n"
+    assert (random.random(), np.random.random()) == expected
+
+
+def test_key_depends_on_the_arguments_and_the_configuration(tmp_path):
+    configuration = SimpleNamespace(outputFolder=tmp_path, steps=100)
+    key = BaselineCache(tmp_path, "machine_failure", Experiment(), configuration).key
+    assert BaselineCache(tmp_path, "machine_failure", Experiment(), configuration).key == key
+    assert BaselineCache(tmp_path, "machine_failure", Experiment(late=0.3), configuration).key != key
+    configuration.steps = 200
+    assert BaselineCache(tmp_path, "machine_failure", Experiment(), configuration).key != key
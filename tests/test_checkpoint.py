@@ -0,0 +1,73 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("ml_deeco")
+
+from common.checkpoint import Checkpoint, runIterations
+
+
+class Experiment:
+    """An experiment without estimators which logs the random numbers drawn in its iterations."""
+
+    def __init__(self, iterations):
+        self.config = SimpleNamespace(iterations=iterations, seed=42)
+        self.estimators = []
+        self.drawn = []
+
+    def checkpointState(self):
+        return {"drawn": list(self.drawn)}
+
+    def restoreCheckpointState(self, state):
+        self.drawn = state["drawn"]
+
+    def iterationCallback(self, i):
+        return True
+
+    def trainingCallback(self, i):
+        pass
+
+
+def runIteration(experiment, i):
+    experiment.drawn.append((random.random(), np.random.random()))
+
+
+def test_resume_continues_as_the_uninterrupted_run(tmp_path):
+    random.seed(0)
+    np.random.seed(0)
+    uninterrupted = Experiment(3)
+    runIterations(uninterrupted, Checkpoint(tmp_path / "a"), runIteration=runIteration)
+
+    random.seed(0)
+    np.random.seed(0)
+    runIterations(Experiment(2), Checkpoint(tmp_path / "b"), runIteration=runIteration)
+    resumed = Experiment(3)
+    runIterations(resumed, Checkpoint(tmp_path / "b"), resume=True, runIteration=runIteration)
+
+    assert resumed.drawn == uninterrupted.drawn
+
+
+def test_crash_between_the_renames_leaves_the_previous_checkpoint(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "checkpoint")
+    experiment = Experiment(1)
+    experiment.drawn = [1]
+    checkpoint.save(experiment, 1)
+    checkpoint.folder.rename(checkpoint.previous)  # the previous checkpoint renamed aside, the new one not yet in place
+
+    assert checkpoint.exists()
+    restored = Experiment(1)
+    assert checkpoint.restore(restored) == 1
+    assert restored.drawn == [1]
+
+    experiment.drawn = [1, 2]
+    checkpoint.save(experiment, 2)
+    assert not checkpoint.previous.exists()
+    assert checkpoint.restore(restored) == 2
+    assert restored.drawn == [1, 2]
+
+
+def test_resume_without_checkpoint_is_an_error(tmp_path):
+    with pytest.raises(ValueError):
+        runIterations(Experiment(1), Checkpoint(tmp_path / "checkpoint"), resume=True, runIteration=runIteration)
@@ -0,0 +1,65 @@
+import numpy as np
+
+from common.datastore import TrainingDataStore
+
+
+def rows(start, count):
+    X = np.arange(start, start + count, dtype=np.float32).reshape(-1, 1) * [1, 10]
+    return X, X[:, :1] * 2
+
+
+def storedRows(store, **kwargs):
+    batches = list(store.batches(4, seed=0, **kwargs))
+    if not batches:
+        return np.empty((0, 2)), np.empty((0, 1))
+    return np.concatenate([X for X, _ in batches]), np.concatenate([Y for _, Y in batches])
+
+
+def test_rows_are_split_into_chunks_and_read_back_shuffled(tmp_path):
+    store = TrainingDataStore(tmp_path, chunkRows=8)
+    store.appendMany(*rows(0, 19))
+    store.append([19, 190], [38])
+    assert len(store) == 20
+
+    X, Y = storedRows(store, window=2)
+    assert len(store.chunks) == 3
+    assert sorted(X[:, 0].tolist()) == list(range(20))
+    np.testing.assert_array_equal(X[:, 1], X[:, 0] * 10)
+    np.testing.assert_array_equal(Y[:, 0], X[:, 0] * 2)  # the inputs and targets stay paired
+
+
+def test_validation_split_holds_out_the_same_rows(tmp_path):
+    store = TrainingDataStore(tmp_path, chunkRows=16)
+    store.appendMany(*rows(0, 64))
+    training, _ = storedRows(store, validationSplit=0.25)
+    validation, _ = storedRows(store, validationSplit=0.25, validation=True)
+    assert sorted(training[:, 0].tolist() + validation[:, 0].tolist()) == list(range(64))
+    np.testing.assert_array_equal(storedRows(store, validationSplit=0.25, validation=True)[0], validation)
+
+
+def test_branches_are_adopted(tmp_path):
+    store = TrainingDataStore(tmp_path / "store", chunkRows=8)
+    store.appendMany(*rows(0, 5))
+    branch = store.branch("day_1")
+    branch.appendMany(*rows(5, 5))
+    branch.flush()
+    store.adopt(branch.chunks)
+    assert sorted(storedRows(store)[0][:, 0].tolist()) == list(range(10))
+
+    store.clear()
+    assert len(store) == 0 and storedRows(store)[0].shape[0] == 0
+
+
+def test_exported_chunks_of_branches_do_not_overwrite_each_other(tmp_path):
+    store = TrainingDataStore(tmp_path / "store", chunkRows=8)
+    store.appendMany(*rows(0, 5))
+    for day in range(2):
+        branch = store.branch(f"day_{day}")
+        branch.appendMany(*rows(5 + 5 * day, 5))
+        branch.flush()
+        store.adopt(branch.chunks)
+
+    exported = TrainingDataStore.exportChunks(store.chunks, tmp_path / "export")
+    copy = TrainingDataStore(tmp_path / "copy", chunkRows=8)
+    copy.adopt(copy.importChunks(exported, tmp_path / "export"))
+    assert sorted(storedRows(copy)[0][:, 0].tolist()) == list(range(15))
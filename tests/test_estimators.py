@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ml_deeco")
+
+from common.estimators import NumpyInferenceMixin
+
+
+def linear(x):
+    return x
+
+
+class Dense:
+    """A dense layer with the interface `NumpyNetwork.fromKeras` reads."""
+
+    name = "dense"
+    activation = staticmethod(linear)
+
+    def __init__(self, kernel, bias):
+        self.kernel = kernel
+        self.bias = bias
+
+    def get_weights(self):
+        return [self.kernel, self.bias]
+
+
+class Model:
+
+    def __init__(self, weight):
+        self.layers = [Dense(np.full((2, 1), weight, dtype=np.float32), np.zeros(1, dtype=np.float32))]
+
+    def __call__(self, X):
+        layer = self.layers[0]
+        return X @ layer.kernel + layer.bias
+
+
+class TrainedEstimator:
+    """Trains a new model in `endIteration` and evaluates it by `predictBatch` (as ML-DEECo does after training)."""
+
+    def __init__(self):
+        self._model = Model(0)
+        self.evaluations = []
+
+    def endIteration(self):
+        self._model = Model(self._model.layers[0].kernel[0, 0] + 1)
+        self.evaluations.append(self.predictBatch(np.ones((1, 2), dtype=np.float32))[0, 0])
+
+    def predictBatch(self, X):
+        return np.asarray(self._model(X))
+
+
+class NumpyEstimator(NumpyInferenceMixin, TrainedEstimator):
+    pass
+
+
+def test_numpy_inference_evaluates_the_new_model_after_training():
+    estimator = NumpyEstimator()
+    estimator.endIteration()
+    estimator.endIteration()
+
+    assert estimator.evaluations == [2, 4]
+    assert estimator.network is not None
+    assert estimator.predictBatch(np.ones((1, 2)))[0, 0] == 4
@@ -0,0 +1,21 @@
+from common.events import EventQueue
+
+
+def test_due_entities_are_popped_in_time_order():
+    queue = EventQueue(5)
+    queue.scheduleMany([3, 1, 4], [7, 2, 5])
+    assert queue.popDue(1).tolist() == []
+    assert queue.popDue(5).tolist() == [1, 4]
+    assert queue.popDue(10).tolist() == [3]
+    assert queue.popDue(100).tolist() == []
+
+
+def test_rescheduling_replaces_the_pending_wake_up():
+    queue = EventQueue(3)
+    queue.schedule(0, 5)
+    queue.schedule(0, 8)
+    queue.schedule(1, 6)
+    queue.cancel(1)
+    assert queue.popDue(7).tolist() == []
+    assert queue.popDue(8).tolist() == [0]
+    assert queue.wakeUpTime.tolist() == [-1, -1, -1]
@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("ml_deeco")
+pytest.importorskip("tensorflow")
+pytest.importorskip("matplotlib")
+
+
+def runBaselineIteration(monkeypatch, tmp_path, arguments):
+    import run
+    from configuration import CONFIGURATION
+    monkeypatch.setattr(CONFIGURATION, "steps", 200)
+    monkeypatch.setattr(CONFIGURATION, "machineCount", 20)
+
+    experiment = run.ProductionMachineExperiment(run.createArgumentParser().parse_args(["-v", "0", "-o", str(tmp_path), "-i", "1", "-r", "-m", "20"] + arguments))
+    experiment.run()
+    return experiment
+
+
+@pytest.mark.parametrize("baseline", [[], ["-b"]])
+def test_fleet_simulates_the_same_machines(machineFailure, monkeypatch, tmp_path, baseline):
+    machines = runBaselineIteration(monkeypatch, tmp_path / "machines", baseline)
+    fleet = runBaselineIteration(monkeypatch, tmp_path / "fleet", baseline + ["--fleet"])
+
+    assert [log.records for log in fleet.machineLogs.values()] == [log.records for log in machines.machineLogs.values()]
+    assert fleet.runningTimesLog.records == machines.runningTimesLog.records
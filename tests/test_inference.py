@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from common.inference import FeatureEncoder, NumpyNetwork, encodeInputs, verifyParity
+
+
+def network():
+    rng = np.random.default_rng(0)
+    return NumpyNetwork([
+        (rng.normal(size=(3, 4)).astype(np.float32), rng.normal(size=4).astype(np.float32), "relu"),
+        (rng.normal(size=(4, 2)).astype(np.float32), rng.normal(size=2).astype(np.float32), "sigmoid"),
+    ])
+
+
+def test_forward_pass_of_the_dense_layers():
+    net = network()
+    X = np.random.default_rng(1).random((5, 3), dtype=np.float32)
+    (k1, b1, _), (k2, b2, _) = net.layers
+    expected = 1 / (1 + np.exp(-(np.maximum(X @ k1 + b1, 0) @ k2 + b2)))
+    np.testing.assert_allclose(net.predictBatch(X), expected, rtol=1e-6)
+    np.testing.assert_allclose(net.predict(X[2]), expected[2], rtol=1e-6)
+    assert net.inputWidth == 3
+
+
+def test_unsupported_activation_is_an_error():
+    with pytest.raises(ValueError):
+        NumpyNetwork([(np.zeros((1, 1)), np.zeros(1), "swish")])
+
+
+def test_saved_network_and_encoders_are_loaded(tmp_path):
+    encoders = [FeatureEncoder([[0.0], [0.01]]), FeatureEncoder([[1, 0], [0, 1]], [3, 7])]
+    network().save(tmp_path / "numpy_model.npz", encoders)
+    loaded, loadedEncoders = NumpyNetwork.load(tmp_path / "numpy_model.npz")
+
+    X = encodeInputs(loadedEncoders, [[50, 100], [7, 3]])
+    np.testing.assert_allclose(X, [[0.5, 0, 1], [1, 1, 0]])
+    np.testing.assert_array_equal(loaded.predictBatch(X), network().predictBatch(X))
+
+
+def test_parity_with_a_model_evaluating_the_same_layers():
+    net = network()
+    assert verifyParity(net.predictBatch, net) == 0
+    assert verifyParity(lambda X: net.predictBatch(X) + 0.5, net) == pytest.approx(0.5)
+
+
+def test_exported_keras_model_has_the_same_outputs():
+    tf = pytest.importorskip("tensorflow")
+    model = tf.keras.Sequential([tf.keras.Input(shape=(3,)), tf.keras.layers.Dense(8, activation="relu"), tf.keras.layers.Dense(1, activation="linear")])
+    assert verifyParity(model, NumpyNetwork.fromKeras(model)) < 1e-5
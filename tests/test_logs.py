@@ -0,0 +1,43 @@
+import numpy as np
+
+from common.logs import ColumnarLog
+
+
+def test_inferred_column_is_widened_by_a_later_value():
+    log = ColumnarLog(["step", "rate", "running"])
+    log.register([0, 0, True])
+    log.register([1, 0.25, 2])
+    assert log.records == [[0, 0.0, 1], [1, 0.25, 2]]
+    assert log.getColumn("rate").dtype == np.float64
+
+
+def test_explicit_types_are_kept():
+    log = ColumnarLog(["step", "running"], [np.int64, np.bool_], capacity=1)
+    log.registerMany([np.arange(3), np.array([True, False, True])])
+    log.register([3, False])
+    assert log.getColumn("step").tolist() == [0, 1, 2, 3]
+    assert log.dtypes == [np.int64, np.bool_]
+
+
+def test_split_by_column():
+    log = ColumnarLog(["machine", "step"], [np.int64, np.int64])
+    log.registerMany([[1, 2, 1], [10, 11, 12]])
+    logs = log.split("machine")
+    assert logs[1].records == [[10], [12]] and logs[2].records == [[11]]
+
+
+def test_npz_round_trip(tmp_path):
+    log = ColumnarLog(["step", "rate", "state"])
+    log.register([0, 0.5, "running"])
+    log.register([1, 0.75, "failed"])
+    log.exportAs(tmp_path / "log", "npz")
+    loaded = ColumnarLog.loadNpz(tmp_path / "log.npz")
+    assert loaded.header == log.header
+    assert loaded.records == log.records
+
+
+def test_csv_export(tmp_path):
+    log = ColumnarLog(["step", "rate"])
+    log.register([0, 0.5])
+    log.exportAs(tmp_path / "log")
+    assert (tmp_path / "log.csv").read_text().splitlines() == ["step,rate", "0,0.5"]
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ml_deeco")
+pytest.importorskip("tensorflow")
+
+def test_batched_time_to_failure_matches_the_estimate(machineFailure, tmp_path):
+    import run
+    from configuration import CONFIGURATION
+
+    experiment = run.ProductionMachineExperiment(run.createArgumentParser().parse_args(["-v", "0", "-o", str(tmp_path), "--batch", "-m", "8"]))
+    from components import ProductionMachine, predictTimeToFailure
+
+    # train the model on random data
+    estimator = CONFIGURATION.timeToFailureEstimator
+    rng = np.random.default_rng(0)
+    for _ in range(256):
+        estimator.collectData(rng.random(2), rng.random(1))
+    estimator.endIteration()
+    experiment.modelTrained = True
+
+    machines = [ProductionMachine(experiment, index) for index in range(8)]
+    for index, machine in enumerate(machines):
+        machine.failureRate = 0.05 * index
+        machine.timeSinceLastRepair = 9 * index + 1
+
+    timesToFailure = predictTimeToFailure([m.failure_rate() for m in machines], [m.time_since_repair() for m in machines])
+    np.testing.assert_allclose(timesToFailure, [machine.timeToFailure() for machine in machines], rtol=1e-5)
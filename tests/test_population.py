@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("ml_deeco")
+
+STEPS = 80
+
+
+def simulate(monkeypatch, engine):
+    """Walks two workers per workplace through a generated factory, some of them waiting for the permissions."""
+    from configuration import CONFIGURATION, createLargeFactory
+    from components import Worker
+    from population import WorkerPopulation, ArrayWorker
+
+    experiment = SimpleNamespace(currentTimeStep=0)
+    monkeypatch.setattr(CONFIGURATION, "experiment", experiment)
+    # one entry door and two dispensers -- the door to the far dispenser is a diagonal segment
+    factory, workplaces, _ = createLargeFactory(12, 1, 2)
+
+    if engine == "objects":
+        createWorker = lambda workplace: Worker(workplace, workplace.route.busStop)
+        components = []
+    else:
+        population = WorkerPopulation(factory, workplaces, 2 * len(workplaces), eventDriven=engine == "events")
+        createWorker = lambda workplace: ArrayWorker(population, workplace, workplace.route.busStop)
+        components = [population]
+    workers = [createWorker(workplace) for workplace in workplaces for _ in range(2)]
+    if engine == "objects":
+        components = workers
+    for w, worker in enumerate(workers):
+        worker.busArrivalTime = w % 5
+
+    punctual, delayed = workers[::2], workers[1::2]
+    for worker in workers:
+        worker.workplace.entryDoor.allow(worker, "enter")
+    trace = []
+    for step in range(STEPS):
+        experiment.currentTimeStep = step
+        if step == 0:
+            factory.entryDoor.allowMany(punctual, "enter")
+            for dispenser in factory.dispensers:
+                dispenser.allowMany(workers, "use")
+        if step == 25:  # the delayed workers wait at the entry door
+            factory.entryDoor.allowMany(delayed, "enter")
+        for component in components:
+            component.actuate()
+        trace.append([(worker.state, round(worker.location.x, 6), round(worker.location.y, 6)) for worker in workers])
+
+    return trace, [(worker.arrivedAtFactoryTime, worker.arrivedAtWorkplaceTime) for worker in workers]
+
+
+@pytest.mark.parametrize("engine", ["array", "events"])
+def test_population_engines_move_the_workers_as_the_worker_objects(smartFactory, monkeypatch, engine):
+    expectedTrace, expectedArrivals = simulate(monkeypatch, "objects")
+    assert all(arrivedAtWorkplace is not None for _, arrivedAtWorkplace in expectedArrivals)
+    trace, arrivals = simulate(monkeypatch, engine)
+    assert arrivals == expectedArrivals
+    for step, (workers, expectedWorkers) in enumerate(zip(trace, expectedTrace)):
+        assert workers == expectedWorkers, f"step {step}"
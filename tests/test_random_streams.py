@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def RandomStreams(machineFailure):
+    from random_streams import RandomStreams
+    return RandomStreams
+
+
+def test_numbers_do_not_depend_on_the_block_size(RandomStreams):
+    small, large = RandomStreams(42, key=(0, 1), blockSize=3), RandomStreams(42, key=(0, 1), blockSize=64)
+    machines = np.arange(5)
+    for _ in range(20):
+        np.testing.assert_array_equal(small.uniform(machines), large.uniform(machines))
+        np.testing.assert_array_equal(small.normal(machines), large.normal(machines))
+
+
+def test_stream_of_a_machine_does_not_depend_on_the_other_machines(RandomStreams):
+    fleet, single = RandomStreams(42, blockSize=4), RandomStreams(42, blockSize=4)
+    drawn = [fleet.normal(np.array([9, 2, 5, 0]))[2] for _ in range(10)]
+    assert drawn == [single.drawOne("normal", 5) for _ in range(10)]
+
+
+def test_streams_differ_by_kind_and_key(RandomStreams):
+    streams = RandomStreams(42)
+    assert streams.drawOne("uniform", 0) != RandomStreams(42, key=(1,)).drawOne("uniform", 0)
+    assert 0 <= streams.drawOne("uniform", 0) < 1
+    assert streams.uniform([]).shape == (0,)
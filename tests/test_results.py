@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from common.logs import ColumnarLog
+from common.results import ResultsBuffer, ResultsReader, ResultsWriter
+
+
+def test_series_of_one_entity_is_read_back(tmp_path):
+    with ResultsWriter(tmp_path / "results.zip", chunkSize=4) as writer:
+        for simulation in (1, 2):
+            for machine in ("m1", "m2"):
+                log = ColumnarLog(["step", "rate"], [np.int64, np.float64])
+                log.registerMany([np.arange(3), np.arange(3) * 0.5 + simulation])
+                writer.appendLog("machines", log, machine, 1, simulation)
+        writer.append("maintenance", ["step"], [np.array([5, 6])], np.array(["m1", "m2"]), 1, 1)
+
+    with ResultsReader(tmp_path / "results.zip") as reader:
+        assert reader.tables() == ["machines", "maintenance"]
+        assert reader.entities("machines") == ["m1", "m2"]
+        series = reader.read("machines", entity="m2", simulation=2)
+        assert series["step"].tolist() == [0, 1, 2]
+        assert series["rate"].tolist() == [2.0, 2.5, 3.0]
+        assert len(reader.read("machines")["entity"]) == 12
+        assert reader.read("maintenance", entity="m2")["step"].tolist() == [6]
+        assert reader.read("machines", entity="m3")["step"].shape == (0,)
+
+
+def test_header_of_a_table_must_not_change(tmp_path):
+    with ResultsWriter(tmp_path / "results.zip") as writer:
+        writer.append("machines", ["step"], [np.arange(2)], "m1", 1, 1)
+        with pytest.raises(ValueError):
+            writer.append("machines", ["time"], [np.arange(2)], "m1", 1, 1)
+
+
+def test_buffered_rows_are_replayed_into_the_writer(tmp_path):
+    buffer = ResultsBuffer()
+    buffer.append("workers", ["x"], [[1, 2]], "w1", 1, 3)
+    with ResultsWriter(tmp_path / "results.zip") as writer:
+        buffer.replay(writer)
+    with ResultsReader(tmp_path / "results.zip") as reader:
+        assert reader.read("workers", simulation=3)["x"].tolist() == [1, 2]
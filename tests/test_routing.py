@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("ml_deeco")
+
+from ml_deeco.simulation import MovingComponent2D, Point2D
+
+
+def movedSteps(origin, target, speed):
+    component = MovingComponent2D(Point2D(origin.x, origin.y), speed=speed)
+    steps = 1
+    while not component.move(target):
+        steps += 1
+    return steps
+
+
+@pytest.mark.parametrize("target", [(48, 14), (66, 112), (144, 42), (30, 40), (5, 0), (0, 0), (250, 10)])
+def test_walking_steps_match_the_moves_of_the_worker(smartFactory, target):
+    from components import WORKER_SPEED
+    from routing import walkingSteps
+
+    origin, target = Point2D(10, 20), Point2D(10 + target[0], 20 + target[1])
+    assert walkingSteps(origin, target) == movedSteps(origin, target, WORKER_SPEED)
+
+
+def test_routing_table_waypoints_are_the_corners_of_the_shortest_path(smartFactory):
+    from routing import RoutingTable
+
+    #  0 - 1 - 2
+    #      |   |
+    #      3 - 4
+    nodes = [Point2D(0, 0), Point2D(10, 0), Point2D(20, 0), Point2D(10, 10), Point2D(20, 10)]
+    table = RoutingTable(nodes, [(0, 1), (1, 2), (1, 3), (3, 4), (2, 4)], sources=[0])
+    assert table.path(0, 4) in ([0, 1, 2, 4], [0, 1, 3, 4])
+    assert table.distance[0, 4] == 30
+    corners = table.waypoints(0, 4)
+    assert len(corners) == 1 and (corners[0].x, corners[0].y) in ((20, 0), (10, 10))
+    assert table.waypoints(0, 2) == []
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("ml_deeco")
+
+
+@pytest.fixture
+def ensembleClasses(smartFactory):
+    from scheduling import TimeWindowEnsemble
+
+    class Window(TimeWindowEnsemble):
+
+        def __init__(self, start, end):
+            super().__init__()
+            self.interval = start, end
+            self.materialized = False
+
+        def activationInterval(self):
+            return self.interval
+
+    class CollectingWindow(Window):
+        collectsWhenInactive = True
+
+    class Always:
+        materialized = False
+
+    return Window, CollectingWindow, Always
+
+
+def test_only_ensembles_in_their_window_are_active(ensembleClasses):
+    from scheduling import EnsembleScheduler
+    Window, CollectingWindow, Always = ensembleClasses
+
+    morning, evening, always = Window(10, 20), Window(15, 30), Always()
+    scheduler = EnsembleScheduler([morning, always, evening])
+    assert scheduler.active(0) == [always]
+    assert scheduler.active(10) == [morning, always]
+    assert scheduler.active(15) == [morning, always, evening]
+    morning.materialized = True
+    assert scheduler.active(25) == [always, evening]
+    assert not morning.materialized  # reset when its window ended
+    assert scheduler.active(31) == [always]
+    assert scheduler.active(12) == [morning, always]  # a new simulation
+
+
+def test_ensembles_collecting_data_when_inactive_are_always_iterated(ensembleClasses):
+    from scheduling import EnsembleScheduler
+    Window, CollectingWindow, Always = ensembleClasses
+
+    cancelling = CollectingWindow(10, 20)
+    scheduler = EnsembleScheduler([Window(10, 20), cancelling])
+    assert [scheduler.active(step) for step in (0, 15, 25)] == [[cancelling], scheduler.ensembles, [cancelling]]
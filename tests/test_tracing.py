@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+pytest.importorskip("ml_deeco")
+
+from common.tracing import RingBuffer, Tracer, decode, traceEvent
+
+LARGE_EVENT = traceEvent("test_large", 4, "{} allowed {}", "sl")
+
+
+def test_ring_buffer_writes_data_larger_than_buffer():
+    buffer = RingBuffer(1024)
+    received = []
+
+    def consume():
+        while (data := buffer.read(timeout=0.05)) is not None:
+            received.append(data)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    data = bytes(range(256)) * 20  # 5 buffers
+    writer = threading.Thread(target=buffer.write, args=(data,))
+    writer.start()
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+    buffer.close()
+    consumer.join(timeout=5)
+    assert b"".join(received) == data
+
+
+def test_trace_record_larger_than_buffer(tmp_path):
+    tracer = Tracer()
+    tracer.configure(4, tmp_path / "trace.bin", bufferSize=1024)
+    workers = [f"Worker {i:04d}" for i in range(200)]
+    tracer.emit(LARGE_EVENT, "Door", workers)
+    tracer.close()
+
+    messages = [message for _, message in decode(tmp_path / "trace.bin")]
+    assert messages == [f"Door allowed [{', '.join(workers)}]"]